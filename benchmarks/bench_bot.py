@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+#
+# Benchmarks the hot paths of the trivia bot.
+#
+# A triviabot instance is driven through a fake twisted transport with a
+# synthetic channel of chatters and a score table of players, and every
+# scenario reports its throughput and latency percentiles. Run it from the
+# repository root:
+#
+#     python benchmarks/bench_bot.py --players 50000 --chatters 200
+#
+# Use --json to get machine readable output for comparing runs.
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_config(directory, args):
+    """Builds a config module from example_config.py pointing to directory."""
+    config = types.ModuleType("config")
+    config.__file__ = os.path.join(ROOT, "example_config.py")
+    with open(config.__file__) as f:
+        exec(f.read(), config.__dict__)
+    config.Q_DIR = os.path.join(directory, "questions")
+    config.SAVE_DIR = os.path.join(directory, "savedata")
+    config.ANNOUNCEMENTS_TXT = os.path.join(directory, "messages.txt")
+    config.STORAGE = args.storage
+    config.OWNER = "owner"
+    return config
+
+
+def random_word(rng, length):
+    return "".join(rng.choice(string.ascii_lowercase) for _ in range(length))
+
+
+def make_questions(directory, n_questions, n_files, rng):
+    os.makedirs(directory)
+    per_file = max(1, n_questions // n_files)
+    for i in range(n_files):
+        with open(os.path.join(directory, "questions_{}".format(i)), "w") as f:
+            for _ in range(per_file):
+                question = " ".join(random_word(rng, rng.randint(3, 9)) for _ in range(8))
+                answer = " ".join(random_word(rng, rng.randint(3, 9)) for _ in range(rng.randint(1, 3)))
+                f.write("CATEGORY: {}?`{}\n".format(question, answer))
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+def measure(name, fn, iterations):
+    samples = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        for i in range(iterations):
+            t = time.perf_counter_ns()
+            fn(i)
+            samples.append(time.perf_counter_ns() - t)
+        elapsed = time.perf_counter() - start
+    samples.sort()
+    return {
+        "name": name,
+        "iterations": iterations,
+        "ops_per_sec": iterations / elapsed if elapsed else float("inf"),
+        "p50_us": percentile(samples, 50) / 1000,
+        "p90_us": percentile(samples, 90) / 1000,
+        "p99_us": percentile(samples, 99) / 1000,
+        "max_us": samples[-1] / 1000,
+    }
+
+
+class Channel:
+    """A triviabot connected to a fake transport with a synthetic audience."""
+
+    def __init__(self, trivia, config, args, rng):
+        from twisted.internet.testing import StringTransport
+
+        self.rng = rng
+        self.config = config
+        factory = trivia.ircbotFactory()
+        factory.lineRate = None
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            self.bot = factory.buildProtocol(None)
+            self.bot.makeConnection(StringTransport())
+        self.bot.factory = factory
+        self.bot._questions, self.bot._difficulty, self.bot._scheduler = self.bot._load_questions()
+        self.game = self.bot._game_for(config.GAME_CHANNEL)
+        self.game._scores.update(
+            ("player{}".format(i), rng.randint(0, 100000)) for i in range(args.players)
+        )
+        self.players = list(self.game._scores)
+        self.chatters = ["chatter{}".format(i) for i in range(args.chatters)]
+        self.lines = [" ".join(random_word(rng, rng.randint(2, 8)) for _ in range(rng.randint(1, 12)))
+                      for _ in range(1000)]
+        self.game._get_new_question()
+        self.game._clue_number = 1
+        self.game._lc.start(3600, now=False)
+
+    def drain(self):
+        self.bot.transport.clear()
+
+    def chat(self, i):
+        user = self.chatters[i % len(self.chatters)]
+        self.bot.privmsg("{0}!{0}@host".format(user), self.config.GAME_CHANNEL, self.lines[i % len(self.lines)])
+        if i % 1000 == 0:
+            self.drain()
+
+    def command(self, i):
+        user = self.chatters[i % len(self.chatters)]
+        self.bot.privmsg("{0}!{0}@host".format(user), self.config.GAME_CHANNEL, "!score")
+        if i % 1000 == 0:
+            self.drain()
+
+    def question(self, i):
+        self.game._get_new_question()
+
+    def win(self, i):
+        game = self.game
+        game._clue_number = 1 + i % 4
+        game._start_time = datetime.now()
+        user = self.players[self.rng.randrange(len(self.players))]
+        self.bot.privmsg("{0}!{0}@host".format(user), self.config.GAME_CHANNEL, game._answer.answer)
+        game._get_new_question()
+        if i % 100 == 0:
+            self.drain()
+
+    def add_points(self, i):
+        self.game._clue_number = 1 + i % 4
+        self.game._add_points_to_user(self.players[self.rng.randrange(len(self.players))])
+        if i % 100 == 0:
+            self.drain()
+
+    def rank(self, i):
+        self.game._get_rank(self.players[self.rng.randrange(len(self.players))])
+
+    def standings(self, i):
+        self.game._standings(["10"], None, None)
+        self.drain()
+
+    def record(self, i):
+        self.game.scoreboard.add(self.players[self.rng.randrange(len(self.players))], 10)
+
+    def compact(self, i):
+        self.record(i)
+        store = self.game.scoreboard.store
+        if store.begin_save():
+            store.save(dict(self.game._scores) if store.needs_scores else None)
+
+
+SCENARIOS = [
+    ("question selection", "question", 1),
+    ("privmsg chatter", "chat", 1),
+    ("privmsg command", "command", 1),
+    ("privmsg correct answer", "win", 10),
+    ("_add_points_to_user", "add_points", 10),
+    ("_get_rank", "rank", 1),
+    ("_standings", "standings", 10),
+    ("score record", "record", 1),
+    ("score compaction", "compact", 100),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of the trivia bot.")
+    parser.add_argument("--players", type=int, default=10000, help="players in the score table")
+    parser.add_argument("--chatters", type=int, default=100, help="users talking in the channel")
+    parser.add_argument("--questions", type=int, default=50000, help="questions in the corpus")
+    parser.add_argument("--files", type=int, default=20, help="question files in the corpus")
+    parser.add_argument("--iterations", type=int, default=10000, help="iterations of the fastest scenarios")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json", help="storage backend")
+    parser.add_argument("--only", action="append", help="run only the scenarios containing this text")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--json", action="store_true", help="print the results as json")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+    workdir = tempfile.TemporaryDirectory()
+    config = make_config(workdir.name, args)
+    os.makedirs(config.SAVE_DIR)
+    make_questions(config.Q_DIR, args.questions, args.files, rng)
+
+    # trivia.py reads its config at import time.
+    sys.modules["config"] = config
+    sys.argv = sys.argv[:1]
+    sys.path.insert(0, ROOT)
+    # No reactor runs here, so the work the bot hands to worker threads,
+    # saves included, is done right away and measured with the scenario
+    # that triggered it.
+    from twisted.internet import defer, threads
+
+    threads.deferToThread = defer.maybeDeferred
+    t = time.perf_counter()
+    import trivia
+
+    channel = Channel(trivia, config, args, rng)
+    setup = time.perf_counter() - t
+
+    results = []
+    for name, method, divisor in SCENARIOS:
+        if args.only and not any(o in name for o in args.only):
+            continue
+        results.append(measure(name, getattr(channel, method), max(1, args.iterations // divisor)))
+
+    channel.game.scoreboard.close()
+    workdir.cleanup()
+
+    if args.json:
+        print(json.dumps({"setup_sec": setup, "args": vars(args), "results": results}, indent=2))
+        return
+
+    print("setup: {:.3f}s ({} players, {} questions, {} store)".format(
+        setup, args.players, args.questions, args.storage))
+    header = "{:<24} {:>8} {:>12} {:>10} {:>10} {:>10} {:>10}"
+    print(header.format("scenario", "iters", "ops/s", "p50 us", "p90 us", "p99 us", "max us"))
+    row = "{name:<24} {iterations:>8} {ops_per_sec:>12.0f} {p50_us:>10.1f} {p90_us:>10.1f} {p99_us:>10.1f} {max_us:>10.1f}"
+    for result in results:
+        print(row.format(**result))
+
+
+if __name__ == "__main__":
+    main()
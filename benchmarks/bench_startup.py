@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+#
+# Benchmarks how long the trivia bot takes to start.
+#
+# Every run is a fresh interpreter, so nothing is cached between runs, which
+# imports trivia.py, connects a bot to a fake twisted transport, signs on and
+# loads the questions. The median time of every step is reported, and
+# whether the TLS stack was imported along the way. Run it from the
+# repository root:
+#
+#     python benchmarks/bench_startup.py --questions 200000 --runs 5
+#
+# Use --json to get machine readable output for comparing runs.
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_bot import make_questions  # noqa: E402
+
+# Runs in the child interpreter, with the generated config first in sys.path.
+CHILD = """
+import json, sys, time
+
+t = time.perf_counter()
+import trivia
+imported = time.perf_counter()
+
+from twisted.internet.testing import StringTransport
+
+factory = trivia.ircbotFactory()
+factory.lineRate = None
+bot = factory.buildProtocol(None)
+bot.factory = factory
+bot.makeConnection(StringTransport())
+connected = time.perf_counter()
+bot.signedOn()
+signed_on = time.perf_counter()
+bot._questions_loaded(bot._load_questions())
+ready = time.perf_counter()
+
+print(json.dumps({
+    "import_sec": imported - t,
+    "connect_sec": connected - imported,
+    "signed_on_sec": signed_on - t,
+    "questions_sec": ready - signed_on,
+    "ready_sec": ready - t,
+    "ssl_imported": "twisted.internet.ssl" in sys.modules,
+    "modules": len(sys.modules),
+}))
+"""
+
+STEPS = ["import_sec", "connect_sec", "signed_on_sec", "questions_sec", "ready_sec"]
+
+
+def make_config(directory, args):
+    """Writes a config.py based on example_config.py pointing to directory."""
+    with open(os.path.join(ROOT, "example_config.py")) as f:
+        source = f.read()
+    overrides = {
+        "Q_DIR": os.path.join(directory, "questions"),
+        "SAVE_DIR": os.path.join(directory, "savedata"),
+        "ANNOUNCEMENTS_TXT": os.path.join(directory, "messages.txt"),
+        "OWNER": "owner",
+        "STORAGE": args.storage,
+    }
+    with open(os.path.join(directory, "config.py"), "w") as f:
+        f.write(source)
+        f.write("\n")
+        for key, value in overrides.items():
+            f.write("{} = {!r}\n".format(key, value))
+
+
+def run(directory):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([directory, ROOT]))
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD], cwd=directory, env=env, check=True,
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks how long the trivia bot takes to start.")
+    parser.add_argument("--questions", type=int, default=50000, help="questions in the corpus")
+    parser.add_argument("--files", type=int, default=20, help="question files in the corpus")
+    parser.add_argument("--runs", type=int, default=5, help="interpreters to start")
+    parser.add_argument("--storage", choices=["json", "sqlite"], default="json", help="storage backend")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--json", action="store_true", help="print the results as json")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    workdir = tempfile.TemporaryDirectory()
+    make_config(workdir.name, args)
+    make_questions(os.path.join(workdir.name, "questions"), args.questions, args.files, rng)
+
+    runs = [run(workdir.name) for _ in range(args.runs)]
+    workdir.cleanup()
+    medians = {step: statistics.median(r[step] for r in runs) for step in STEPS}
+    ssl_imported = any(r["ssl_imported"] for r in runs)
+
+    if args.json:
+        print(json.dumps({"args": vars(args), "median": medians, "ssl_imported": ssl_imported,
+                          "runs": runs}, indent=2))
+        return
+
+    print("{} runs, {} questions, TLS stack imported: {}".format(
+        args.runs, args.questions, "yes" if ssl_imported else "no"))
+    for step in STEPS:
+        print("{:<16} {:>10.3f}s".format(step[:-4], medians[step]))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,18 @@
 
 GAME_CHANNEL = '#trivia'
 
+# To play in several channels at once, list them here instead. Each channel
+# runs its own game on the same connection. Channels with the same
+# "scoreboard" share their scores; scoreboards other than "default" are kept
+# in a directory of that name inside SAVE_DIR. "lang" overrides LANG for a
+# channel and "colors": False sends its messages without colors.
+# GAME_CHANNELS = {
+#     '#trivia': {},
+#     '#trivia-2': {},
+#     '#trivia-league': {'scoreboard': 'league'},
+#     '#trivia-ro': {'lang': 'ro', 'colors': False},
+# }
+
 # Nick of person running this bot? (the nick included here will be
 # automatically added to the list of ADMINS)
 # It will be displayed to user when ?help option is run
@@ -22,11 +34,56 @@ AUTO_OP_ADMINS = True
 # Directory the questions are stored at
 Q_DIR = './questions/'
 
+# Optional HTTP endpoint serving question`answer lines. Uncomment to use it,
+# questions are prefetched in the background and Q_DIR is used as fallback.
+# URL = "https://example.com/questions.txt"
+# Number of remote questions to keep buffered
+URL_PREFETCH = 20
+# Timeout (in seconds) for each request to URL
+URL_TIMEOUT = 10
+
+# Question pack compiled from Q_DIR with utils/compile_questions.py. When set,
+# it is used instead of Q_DIR: it loads instantly and is shared between bots.
+# Q_PACK = './questions.pack'
+
+# Number of recent questions that won't be asked again
+Q_REPEAT_WINDOW = 1000
+
+# Relative frequency of the questions of each category: a file or directory
+# under Q_DIR. Unlisted categories have weight 1, 0 disables a category.
+# Q_CATEGORY_WEIGHTS = {"science": 2, "sports/cricket": 0.5}
+
+# Only ask questions whose difficulty, learned from how fast they are solved,
+# is within (low, high). 0 is solved at once, 1 is never solved. Questions
+# not asked yet are always allowed. Unset to ignore difficulty.
+# Q_DIFFICULTY_BAND = (0.1, 0.85)
+
+# How often (in seconds) to check Q_DIR (or Q_PACK) for added or modified question
+# files, and this config file for changes
+Q_RESCAN_INTERVAL = 60
+
 # Directory the scores are stored at
 SAVE_DIR = './savedata/'
 
+# Storage backend for scores, the freeze list and answer history:
+#   "json"   - scores.json plus an append-only journal of score changes,
+#              folded into scores.json every SAVE_INTERVAL seconds or once
+#              the journal grows past JOURNAL_MAX_SIZE bytes.
+#   "sqlite" - SAVE_DIR/trivia.db. Changes are committed every
+#              SAVE_INTERVAL seconds or once SQLITE_BATCH_SIZE are queued.
+#              The database is created from the JSON files on first run.
+STORAGE = "json"
+SAVE_INTERVAL = 300
+JOURNAL_MAX_SIZE = 1024 * 1024
+SQLITE_BATCH_SIZE = 100
+
 IDENT_STRING = 'x1x2x3x4x5iojfaJsi39'
 
+# Guesses are matched ignoring case, accents, punctuation and leading
+# articles. Set this above 0 to also accept answers with up to that many
+# typos (answers shorter than 4 letters always need to be exact).
+FUZZY_MAX_DISTANCE = 0
+
 # Time (in seconds) between clues, and the wait time between questions.
 # If ?skip is used, the interval doesn't apply
 WAIT_INTERVAL = 10
@@ -42,6 +99,27 @@ COLOR_CODE = '\00308,01'
 # How fast will the bot output messages to the channel
 LINE_RATE = 0.2
 
+# Merge consecutive messages to the same target into one line when they fit.
+# Game messages always go out before announcements and private replies.
+COALESCE_LINES = True
+
+# Port to serve Prometheus metrics at (timings, queue depth, reactor lag).
+# Disabled when unset. They are only served on METRICS_HOST.
+# METRICS_PORT = 9150
+METRICS_HOST = '127.0.0.1'
+
+# Log file, rotated when it reaches LOG_MAX_BYTES keeping LOG_BACKUPS old
+# files. Logs go to stdout when unset.
+# LOG_FILE = './trivia.log'
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+# DEBUG, INFO, WARNING or ERROR
+LOG_LEVEL = 'INFO'
+# 'text' or 'json' (one JSON object per line)
+LOG_FORMAT = 'text'
+# Fraction of the channel chat lines to log, between 0 and 1
+LOG_CHAT_SAMPLE = 0.1
+
 DEFAULT_NICK = 'trivia'
 
 SERVER = 'irc.server.com'
@@ -51,12 +129,36 @@ SERVER = 'irc.server.com'
 SERVER_PORT = 6667
 USE_SSL = "NO"
 
+# Servers to fail over between, as (host, port). Replaces SERVER and
+# SERVER_PORT. After a failure a server is tried again after
+# RECONNECT_INITIAL_DELAY seconds, twice as long after each new failure up
+# to RECONNECT_MAX_DELAY, and the next server is tried meanwhile.
+# SERVERS = [
+#     ('irc.server.com', 6667),
+#     ('irc2.server.com', 6667),
+# ]
+RECONNECT_INITIAL_DELAY = 1
+RECONNECT_MAX_DELAY = 300
+
+# The server is pinged every PING_INTERVAL seconds. The connection is
+# dropped, and made again, when a PING goes unanswered for PING_TIMEOUT
+# seconds.
+PING_INTERVAL = 60
+PING_TIMEOUT = 180
+
 # Language iso code. Create more translations at strings.py
 LANG = "en"
 
 # Script to be called at restart. Leave blank.
 UPDATE_SCRIPT = ""
 
+# !restart and !update save the games being played, which the next process
+# resumes if it starts within CHECKPOINT_MAX_AGE seconds. With
+# RESTART_HANDOFF and USE_SSL = "no", !restart also passes the connection
+# on to the new process, so the bot doesn't leave the channels.
+CHECKPOINT_MAX_AGE = 300
+RESTART_HANDOFF = True
+
 ### AUDIO MODE ####
 # In this mode the bot will DM the questions to a admin user that is supposed to be narrate it.
 # URL of the audio stream for audio mode 
@@ -74,6 +176,18 @@ ANNOUNCEMENTS_DELAY = 60*4
 # Should the rank top 5 also be announced from time to time?
 MESSAGE_RANKING = True
 
+# Rankings of the points won recently, for "!rank week" and so on, as
+# name: (seconds, buckets). Wins leave a ranking one bucket at a time.
+# "!rank recent" ranks by points that lose half their value every
+# RANK_HALF_LIFE seconds (None to disable it). They are rebuilt from the
+# answer history when the bot starts.
+RANK_WINDOWS = {
+    'day': (24 * 3600, 24),
+    'week': (7 * 24 * 3600, 28),
+    'month': (30 * 24 * 3600, 30),
+}
+RANK_HALF_LIFE = 7 * 24 * 3600
+
 
 # Ranking system
 # Maximum points that can be awarded without priviledge
@@ -1,24 +1,109 @@
-from random import randrange
+import re
+import string
+import unicodedata
+from random import shuffle
+
+ARTICLES = frozenset(('the', 'a', 'an'))
+
+_PUNCTUATION = str.maketrans(string.punctuation, ' ' * len(string.punctuation))
+
+
+def normalize(text):
+    '''
+    Reduces an answer or a guess to a comparison key: accents, case,
+    punctuation, extra spaces and leading articles are dropped.
+    '''
+    key = unicodedata.normalize('NFKD', text)
+    key = ''.join(c for c in key if not unicodedata.combining(c))
+    words = key.casefold().translate(_PUNCTUATION).split()
+    if len(words) > 1 and words[0] in ARTICLES:
+        del words[0]
+    return ' '.join(words) or text.casefold().strip()
+
+
+# Numbers with their sign and decimal or fraction separators, then words
+# with the + and # of names like C++ or C#. Other punctuation only splits
+# words.
+_TOKEN = re.compile(r'(?:(?<![\w.])-)?\d+(?:[./]\d+)*|[^\W\d_]+[+#]*|\w+')
+
+
+def match_key(text):
+    '''
+    Returns the key guesses are compared to answers by. Like normalize(),
+    but the signs and separators of numbers and the + or # ending a word
+    count, and the words of an answer without digits are joined, so that
+    punctuation inside a word, like in U.S., O'Brien or AC/DC, doesn't have
+    to be typed.
+    '''
+    key = unicodedata.normalize('NFKD', text)
+    key = ''.join(c for c in key if not unicodedata.combining(c))
+    words = _TOKEN.findall(key.casefold())
+    if len(words) > 1 and words[0] in ARTICLES:
+        del words[0]
+    if any(c.isdigit() for word in words for c in word):
+        return ' '.join(words)
+    return ''.join(words) or text.casefold().strip()
+
+
+def within_distance(a, b, limit):
+    '''
+    Tells if the edit distance between a and b is at most limit. Gives up
+    as soon as a whole row of the distance matrix exceeds the limit.
+    '''
+    if abs(len(a) - len(b)) > limit:
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    previous = list(range(len(a) + 1))
+    for i, cb in enumerate(b, 1):
+        current = [i]
+        for j, ca in enumerate(a, 1):
+            current.append(min(previous[j] + 1,
+                               current[j - 1] + 1,
+                               previous[j - 1] + (ca != cb)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
 
 
 class Answer:
     '''
     This class implements storage for an answer you want to conceal
     and give clues 1 letter at a time.
+
+    Alternative answers can be given after the answer separated by '|',
+    only the first one is shown and masked. Guesses are compared with
+    matches(), which normalizes them the same way as the answers and
+    optionally tolerates up to max_distance typos.
     '''
 
-    def __init__(self, answer='None'):
-        self._answer = answer
-        # TODO: This is a really inefficient way to go about doing this,
-        # but I can't think of a good way to do this right now.
-        self._masked_answer = str()
+    def __init__(self, answer='None', max_distance=0):
+        answers = [a.strip() for a in answer.split('|') if a.strip()] or [answer]
+        self._raw = answer
+        self._answer = answers[0]
+        self._max_distance = max_distance
+        self._keys = frozenset(match_key(a) for a in answers)
         self._unmasked = 0
 
-        for character in self._answer:
-            if character.isalnum():
-                self._masked_answer += '*'
-            else:
-                self._masked_answer += character
+        # The mask is a list so revealing a letter is a single assignment.
+        self._mask = ['*' if c.isalnum() else c for c in self._answer]
+        self._masked_answer = ''.join(self._mask)
+
+        # Positions to reveal, in the order the clues will reveal them. Only
+        # as many as the answer's length allows are kept.
+        self._hidden = [i for i, c in enumerate(self._answer) if c.isalnum()]
+        shuffle(self._hidden)
+        if len(self) < 3:
+            clues = 0
+        elif len(self) < 5:
+            clues = 1
+        elif len(self) < 7:
+            clues = 2
+        else:
+            clues = len(self._hidden)
+        # Clues pop from the end of the list.
+        del self._hidden[:len(self._hidden) - clues]
 
     def give_clue(self):
         '''
@@ -30,33 +115,12 @@ class Answer:
 
         If an answer has 5-6, 2 clues are given.
         '''
-        # If all letters are unmasked, just return it.
-        if self._answer == self._masked_answer:
-            return self._masked_answer
-        elif len(self) < 3:
-            return self._masked_answer
-        elif len(self) < 5 and self._unmasked == 1:
-            return self._masked_answer
-        elif len(self) < 7 and self._unmasked == 2:
+        if not self._hidden:
             return self._masked_answer
 
-        # Choose the next letter to unmask.
-        # Start with something to get us into the while loop.
-        letter = ' '
-
-        # If it's a symbol, choose a different letter.
-        while not letter.isalnum():
-            # We need an index.
-            index = randrange(0, len(self))
-            # Get the letter at that index from the answer.
-            letter = self._answer[index]
-            # If the character was already unmasked, or is a symbol.
-            if self._masked_answer[index] == letter:
-                letter = ' '
-
-        # Strings are immutable, so need to split and replace.
-        self._masked_answer = self._masked_answer[:index] + \
-            letter + self._masked_answer[index + 1:]
+        index = self._hidden.pop()
+        self._mask[index] = self._answer[index]
+        self._masked_answer = ''.join(self._mask)
         self._unmasked += 1
 
         return self._masked_answer
@@ -64,11 +128,48 @@ class Answer:
     def current_clue(self):
         return self._masked_answer
 
-    def set_answer(self, new_answer):
+    def matches(self, guess):
+        '''
+        Tells if a guess is the answer or one of its alternatives.
+        '''
+        key = match_key(guess)
+        if key in self._keys:
+            return True
+        if not self._max_distance:
+            return False
+        for answer_key in self._keys:
+            # Short answers must be exact, or guessing gets too easy.
+            limit = min(self._max_distance, len(answer_key) // 4)
+            if limit and within_distance(key, answer_key, limit):
+                return True
+        return False
+
+    def set_answer(self, new_answer, max_distance=None):
+        '''
+        Sets a new answer string for the next question to use, keeping the
+        current max_distance unless another one is given.
+        '''
+        if max_distance is None:
+            max_distance = self._max_distance
+        self.__init__(answer=new_answer, max_distance=max_distance)
+
+    def snapshot(self):
+        '''
+        Returns the answer with its alternatives and the clues given and to
+        come, as a JSON serializable dict for restore().
+        '''
+        return {'answer': self._raw, 'mask': self._masked_answer, 'hidden': list(self._hidden),
+                'unmasked': self._unmasked}
+
+    def restore(self, state):
         '''
-        Sets a new answer string for the next question to use.
+        Sets the answer and clues saved by snapshot(), keeping max_distance.
         '''
-        self.__init__(answer=new_answer)
+        self.set_answer(state['answer'])
+        self._mask = list(state['mask'])
+        self._masked_answer = state['mask']
+        self._hidden = list(state['hidden'])
+        self._unmasked = state['unmasked']
 
     def _reveal(self):
         '''
@@ -0,0 +1,48 @@
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+def write(path, state):
+    '''
+    Saves state, a JSON serializable dict, to path atomically, so a crash
+    while writing never leaves half a checkpoint behind.
+    '''
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fd:
+        json.dump({'version': VERSION, 'time': time.time(), 'state': state}, fd, separators=(',', ':'))
+        fd.flush()
+        os.fsync(fd.fileno())
+    os.replace(tmp, path)
+
+
+def read(path, max_age=None):
+    '''
+    Returns the state saved at path and removes the file, so a checkpoint
+    is only resumed once. Returns None when there is no checkpoint, when
+    it can't be read, or when it is older than max_age seconds.
+    '''
+    try:
+        with open(path) as fd:
+            data = json.load(fd)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        logger.warning('Ignoring unreadable checkpoint %s: %s', path, e)
+        data = None
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    if not isinstance(data, dict) or data.get('version') != VERSION:
+        return None
+    age = time.time() - data.get('time', 0)
+    if max_age is not None and age > max_age:
+        logger.info('Ignoring checkpoint %s, saved %d seconds ago.', path, age)
+        return None
+    return data.get('state')
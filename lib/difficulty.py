@@ -0,0 +1,165 @@
+import hashlib
+import os
+import struct
+import threading
+
+from lib.answer import normalize
+
+# key, times asked, times solved, sum of the outcomes, times solved at a
+# known clue, sum of those clue numbers.
+RECORD = struct.Struct('<QHHfHf')
+MAGIC = b'TRIVDIF2'
+# The previous format, without the clues, still read.
+RECORD_V1 = struct.Struct('<QHHf')
+MAGIC_V1 = b'TRIVDIF1'
+
+# Estimates start at PRIOR and move away from it as if PRIOR_WEIGHT rounds
+# had already been played at that difficulty.
+PRIOR = 0.5
+PRIOR_WEIGHT = 2
+MAX_COUNT = 0xffff
+
+
+def question_key(question):
+    '''
+    Returns a 64 bit key identifying a question, which survives changes in
+    whitespace, case, accents and punctuation, in its answer, and the
+    question moving to another file.
+    '''
+    text = normalize(question)
+    return int.from_bytes(hashlib.blake2b(text.encode('utf8'), digest_size=8).digest(), 'little')
+
+
+def outcome(solved, seconds, round_seconds):
+    '''
+    Scores a round between 0 (solved at once) and 1 (nobody solved it).
+    A solve counts for at most 0.9, growing with the time it took.
+    '''
+    if not solved:
+        return 1.0
+    return 0.9 * min(1.0, max(0.0, seconds) / round_seconds)
+
+
+class DifficultyTable:
+    '''
+    How hard every question asked so far turned out to be.
+
+    Each question takes one fixed size record, with how many times it was
+    asked and solved, the sum of its outcomes and of the clue numbers it was
+    solved at, so the estimate is a smoothed mean updated in constant time.
+    Questions never asked have no record and no estimate.
+
+    save() rewrites the whole file atomically and is meant to run in a
+    worker thread with what snapshot() returned. Saves running at the same
+    time take turns, and one finishing after the save of a newer snapshot
+    writes nothing.
+    '''
+
+    def __init__(self, path):
+        self._path = path
+        self._entries = {}
+        self.dirty = False
+        self._lock = threading.Lock()
+        self._snapshots = 0
+        self._saved = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self._path, 'rb') as fd:
+                data = fd.read()
+        except FileNotFoundError:
+            return
+        if data.startswith(MAGIC):
+            record = RECORD
+        elif data.startswith(MAGIC_V1):
+            record = RECORD_V1
+        else:
+            return
+        body = memoryview(data)[len(MAGIC):]
+        # Drop a record cut short, there are none unless the file was
+        # damaged.
+        body = body[:len(body) - len(body) % record.size]
+        for fields in record.iter_unpack(body):
+            key, asked, solved, total = fields[:4]
+            clued, clues = fields[4:] or (0, 0.0)
+            self._entries[key] = [asked, solved, total, clued, clues]
+
+    def record(self, question, solved, seconds, round_seconds, clue=None):
+        '''
+        Adds the outcome of a round, solved at the given clue number if
+        known. Returns the new estimate.
+        '''
+        key = question_key(question)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._entries[key] = [0, 0, 0.0, 0, 0.0]
+        if entry[0] == MAX_COUNT:
+            # Keep the means, forget half of the history.
+            entry[0] //= 2
+            entry[1] //= 2
+            entry[2] /= 2
+            entry[3] //= 2
+            entry[4] /= 2
+        entry[0] += 1
+        entry[1] += bool(solved)
+        entry[2] += outcome(solved, seconds, round_seconds)
+        if solved and clue is not None:
+            entry[3] += 1
+            entry[4] += clue
+        self.dirty = True
+        return self._estimate(entry)
+
+    @staticmethod
+    def _estimate(entry):
+        return (PRIOR * PRIOR_WEIGHT + entry[2]) / (PRIOR_WEIGHT + entry[0])
+
+    def get(self, question):
+        '''
+        Returns the difficulty of a question between 0 and 1, or None if it
+        was never asked.
+        '''
+        entry = self._entries.get(question_key(question))
+        return None if entry is None else self._estimate(entry)
+
+    def stats(self, question):
+        '''
+        Returns (asked, solved) for a question.
+        '''
+        entry = self._entries.get(question_key(question), (0, 0))
+        return entry[0], entry[1]
+
+    def clue(self, question):
+        '''
+        Returns the mean clue number a question was solved at, or None if
+        it never was.
+        '''
+        entry = self._entries.get(question_key(question))
+        if entry is None or not entry[3]:
+            return None
+        return entry[4] / entry[3]
+
+    def snapshot(self):
+        '''
+        Returns the entries to save, numbered.
+        '''
+        self.dirty = False
+        self._snapshots += 1
+        return self._snapshots, [(key, *entry) for key, entry in self._entries.items()]
+
+    def save(self, snapshot):
+        number, entries = snapshot
+        with self._lock:
+            if number <= self._saved:
+                return
+            tmp = self._path + '.tmp'
+            with open(tmp, 'wb') as fd:
+                fd.write(MAGIC)
+                fd.write(b''.join(RECORD.pack(*entry) for entry in entries))
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(tmp, self._path)
+            self._saved = number
+
+    def __len__(self):
+        return len(self._entries)
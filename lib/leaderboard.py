@@ -0,0 +1,106 @@
+from collections.abc import MutableMapping
+
+from sortedcontainers import SortedList
+
+
+class Leaderboard(MutableMapping):
+    '''
+    Player scores, kept ordered by score.
+
+    Behaves like a dict of player -> score, but also keeps every player in
+    a sorted list so ranks and top-k queries cost O(log n) instead of a
+    full sort. Ties are broken by nick.
+
+    The sum of the scores of the top_k best players is kept up to date on
+    every change, also in O(log n), so top_average() is a constant time
+    read.
+    '''
+
+    def __init__(self, scores=None, top_k=10):
+        self._scores = {}
+        self._order = SortedList()
+        self.total = 0
+        self._top_k = top_k
+        self.top_sum = 0
+        if scores:
+            self.update(scores)
+
+    def _insert(self, entry):
+        self._order.add(entry)
+        if self._order.bisect_left(entry) < self._top_k:
+            self.top_sum -= entry[0]
+            if len(self._order) > self._top_k:
+                # The player at position top_k was pushed out.
+                self.top_sum += self._order[self._top_k][0]
+
+    def _remove(self, entry):
+        position = self._order.bisect_left(entry)
+        del self._order[position]
+        if position < self._top_k:
+            self.top_sum += entry[0]
+            if len(self._order) >= self._top_k:
+                # The player at position top_k moved in.
+                self.top_sum -= self._order[self._top_k - 1][0]
+
+    def __getitem__(self, user):
+        return self._scores[user]
+
+    def __setitem__(self, user, score):
+        old = self._scores.get(user)
+        if old is not None:
+            self._remove((-old, user))
+            self.total -= old
+        self._scores[user] = score
+        self._insert((-score, user))
+        self.total += score
+
+    def __delitem__(self, user):
+        score = self._scores.pop(user)
+        self._remove((-score, user))
+        self.total -= score
+
+    def __contains__(self, user):
+        return user in self._scores
+
+    def __iter__(self):
+        return iter(self._scores)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def add(self, user, points):
+        '''
+        Adds points to a user, creating it if needed. Returns the new score.
+        '''
+        score = self._scores.get(user, 0) + points
+        self[user] = score
+        return score
+
+    def rank(self, user):
+        '''
+        Returns (rank, score, after) for a user, where after is the player
+        ranked right above, or None if the user has no score.
+        '''
+        score = self._scores.get(user)
+        if score is None:
+            return None
+        position = self._order.bisect_left((-score, user))
+        after = self._order[position - 1][1] if position else None
+        return position + 1, score, after
+
+    def top(self, n):
+        '''
+        Returns the n best ranked players as (player, score) pairs.
+        '''
+        return [(player, -score) for score, player in self._order.islice(0, n)]
+
+    def top_average(self, n):
+        '''
+        Returns the average score of the n best players. Tracking switches
+        to n, at the cost of one O(n log n) recount, if it differs from the
+        current top_k.
+        '''
+        if n != self._top_k:
+            self._top_k = n
+            self.top_sum = sum(score for _, score in self.top(n))
+        return self.top_sum / min(n, len(self._scores))
@@ -0,0 +1,114 @@
+import atexit
+import json
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+TEXT_FORMAT = '%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s'
+
+# Attributes every record has, anything else was passed through extra=.
+_STANDARD = frozenset(logging.LogRecord('', 0, '', 0, '', None, None).__dict__) | {'message', 'asctime'}
+
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    '''
+    Formats records as JSON lines, with the fields passed through extra=
+    as keys of their own.
+    '''
+
+    def format(self, record):
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(QueueHandler):
+
+    def prepare(self, record):
+        # Only merge the arguments here, formatting and writing is left to
+        # the listener thread.
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class Sampler(logging.Filter):
+    '''
+    Lets through a fraction of the records, evenly spaced.
+    '''
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._credit = 0.0
+
+    def filter(self, record):
+        self._credit += self.rate
+        if self._credit >= 1:
+            self._credit -= 1
+            return True
+        return False
+
+
+def setup(path=None, level='INFO', format='text', max_bytes=10 * 1024 * 1024, backups=5,
+          chat_sample=1.0, chat_logger='trivia.chat'):
+    '''
+    Sends every log record through a queue to a thread that writes them to
+    path, rotated once it reaches max_bytes, or to stdout. Only
+    chat_sample of the records of chat_logger are kept.
+
+    The queue is flushed by stop(), which also runs at exit.
+    '''
+    global _listener
+    stop()
+    if path:
+        sink = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding='utf8')
+    else:
+        sink = logging.StreamHandler(sys.stdout)
+    sink.setFormatter(JsonFormatter() if format == 'json' else logging.Formatter(TEXT_FORMAT))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    root.setLevel(level.upper() if isinstance(level, str) else level)
+
+    chat = logging.getLogger(chat_logger)
+    for old in [f for f in chat.filters if isinstance(f, Sampler)]:
+        chat.removeFilter(old)
+    if chat_sample < 1:
+        chat.addFilter(Sampler(chat_sample))
+
+    _listener = QueueListener(records, sink, respect_handler_level=True)
+    _listener.start()
+
+
+def stop():
+    '''
+    Writes out the queued records and stops the writer thread.
+    '''
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop)
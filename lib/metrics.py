@@ -0,0 +1,208 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ContextDecorator
+
+# Seconds, for timing code running in the reactor.
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return repr(value) if value != float('inf') else '+Inf'
+    return str(value)
+
+
+class Counter:
+    '''
+    A value that only goes up.
+    '''
+
+    type = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, self.value
+
+
+class Gauge:
+    '''
+    A value that goes up and down, either set directly or read from a
+    function when the metrics are collected.
+    '''
+
+    type = 'gauge'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+        self._function = None
+
+    def set(self, value):
+        self.value = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def samples(self):
+        yield self.name, self._function() if self._function is not None else self.value
+
+
+class _Timer(ContextDecorator):
+
+    def __init__(self, histogram):
+        self._histogram = histogram
+
+    def _recreate_cm(self):
+        # Each decorated call gets its own start time.
+        return _Timer(self._histogram)
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._histogram.observe(time.perf_counter() - self._start)
+        return False
+
+
+class Histogram:
+    '''
+    Counts observations into cumulative buckets, keeping their sum.
+    Observations may come from worker threads.
+    '''
+
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        '''
+        Returns a context manager, also usable as a decorator, observing
+        the seconds spent in its block.
+        '''
+        return _Timer(self)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            yield '{}_bucket{{le="{}"}}'.format(self.name, _format(float(bound))), cumulative
+        yield self.name + '_sum', total
+        yield self.name + '_count', count
+
+
+class Registry:
+    '''
+    A set of metrics rendered together in the Prometheus text format.
+    '''
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        '''
+        Adds a metric. Returns the metric already registered with the same
+        name if there is one, so modules can be imported again safely.
+        '''
+        return self._metrics.setdefault(metric.name, metric)
+
+    def render(self):
+        lines = []
+        for metric in self._metrics.values():
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.type))
+            for name, value in metric.samples():
+                lines.append('{} {}'.format(name, _format(value)))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def counter(name, help):
+    return REGISTRY.register(Counter(name, help))
+
+
+def gauge(name, help):
+    return REGISTRY.register(Gauge(name, help))
+
+
+def histogram(name, help, buckets=DEFAULT_BUCKETS):
+    return REGISTRY.register(Histogram(name, help, buckets))
+
+
+REACTOR_LAG = histogram('trivia_reactor_lag_seconds', 'How late timed calls run in the reactor')
+
+
+class LagMonitor:
+    '''
+    Measures how late the reactor runs a call scheduled every interval
+    seconds. A busy or blocked reactor delays every timer in the bot by
+    as much.
+    '''
+
+    def __init__(self, interval=1, histogram=REACTOR_LAG, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._interval = interval
+        self._histogram = histogram
+        self._call = None
+
+    def start(self):
+        self._expected = self._reactor.seconds() + self._interval
+        self._call = self._reactor.callLater(self._interval, self._tick)
+
+    def _tick(self):
+        self._histogram.observe(max(0.0, self._reactor.seconds() - self._expected))
+        self.start()
+
+    def stop(self):
+        if self._call is not None and self._call.active():
+            self._call.cancel()
+        self._call = None
+
+
+def listen(port, interface='127.0.0.1', registry=REGISTRY, reactor=None):
+    '''
+    Serves the metrics over HTTP on the given port, from the running
+    reactor. Returns the listening port.
+    '''
+    if reactor is None:
+        from twisted.internet import reactor
+    from twisted.web.resource import Resource
+    from twisted.web.server import Site
+
+    class MetricsResource(Resource):
+        isLeaf = True
+
+        def render_GET(self, request):
+            request.setHeader(b'content-type', b'text/plain; version=0.0.4; charset=utf-8')
+            return registry.render().encode('utf8')
+
+    return reactor.listenTCP(port, Site(MetricsResource()), interface=interface)
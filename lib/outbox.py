@@ -0,0 +1,154 @@
+from collections import OrderedDict, deque
+
+from twisted.internet.defer import Deferred
+
+# Lanes, from the most to the least urgent.
+GAME, INFO, PRIVATE = range(3)
+
+SEPARATOR = ' | '
+# Bold, color, reset, reverse, italic and underline codes.
+_FORMATTING = frozenset('\x02\x03\x0f\x16\x1d\x1f')
+
+
+class Outbox:
+    '''
+    Paces outgoing messages, sending at most one line every rate seconds.
+
+    Messages wait in one of three lanes and a lane is only served when the
+    more urgent ones are empty, so clues and answers in a game channel are
+    not stuck behind a long private reply. Within a lane, targets take turns
+    one line at a time. Messages queued for the same target in the same
+    lane are merged into one line while it stays under max_length bytes.
+
+    Lines queued with put_line(), like MODE commands, are paced the same
+    way but are never merged and reach send with None as their target.
+
+    With no rate, messages are sent as soon as they are queued.
+    '''
+
+    def __init__(self, send, rate=None, max_length=350, coalesce=True, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self._send = send
+        self._lanes = [OrderedDict() for _ in range(PRIVATE + 1)]
+        self._size = 0
+        self._call = None
+        self._next = 0
+        # Deferreds waiting for the outbox to empty, see drain().
+        self._drained = []
+        self._drain_timeout = None
+        self.rate = rate
+        self.max_length = max_length
+        self.coalesce = coalesce
+
+    def put(self, target, text, lane=PRIVATE):
+        '''
+        Queues a message for target in the given lane.
+        '''
+        queue = self._lanes[lane].get(target)
+        if queue is None:
+            queue = self._lanes[lane][target] = deque()
+        queue.append(text)
+        self._size += 1
+        if not self.rate:
+            self.flush()
+        elif self._call is None:
+            delay = max(0, self._next - self._reactor.seconds())
+            self._call = self._reactor.callLater(delay, self._send_next)
+
+    def put_line(self, line, lane=PRIVATE):
+        '''
+        Queues a raw IRC line in the given lane.
+        '''
+        self.put(None, line, lane)
+
+    def _join(self, text, following):
+        if _FORMATTING.intersection(text):
+            text += '\x0f'
+        return text + SEPARATOR + following
+
+    def pop(self):
+        '''
+        Takes the next line to send as (target, text), or None.
+        '''
+        for lane in self._lanes:
+            if not lane:
+                continue
+            target, queue = next(iter(lane.items()))
+            text = queue.popleft()
+            self._size -= 1
+            while self.coalesce and target is not None and queue:
+                joined = self._join(text, queue[0])
+                if len(joined.encode('utf8')) > self.max_length:
+                    break
+                text = joined
+                queue.popleft()
+                self._size -= 1
+            if queue:
+                lane.move_to_end(target)
+            else:
+                del lane[target]
+            return target, text
+        return None
+
+    def _send_next(self):
+        self._call = None
+        line = self.pop()
+        if line is None:
+            return
+        self._send(*line)
+        self._next = self._reactor.seconds() + self.rate
+        if self._size:
+            self._call = self._reactor.callLater(self.rate, self._send_next)
+        else:
+            self._emptied()
+
+    def flush(self):
+        '''
+        Sends everything queued right away.
+        '''
+        line = self.pop()
+        while line is not None:
+            self._send(*line)
+            line = self.pop()
+        self._emptied()
+
+    def clear(self):
+        '''
+        Drops everything queued.
+        '''
+        if self._call is not None:
+            self._call.cancel()
+            self._call = None
+        for lane in self._lanes:
+            lane.clear()
+        self._size = 0
+        self._emptied()
+
+    def drain(self, timeout):
+        '''
+        Returns a Deferred fired once everything queued is sent, still at
+        one line every rate seconds, or after timeout seconds, when what is
+        left is dropped.
+        '''
+        d = Deferred()
+        if not self._size:
+            d.callback(None)
+            return d
+        self._drained.append(d)
+        if self._drain_timeout is None:
+            self._drain_timeout = self._reactor.callLater(timeout, self.clear)
+        return d
+
+    def _emptied(self):
+        if self._drain_timeout is not None:
+            if self._drain_timeout.active():
+                self._drain_timeout.cancel()
+            self._drain_timeout = None
+        drained, self._drained = self._drained, []
+        for d in drained:
+            d.callback(None)
+
+    def __len__(self):
+        return self._size
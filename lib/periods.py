@@ -0,0 +1,178 @@
+import time
+from collections import deque
+
+from lib.leaderboard import Leaderboard
+
+DAY = 24 * 60 * 60
+# name: (length in seconds, buckets)
+WINDOWS = {
+    'day': (DAY, 24),
+    'week': (7 * DAY, 28),
+    'month': (30 * DAY, 30),
+}
+HALF_LIFE = 7 * DAY
+DECAYED = 'recent'
+
+# Decayed scores are rescaled before their factor grows past 2 ** MAX_HALVINGS.
+MAX_HALVINGS = 32
+
+
+class WindowedScores:
+    '''
+    Points won in the last length seconds.
+
+    Wins are counted in buckets of length / buckets seconds, and the
+    points of a whole bucket leave the window at once, so a win counts for
+    between length minus one bucket and length seconds. The totals of the
+    window are kept in a Leaderboard updated as wins come in and buckets
+    expire, so queries cost the same as for the all-time scores.
+    '''
+
+    def __init__(self, length, buckets, top_k=10):
+        self.length = length
+        self.buckets = buckets
+        self.bucket_seconds = length / buckets
+        # (bucket number, {user: points}), oldest first.
+        self._buckets = deque()
+        self.scores = Leaderboard(top_k=top_k)
+
+    def _expire(self, now):
+        newest = int(now // self.bucket_seconds)
+        if self._buckets:
+            newest = max(newest, self._buckets[-1][0])
+        oldest = newest - self.buckets + 1
+        while self._buckets and self._buckets[0][0] < oldest:
+            _, points = self._buckets.popleft()
+            for user, p in points.items():
+                if user not in self.scores:
+                    continue
+                score = self.scores[user] - p
+                if score:
+                    self.scores[user] = score
+                else:
+                    del self.scores[user]
+        return oldest
+
+    def add(self, user, points, now):
+        number = int(now // self.bucket_seconds)
+        if number < self._expire(now):
+            return
+        if self._buckets and self._buckets[-1][0] >= number:
+            # Also when the clock went back a little.
+            bucket = self._buckets[-1][1]
+        else:
+            bucket = {}
+            self._buckets.append((number, bucket))
+        bucket[user] = bucket.get(user, 0) + points
+        self.scores.add(user, points)
+
+    def rank(self, user, now):
+        '''
+        Returns (rank, score, after) like Leaderboard.rank().
+        '''
+        self._expire(now)
+        return self.scores.rank(user)
+
+    def top(self, n, now):
+        self._expire(now)
+        return self.scores.top(n)
+
+
+class DecayedScores:
+    '''
+    Scores losing half their value every half_life seconds.
+
+    Every score decays at the same rate, so their order doesn't change as
+    time passes. Points are stored multiplied by 2 ** (t / half_life), t
+    being the time since an origin, which keeps them comparable with the
+    ones won earlier; only the values shown are divided back by the same
+    factor at the time of the query.
+    '''
+
+    def __init__(self, half_life, top_k=10):
+        self.half_life = half_life
+        self._origin = None
+        self._top_k = top_k
+        self.scores = Leaderboard(top_k=top_k)
+
+    def _factor(self, now):
+        return 2 ** ((now - self._origin) / self.half_life)
+
+    def _rebase(self, now):
+        scale = self._factor(now)
+        # Scores below a point are dropped.
+        self.scores = Leaderboard(
+            ((user, score / scale) for user, score in self.scores.items() if score >= scale), top_k=self._top_k
+        )
+        self._origin = now
+
+    def add(self, user, points, now):
+        if self._origin is None:
+            self._origin = now
+        elif (now - self._origin) / self.half_life > MAX_HALVINGS:
+            self._rebase(now)
+        self.scores.add(user, points * self._factor(now))
+
+    def rank(self, user, now):
+        '''
+        Returns (rank, score, after) like Leaderboard.rank(), the score
+        being rounded.
+        '''
+        rank = self.scores.rank(user)
+        if rank is None:
+            return None
+        return rank[0], round(rank[1] / self._factor(now)), rank[2]
+
+    def top(self, n, now):
+        if self._origin is None:
+            return []
+        factor = self._factor(now)
+        # The best come first, so the scores rounded to 0 are at the end.
+        top = [(user, round(score / factor)) for user, score in self.scores.top(n)]
+        return [(user, score) for user, score in top if score]
+
+
+class Periods:
+    '''
+    The leaderboards of the points won recently, by name: one per window of
+    windows (name: (length, buckets)) and, with a half_life, DECAYED for
+    the decayed scores.
+    '''
+
+    def __init__(self, windows=None, half_life=HALF_LIFE):
+        if windows is None:
+            windows = WINDOWS
+        self.boards = {name: WindowedScores(length, buckets) for name, (length, buckets) in windows.items()}
+        if half_life:
+            self.boards[DECAYED] = DecayedScores(half_life)
+
+    def add(self, user, points, now=None):
+        if not points:
+            return
+        if now is None:
+            now = time.time()
+        for board in self.boards.values():
+            board.add(user, points, now)
+
+    def replay(self, history, until=None):
+        '''
+        Adds the wins of an answer history, oldest first, up to the time
+        until. Returns the number of wins added.
+        '''
+        wins = 0
+        for entry in history:
+            if until is not None and entry['time'] >= until:
+                break
+            if entry['points']:
+                self.add(entry['user'], entry['points'], entry['time'])
+                wins += 1
+        return wins
+
+    def __getitem__(self, name):
+        return self.boards[name]
+
+    def __contains__(self, name):
+        return name in self.boards
+
+    def __iter__(self):
+        return iter(self.boards)
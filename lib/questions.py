@@ -0,0 +1,302 @@
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_right
+from itertools import groupby
+from random import randrange
+
+PACK_MAGIC = b'TRIVPAK1'
+# magic, questions, categories, offset of the category names, offset of the
+# text blob.
+PACK_HEADER = struct.Struct('<8sIIQQ')
+
+
+def parse_question(line):
+    '''
+    Splits a raw question`answer line. Returns None if the line is broken.
+    '''
+    parts = line.split('`')
+    if len(parts) != 2:
+        return None
+    question, answer = parts[0].strip(), parts[1].strip()
+    if not question or not answer:
+        return None
+    return question, answer
+
+
+class _IndexedFile:
+    '''
+    Contents of a single question file together with the offsets of its
+    valid lines. The text is kept as one bytes blob so a question costs
+    only a slice and a decode to fetch.
+    '''
+
+    def __init__(self, path, stat):
+        self.path = path
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.offsets = array('Q')
+        self.broken = 0
+
+        with open(path, 'rb') as fd:
+            self._data = fd.read()
+
+        start = 0
+        end = len(self._data)
+        while start < end:
+            stop = self._data.find(b'\n', start)
+            if stop == -1:
+                stop = end
+            if parse_question(self._line(start, stop)) is not None:
+                self.offsets.append(start)
+            elif self._data[start:stop].strip():
+                self.broken += 1
+            start = stop + 1
+
+    def _line(self, start, stop):
+        return self._data[start:stop].decode('utf8', errors='ignore')
+
+    def changed(self, stat):
+        return stat.st_mtime_ns != self.mtime or stat.st_size != self.size
+
+    def get(self, i):
+        start = self.offsets[i]
+        stop = self._data.find(b'\n', start)
+        if stop == -1:
+            stop = len(self._data)
+        return parse_question(self._line(start, stop))
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+class QuestionIndex:
+    '''
+    Index of every valid question under a directory.
+
+    Files are read once and kept as byte blobs with a table of line offsets,
+    so picking a question does no file I/O. Call refresh() to pick up
+    changes; only files that were added, removed or modified are re-read.
+    '''
+
+    def __init__(self, directory):
+        self._directory = directory
+        self._files = {}
+        self._order = []
+        self._bounds = []
+        self.refresh()
+
+    def _scan(self):
+        for root, dirs, files in os.walk(self._directory):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                try:
+                    yield path, os.stat(path)
+                except OSError:
+                    continue
+
+    def refresh(self):
+        '''
+        Re-indexes the files that changed since the last scan.
+
+        Returns True if the index was modified.
+        '''
+        seen = {}
+        modified = False
+        for path, stat in self._scan():
+            indexed = self._files.get(path)
+            if indexed is None or indexed.changed(stat):
+                try:
+                    indexed = _IndexedFile(path, stat)
+                except OSError:
+                    continue
+                modified = True
+            seen[path] = indexed
+
+        if modified or len(seen) != len(self._files):
+            self._files = seen
+            self._rebuild_bounds()
+            return True
+        return False
+
+    def _rebuild_bounds(self):
+        self._order = [f for f in self._files.values() if len(f)]
+        self._bounds = []
+        total = 0
+        for indexed in self._order:
+            total += len(indexed)
+            self._bounds.append(total)
+
+    @property
+    def broken(self):
+        '''
+        Number of malformed lines skipped while indexing.
+        '''
+        return sum(f.broken for f in self._files.values())
+
+    def spans(self):
+        '''
+        Yields (category, start, stop) for the runs of positions sharing a
+        category. The category of a question is the path of its file
+        relative to the directory.
+        '''
+        start = 0
+        for indexed, stop in zip(self._order, self._bounds):
+            yield os.path.relpath(indexed.path, self._directory).replace(os.sep, '/'), start, stop
+            start = stop
+
+    def get(self, i):
+        '''
+        Returns the (question, answer) pair at position i of the index.
+        '''
+        n = bisect_right(self._bounds, i)
+        if i < 0 or n >= len(self._order):
+            raise IndexError('question index out of range')
+        first = self._bounds[n - 1] if n else 0
+        return self._order[n].get(i - first)
+
+    def random(self):
+        '''
+        Returns a uniformly random (question, answer) pair.
+        '''
+        if not len(self):
+            raise IndexError('no questions in {}'.format(self._directory))
+        return self.get(randrange(len(self)))
+
+    def __len__(self):
+        return self._bounds[-1] if self._bounds else 0
+
+
+def write_pack(path, questions):
+    '''
+    Writes (question, answer, category) tuples to a question pack.
+
+    A pack is a header, a table with the offsets of every question and
+    answer in the text blob, the category number of every question, the
+    category names and the UTF-8 text blob itself. The file is written to a
+    temporary name and renamed into place, so a bot reading the previous
+    pack is never disturbed.
+    '''
+    offsets = array('I')
+    category_ids = array('H')
+    categories = {}
+    blob = bytearray()
+    for question, answer, category in questions:
+        offsets.append(len(blob))
+        blob += question.encode('utf8')
+        offsets.append(len(blob))
+        blob += answer.encode('utf8')
+        category_ids.append(categories.setdefault(category, len(categories)))
+    offsets.append(len(blob))
+    if len(blob) >= 1 << 32 or len(categories) >= 1 << 16:
+        raise ValueError('corpus too big for a question pack')
+    if len(category_ids) % 2:
+        category_ids.append(0)
+
+    names = bytearray()
+    for category in categories:
+        encoded = category.encode('utf8')
+        names += struct.pack('<I', len(encoded)) + encoded
+
+    names_offset = PACK_HEADER.size + len(offsets) * 4 + len(category_ids) * 2
+    blob_offset = names_offset + len(names)
+    header = PACK_HEADER.pack(PACK_MAGIC, len(offsets) // 2, len(categories), names_offset, blob_offset)
+
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as fd:
+        fd.write(header)
+        fd.write(offsets.tobytes())
+        fd.write(category_ids.tobytes())
+        fd.write(names)
+        fd.write(blob)
+    os.replace(tmp, path)
+
+
+class QuestionPack:
+    '''
+    Questions read from a pack written by write_pack().
+
+    The pack is memory mapped, so loading it costs next to nothing and the
+    pages are shared between bots using the same file. Every question in it
+    was validated when it was compiled. refresh() maps the file again when
+    it was replaced.
+    '''
+
+    broken = 0
+
+    def __init__(self, path):
+        self._path = path
+        self._mtime = None
+        self.refresh()
+
+    def refresh(self):
+        '''
+        Maps the pack again if the file changed. Returns True if it did.
+        '''
+        mtime = os.stat(self._path).st_mtime_ns
+        if mtime == self._mtime:
+            return False
+        with open(self._path, 'rb') as fd:
+            data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count, n_categories, names_offset, blob_offset = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC:
+            raise ValueError('{} is not a question pack'.format(self._path))
+
+        view = memoryview(data)
+        start = PACK_HEADER.size
+        self._offsets = view[start:start + (2 * count + 1) * 4].cast('I')
+        start += (2 * count + 1) * 4
+        self._category_ids = view[start:start + count * 2].cast('H')
+
+        self.categories = []
+        position = names_offset
+        for _ in range(n_categories):
+            length, = struct.unpack_from('<I', data, position)
+            position += 4
+            self.categories.append(data[position:position + length].decode('utf8'))
+            position += length
+
+        self._blob = view[blob_offset:]
+        self._count = count
+        self._data = data
+        self._mtime = mtime
+        return True
+
+    def category(self, i):
+        '''
+        Returns the category of the question at position i.
+        '''
+        return self.categories[self._category_ids[i]]
+
+    def spans(self):
+        '''
+        Yields (category, start, stop) for the runs of positions sharing a
+        category.
+        '''
+        start = 0
+        for category_id, run in groupby(self._category_ids):
+            stop = start + sum(1 for _ in run)
+            yield self.categories[category_id], start, stop
+            start = stop
+
+    def get(self, i):
+        '''
+        Returns the (question, answer) pair at position i of the pack.
+        '''
+        if not 0 <= i < self._count:
+            raise IndexError('question index out of range')
+        q, a, end = self._offsets[2 * i], self._offsets[2 * i + 1], self._offsets[2 * i + 2]
+        return str(self._blob[q:a], 'utf8'), str(self._blob[a:end], 'utf8')
+
+    def random(self):
+        '''
+        Returns a uniformly random (question, answer) pair.
+        '''
+        if not self._count:
+            raise IndexError('no questions in {}'.format(self._path))
+        return self.get(randrange(self._count))
+
+    def __len__(self):
+        return self._count
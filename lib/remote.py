@@ -0,0 +1,121 @@
+import logging
+from collections import deque
+from random import shuffle, uniform
+
+from twisted.internet import reactor as default_reactor
+from twisted.web.client import Agent, readBody
+
+from lib.questions import parse_question
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteQuestionSource:
+    '''
+    Keeps a bounded buffer of questions fetched from an HTTP endpoint.
+
+    The endpoint is expected to answer with one or more question`answer
+    lines. Fetches run asynchronously on the reactor and never block it;
+    failures are retried with jittered exponential backoff. pop() only
+    reads from the buffer and returns None when it is empty, so callers
+    can fall back to another source.
+    '''
+
+    def __init__(self, url, size=20, timeout=10, min_backoff=1, max_backoff=300,
+                 reactor=None, agent=None):
+        self._url = url.encode() if isinstance(url, str) else url
+        self._buffer = deque(maxlen=size)
+        self._size = size
+        self._timeout = timeout
+        self._min_backoff = min_backoff
+        self._max_backoff = max_backoff
+        self._backoff = min_backoff
+        self._reactor = reactor or default_reactor
+        self._agent = agent or Agent(self._reactor)
+        self._fetching = None
+        self._retry = None
+        self._running = False
+        self.failures = 0
+
+    def start(self):
+        self._running = True
+        self._refill()
+
+    def stop(self):
+        self._running = False
+        if self._retry is not None and self._retry.active():
+            self._retry.cancel()
+        self._retry = None
+        if self._fetching is not None:
+            self._fetching.cancel()
+
+    def pop(self):
+        '''
+        Returns a buffered (question, answer) pair, or None if there is none.
+        '''
+        try:
+            question = self._buffer.popleft()
+        except IndexError:
+            question = None
+        if len(self._buffer) <= self._size // 2:
+            self._refill()
+        return question
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _refill(self):
+        if not self._running or self._fetching is not None or self._retry is not None:
+            return
+        if len(self._buffer) >= self._size:
+            return
+
+        d = self._agent.request(b'GET', self._url)
+        d.addCallback(self._check_response)
+        d.addTimeout(self._timeout, self._reactor)
+        d.addCallback(self._fetched)
+        d.addErrback(self._failed)
+        d.addBoth(self._done)
+        self._fetching = d
+
+    def _check_response(self, response):
+        if response.code != 200:
+            raise ValueError('{} returned HTTP {}'.format(self._url.decode(), response.code))
+        return readBody(response)
+
+    def _fetched(self, body):
+        questions = []
+        for line in body.decode('utf8', errors='ignore').splitlines():
+            parsed = parse_question(line)
+            if parsed is not None:
+                questions.append(parsed)
+        if not questions:
+            raise ValueError('{} returned no valid questions'.format(self._url.decode()))
+        shuffle(questions)
+        free = self._size - len(self._buffer)
+        self._buffer.extend(questions[:free])
+        self._backoff = self._min_backoff
+        return True
+
+    def _failed(self, failure):
+        if not self._running:
+            # The request was cancelled by stop().
+            return False
+        self.failures += 1
+        logger.warning('Failed to fetch questions from %s: %s', self._url.decode(), failure.getErrorMessage())
+        return False
+
+    def _done(self, result):
+        self._fetching = None
+        if not self._running:
+            return
+        if result is True:
+            self._refill()
+            return
+        delay = uniform(self._backoff / 2, self._backoff)
+        self._backoff = min(self._backoff * 2, self._max_backoff)
+        self._retry = self._reactor.callLater(delay, self._retry_refill)
+
+    def _retry_refill(self):
+        self._retry = None
+        self._refill()
@@ -0,0 +1,120 @@
+from array import array
+from bisect import bisect_right
+from random import random, randrange
+
+# Draws before giving up on avoiding a recent question, for when nearly the
+# whole corpus is in the window.
+MAX_DRAWS = 32
+
+
+class QuestionScheduler:
+    '''
+    Picks questions from a source (a QuestionIndex or a QuestionPack)
+    without repeating any of the last window questions.
+
+    Every question is equally likely, times the weight of its category.
+    weights maps categories to weights. A key also applies to every
+    category below it, so 'science' covers 'science/physics', and the most
+    specific key wins. Categories without a weight count as 1 and a weight
+    of 0 disables a category.
+
+    Recent questions are kept as positions in a ring, plus a bitset for
+    constant-time lookups, so the window costs a few bytes per question and
+    never holds question text. Call rebuild() after the source changed.
+
+    With a difficulty table and a (low, high) band, questions known to be
+    easier or harder than the band are drawn again. Questions never asked
+    are always accepted, so new ones get a chance to be measured.
+    '''
+
+    def __init__(self, source, weights=None, window=0, difficulty=None, band=None):
+        self._source = source
+        self.weights = weights or {}
+        self.window = window
+        self.difficulty = difficulty
+        self.band = band
+        self.rebuild()
+
+    def weight(self, category):
+        '''
+        Returns the weight of a category.
+        '''
+        while True:
+            if category in self.weights:
+                return self.weights[category]
+            if '/' not in category:
+                return 1
+            category = category.rsplit('/', 1)[0]
+
+    def rebuild(self):
+        '''
+        Recomputes the spans to draw from and forgets the recent questions,
+        whose positions may not be valid anymore.
+        '''
+        self._starts = array('Q')
+        self._sizes = array('Q')
+        self._cumulative = []
+        total = 0.0
+        for category, start, stop in self._source.spans():
+            weight = self.weight(category)
+            if weight > 0 and stop > start:
+                total += weight * (stop - start)
+                self._starts.append(start)
+                self._sizes.append(stop - start)
+                self._cumulative.append(total)
+        eligible = sum(self._sizes)
+        self._ring = array('q', [-1]) * max(0, min(self.window, eligible - 1))
+        self._head = 0
+        self._seen = bytearray((len(self._source) + 7) // 8)
+
+    def _draw(self):
+        n = bisect_right(self._cumulative, random() * self._cumulative[-1])
+        n = min(n, len(self._cumulative) - 1)
+        return self._starts[n] + randrange(self._sizes[n])
+
+    def _recent(self, i):
+        return self._seen[i >> 3] & (1 << (i & 7))
+
+    def _remember(self, i):
+        if not self._ring or self._recent(i):
+            return
+        old = self._ring[self._head]
+        if old >= 0:
+            self._seen[old >> 3] &= ~(1 << (old & 7)) & 0xff
+        self._ring[self._head] = i
+        self._seen[i >> 3] |= 1 << (i & 7)
+        self._head = (self._head + 1) % len(self._ring)
+
+    def _in_band(self, i):
+        if self.band is None or self.difficulty is None:
+            return True
+        difficulty = self.difficulty.get(self._source.get(i)[0])
+        return difficulty is None or self.band[0] <= difficulty <= self.band[1]
+
+    def pick(self):
+        '''
+        Returns the position of the next question in the source.
+        '''
+        if not self._cumulative:
+            raise IndexError('no questions to schedule')
+        fallback = None
+        for _ in range(MAX_DRAWS):
+            i = self._draw()
+            if self._recent(i):
+                continue
+            if self._in_band(i):
+                break
+            if fallback is None:
+                fallback = i
+        else:
+            # Nothing new in the band, settle for something new.
+            if fallback is not None:
+                i = fallback
+        self._remember(i)
+        return i
+
+    def next(self):
+        '''
+        Returns the next (question, answer) pair.
+        '''
+        return self._source.get(self.pick())
@@ -0,0 +1,86 @@
+import logging
+import time
+
+from twisted.internet import threads
+
+from lib import metrics
+from lib.leaderboard import Leaderboard
+
+logger = logging.getLogger(__name__)
+
+SAVE_SECONDS = metrics.histogram('trivia_save_seconds', 'Time spent writing scores to the store')
+SAVE_FAILURES = metrics.counter('trivia_save_failures_total', 'Failed score saves')
+
+
+class Scoreboard:
+    '''
+    A leaderboard together with the store it is saved to.
+
+    Several games can share a scoreboard. Score changes go to the store as
+    they happen and save() writes them out in a worker thread.
+
+    With periods, the leaderboards of recent wins are rebuilt from the
+    answer history in a worker thread, and periods is None until they are
+    ready. Wins made meanwhile are added once the history is replayed.
+    '''
+
+    def __init__(self, store, periods=None):
+        self.store = store
+        self.scores = Leaderboard(store.load())
+        self.periods = None
+        self._pending = None
+        if periods is not None:
+            self._load_periods(periods)
+
+    def _load_periods(self, periods):
+        self._pending = []
+        d = threads.deferToThread(periods.replay, self.store.history(), time.time())
+        d.addCallbacks(lambda wins: self._periods_loaded(periods, wins), self._periods_failed)
+
+    def _periods_loaded(self, periods, wins):
+        for user, points, now in self._pending:
+            periods.add(user, points, now)
+        self._pending = None
+        self.periods = periods
+        logger.info('Replayed %d wins for the recent leaderboards.', wins)
+
+    def _periods_failed(self, failure):
+        self._pending = None
+        logger.error('Failed to load the recent leaderboards: %s', failure.getErrorMessage())
+
+    def add(self, user, points):
+        '''
+        Adds points to a user and records the change. Returns the new score.
+        '''
+        score = self.scores.add(user, points)
+        self.store.record(user, score, points)
+        if self.periods is not None:
+            self.periods.add(user, points)
+        elif self._pending is not None:
+            self._pending.append((user, points, time.time()))
+        if self.store.should_save():
+            self.save()
+        return score
+
+    def set(self, user, score):
+        self.scores[user] = score
+        self.store.record(user, score)
+
+    def save(self):
+        '''
+        Writes pending changes in a worker thread. Returns a Deferred, or
+        None if there was nothing to do.
+        '''
+        if not self.store.begin_save():
+            return None
+        snapshot = dict(self.scores) if self.store.needs_scores else None
+        d = threads.deferToThread(SAVE_SECONDS.time()(self.store.save), snapshot)
+        d.addCallbacks(lambda _: logger.info('Scores have been saved.'), self._save_failed)
+        return d
+
+    def _save_failed(self, failure):
+        SAVE_FAILURES.inc()
+        logger.error('Failed to save scores: %s', failure.getErrorMessage())
+
+    def close(self):
+        self.store.close()
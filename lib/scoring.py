@@ -0,0 +1,87 @@
+from typing import NamedTuple, Optional, Union
+
+from utils import interp
+
+# Share of the points awarded when the answer comes after each clue.
+CLUE_FACTORS = (1, 3 / 5, 2 / 5, 1 / 5)
+
+
+class ScoringRules(NamedTuple):
+    '''
+    The config values that decide how many points a win is worth.
+    '''
+
+    base_points: int
+    min_users: Optional[int]
+    max_points: Union[int, str]
+    unpriviledged_group: int
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config.BASE_POINTS, config.MIN_USERS_FOR_PRIVILEDGE, config.MAX_POINTS, config.UNPRIVILEDGED_GROUP)
+
+    def progressive(self, n_players):
+        '''
+        Whether players below the top group get extra points.
+        '''
+        return self.min_users is not None and n_players > self.min_users
+
+    def needs_average(self, n_players):
+        '''
+        Whether award() needs the average score of the top group.
+        '''
+        return self.progressive(n_players) and self.max_points == 'increasing'
+
+
+class Award(NamedTuple):
+    points: int
+    # The points a player at the bottom would get, None when the progressive
+    # system doesn't apply.
+    max_points: Optional[int]
+
+
+def award(rules, rank, n_players, clue, top_average=None):
+    '''
+    Returns the Award for a win at the given rank among n_players (the
+    winner included) after the given clue, starting at 1.
+
+    top_average is the average score of the rules.unpriviledged_group best
+    players and is only needed when rules.needs_average(n_players).
+    '''
+    base_points = rules.base_points
+    max_points = None
+    if rules.progressive(n_players):
+        if rules.max_points == 'increasing':
+            max_points = int(max(top_average / (rules.base_points * 6), rules.base_points * 1.5))
+        else:
+            max_points = rules.max_points
+        base_points = max(
+            float(interp(rank, rules.unpriviledged_group, n_players, rules.base_points, max_points)),
+            rules.base_points,
+        )
+    factor = CLUE_FACTORS[min(clue - 1, len(CLUE_FACTORS) - 1)]
+    return Award(int(max(base_points, rules.base_points) * factor), max_points)
+
+
+def winner_rank(scores, user):
+    '''
+    Returns (rank, n_players) for a win of user in a Leaderboard, counting
+    the user as a new last player if they have no score yet.
+    '''
+    n_players = len(scores)
+    if user not in scores:
+        return n_players + 1, n_players + 1
+    rank_info = scores.rank(user)
+    if rank_info is None:
+        return n_players + 1, n_players
+    return rank_info[0], n_players
+
+
+def score_win(rules, scores, user, clue):
+    '''
+    Computes the Award for a win of user after the given clue, as the bot
+    does, without changing scores.
+    '''
+    rank, n_players = winner_rank(scores, user)
+    top_average = scores.top_average(rules.unpriviledged_group) if rules.needs_average(n_players) else None
+    return award(rules, rank, n_players, clue, top_average)
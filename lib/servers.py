@@ -0,0 +1,172 @@
+import itertools
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Server:
+    '''
+    An IRC server and how reachable it has been.
+    '''
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        # Failed attempts since the last successful sign on.
+        self.failures = 0
+        self.retry_at = 0.0
+        self.connects = 0
+        self.last_error = None
+        self.lag = None
+
+    def __repr__(self):
+        return '{}:{}'.format(self.host, self.port)
+
+
+class ServerPool:
+    '''
+    Picks the server to connect to and when.
+
+    Every failure of a server, to connect or to stay connected, delays its
+    next attempt exponentially, from initial_delay up to max_delay, minus a
+    random share of up to jitter so that bots restarted together don't
+    come back in step. The server that can be tried the soonest is picked,
+    in the given order when several can, so the bot fails over to the next
+    server while the first one is down, and goes back to it when the others
+    are down too. A successful sign on resets the delays of a server.
+    '''
+
+    def __init__(self, servers, initial_delay=1.0, max_delay=300.0, factor=2.0, jitter=0.5,
+                 clock=time.monotonic, rng=random.random):
+        if not servers:
+            raise ValueError('no servers to connect to')
+        self.servers = [Server(host, port) for host, port in servers]
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.factor = factor
+        self.jitter = jitter
+        self._clock = clock
+        self._rng = rng
+
+    def backoff(self, failures):
+        '''
+        Returns the delay before trying a server again after failures
+        failed attempts in a row.
+        '''
+        if failures <= 0:
+            return 0.0
+        delay = min(self.max_delay, self.initial_delay * self.factor ** (failures - 1))
+        return delay * (1 - self.jitter * self._rng())
+
+    def next(self):
+        '''
+        Returns the server to try next and the seconds to wait before.
+        '''
+        now = self._clock()
+        for server in self.servers:
+            if server.retry_at <= now:
+                return server, 0.0
+        server = min(self.servers, key=lambda s: s.retry_at)
+        return server, server.retry_at - now
+
+    def failed(self, server, error=None):
+        server.failures += 1
+        server.last_error = error
+        server.lag = None
+        server.retry_at = self._clock() + self.backoff(server.failures)
+        logger.warning('%s failed %d times in a row (%s), next attempt in %.1f seconds.',
+                       server, server.failures, error, server.retry_at - self._clock())
+
+    def succeeded(self, server):
+        server.failures = 0
+        server.retry_at = 0.0
+        server.connects += 1
+
+
+class Reconnector:
+    '''
+    Connects to the servers of a ServerPool one attempt at a time.
+
+    connect(server) starts an attempt. The owner reports its outcome with
+    connected() once signed on and failed() when the attempt fails or the
+    connection is lost, which schedules the next attempt.
+    '''
+
+    def __init__(self, pool, connect, reactor=None):
+        if reactor is None:
+            from twisted.internet import reactor
+        self.pool = pool
+        self._connect = connect
+        self._reactor = reactor
+        self._pending = None
+        self.current = None
+        self.stopped = False
+
+    def start(self):
+        if self.stopped or (self._pending is not None and self._pending.active()):
+            return
+        server, delay = self.pool.next()
+        self._pending = self._reactor.callLater(delay, self._attempt, server)
+
+    def _attempt(self, server):
+        self._pending = None
+        self.current = server
+        logger.info('Connecting to %s.', server)
+        self._connect(server)
+
+    def connected(self):
+        if self.current is not None:
+            self.pool.succeeded(self.current)
+
+    def failed(self, error=None):
+        if self.current is not None:
+            self.pool.failed(self.current, error)
+            self.current = None
+        self.start()
+
+    def stop(self):
+        self.stopped = True
+        if self._pending is not None and self._pending.active():
+            self._pending.cancel()
+        self._pending = None
+
+
+class PingTracker:
+    '''
+    Measures the lag of a connection with the round trip of PINGs, and
+    tells when one went unanswered for longer than timeout seconds, which
+    means the connection is dead even if the socket doesn't know yet.
+    '''
+
+    def __init__(self, timeout, clock=time.monotonic):
+        self.timeout = timeout
+        self._clock = clock
+        self._tokens = itertools.count(1)
+        # The oldest PING not answered yet, as (token, time sent).
+        self._pending = None
+        self.lag = None
+
+    def ping(self):
+        '''
+        Returns the token to send in a new PING.
+        '''
+        token = 'trivia{}'.format(next(self._tokens))
+        if self._pending is None:
+            self._pending = (token, self._clock())
+        return token
+
+    def pong(self, token):
+        '''
+        Records the answer to a PING. Returns the lag in seconds, or None
+        for a token that isn't the one awaited.
+        '''
+        if self._pending is None or self._pending[0] != token:
+            return None
+        self.lag = self._clock() - self._pending[1]
+        self._pending = None
+        return self.lag
+
+    def stale(self):
+        return self._pending is not None and self._clock() - self._pending[1] > self.timeout
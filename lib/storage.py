@@ -0,0 +1,418 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Seconds close() waits for a save running in a worker thread.
+CLOSE_TIMEOUT = 30
+
+
+class JournalStore:
+    '''
+    Scores persisted as a JSON snapshot plus an append-only journal.
+
+    Every score change is appended to the journal as one short line, so the
+    cost of a write doesn't depend on the number of players. save() folds
+    the journal back into the snapshot and is meant to run in a worker
+    thread. Journal lines carry the resulting score, not only the delta, so
+    replaying a line twice is harmless and a crash at any point of a
+    compaction loses nothing.
+
+    The freeze list is a plain JSON file and answer history goes to an
+    append-only JSON lines file.
+    '''
+
+    # save() needs the full score table.
+    needs_scores = True
+
+    def __init__(self, directory, snapshot='scores.json', journal='scores.journal',
+                 max_journal_size=1024 * 1024):
+        self._snapshot = os.path.join(directory, snapshot)
+        self._journal = os.path.join(directory, journal)
+        self._rotated = self._journal + '.old'
+        self._freezelist = os.path.join(directory, 'freeze.json')
+        self._history = os.path.join(directory, 'history.jsonl')
+        self._max_journal_size = max_journal_size
+        self._lock = threading.Lock()
+        self._fd = None
+        self._history_fd = None
+        self.saving = False
+
+    def _replay(self, path, scores):
+        try:
+            with open(path, 'r') as fd:
+                for line in fd:
+                    try:
+                        entry = json.loads(line)
+                        scores[str(entry['u'])] = int(entry['s'])
+                    except (ValueError, KeyError, TypeError):
+                        # Most likely a line cut short by a crash.
+                        continue
+        except FileNotFoundError:
+            pass
+
+    def load(self):
+        '''
+        Returns the saved scores: the snapshot with the journal replayed on
+        top of it.
+        '''
+        scores = {}
+        try:
+            with open(self._snapshot, 'r') as fd:
+                for name, score in json.load(fd).items():
+                    scores[str(name)] = int(score)
+        except (FileNotFoundError, ValueError):
+            pass
+        self._replay(self._rotated, scores)
+        self._replay(self._journal, scores)
+        return scores
+
+    def record(self, user, score, delta=None):
+        '''
+        Appends a score change to the journal.
+        '''
+        entry = {'u': user, 's': score}
+        if delta is not None:
+            entry['d'] = delta
+        with self._lock:
+            if self._fd is None:
+                self._fd = _open_append(self._journal)
+            _write_line(self._fd, entry)
+
+    def record_answer(self, user, question, answer, clue, seconds, points):
+        '''
+        Appends a solved question to the answer history.
+        '''
+        entry = {
+            't': time.time(),
+            'u': user,
+            'q': question,
+            'a': answer,
+            'c': clue,
+            's': seconds,
+            'p': points,
+        }
+        with self._lock:
+            if self._history_fd is None:
+                self._history_fd = _open_append(self._history)
+            _write_line(self._history_fd, entry)
+
+    def history(self):
+        '''
+        Iterates over the recorded answers as dicts, oldest first.
+        '''
+        try:
+            with open(self._history, 'r') as fd:
+                for line in fd:
+                    try:
+                        entry = json.loads(line)
+                        yield {
+                            'time': entry['t'],
+                            'user': entry['u'],
+                            'question': entry['q'],
+                            'answer': entry['a'],
+                            'clue': entry['c'],
+                            'seconds': entry['s'],
+                            'points': entry['p'],
+                        }
+                    except (ValueError, KeyError):
+                        continue
+        except FileNotFoundError:
+            return
+
+    def load_freezelist(self):
+        try:
+            with open(self._freezelist, 'r') as fd:
+                return set(json.load(fd))
+        except (FileNotFoundError, ValueError):
+            return set()
+
+    def save_freezelist(self, nicks):
+        with open(self._freezelist, 'w') as fd:
+            json.dump(list(nicks), fd)
+
+    def journal_size(self):
+        with self._lock:
+            if self._fd is not None:
+                return self._fd.tell()
+        try:
+            return os.path.getsize(self._journal)
+        except FileNotFoundError:
+            return 0
+
+    def should_save(self):
+        return self.journal_size() > self._max_journal_size
+
+    def begin_save(self):
+        '''
+        Starts a compaction: the current journal is set aside and new
+        records go to a fresh one. Must be followed by save() with the
+        scores as they are at the time of the call.
+
+        Returns False if a compaction is already running.
+        '''
+        if self.saving:
+            return False
+        self.saving = True
+        with self._lock:
+            if self._fd is not None:
+                self._fd.close()
+                self._fd = None
+            if os.path.exists(self._journal):
+                if os.path.exists(self._rotated):
+                    # A previous compaction didn't finish, keep its records.
+                    with open(self._journal, 'r') as src, open(self._rotated, 'a') as dst:
+                        dst.write(src.read())
+                    os.remove(self._journal)
+                else:
+                    os.replace(self._journal, self._rotated)
+        return True
+
+    def save(self, scores):
+        '''
+        Writes the snapshot atomically and drops the rotated journal.
+        '''
+        try:
+            tmp = self._snapshot + '.tmp'
+            with open(tmp, 'w') as fd:
+                json.dump(scores, fd)
+                fd.flush()
+                os.fsync(fd.fileno())
+            os.replace(tmp, self._snapshot)
+            if os.path.exists(self._rotated):
+                os.remove(self._rotated)
+        finally:
+            self.saving = False
+
+    def close(self):
+        with self._lock:
+            for fd in (self._fd, self._history_fd):
+                if fd is not None:
+                    fd.close()
+            self._fd = None
+            self._history_fd = None
+
+
+def _open_append(path):
+    '''
+    Opens a JSON lines file for appending, terminating a last line left
+    unfinished by a crash.
+    '''
+    unterminated = False
+    try:
+        with open(path, 'rb') as fd:
+            if fd.seek(0, os.SEEK_END):
+                fd.seek(-1, os.SEEK_END)
+                unterminated = fd.read(1) != b'\n'
+    except FileNotFoundError:
+        pass
+    fd = open(path, 'a')
+    if unterminated:
+        fd.write('\n')
+    return fd
+
+
+def _write_line(fd, entry):
+    fd.write(json.dumps(entry) + '\n')
+    fd.flush()
+
+
+class SqliteStore:
+    '''
+    Scores, freeze list and answer history kept in a SQLite database.
+
+    The database runs in WAL mode. Writes are queued in memory and
+    committed in batches by save(), which is meant to run in a worker
+    thread, so the reactor never waits on the disk.
+
+    A new database is seeded from the JSON files of a JournalStore in the
+    same directory, if there are any.
+    '''
+
+    SCHEMA = '''
+        CREATE TABLE IF NOT EXISTS scores (
+            nick TEXT PRIMARY KEY,
+            score INTEGER NOT NULL
+        );
+        DROP INDEX IF EXISTS scores_by_rank;
+        CREATE TABLE IF NOT EXISTS frozen (
+            nick TEXT PRIMARY KEY
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY,
+            time REAL NOT NULL,
+            nick TEXT NOT NULL,
+            question TEXT,
+            answer TEXT,
+            clue INTEGER,
+            seconds REAL,
+            points INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS history_by_nick ON history (nick, time);
+    '''
+
+    # save() only writes the queued changes.
+    needs_scores = False
+
+    HISTORY_COLUMNS = ('time', 'user', 'question', 'answer', 'clue', 'seconds', 'points')
+    # Rows of history read at a time.
+    HISTORY_CHUNK = 1000
+
+    def __init__(self, directory, filename='trivia.db', batch_size=100):
+        path = os.path.join(directory, filename)
+        new = not os.path.exists(path)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(self.SCHEMA)
+        self._lock = threading.Lock()
+        self._pending_scores = {}
+        self._pending_history = []
+        self._batch = None
+        self._batch_size = batch_size
+        self.saving = False
+        # Cleared while a batch taken by begin_save() isn't committed.
+        self._idle = threading.Event()
+        self._idle.set()
+        # Whether the batch was taken over by save() or close(), whichever
+        # comes first.
+        self._claimed = False
+        self._claim_lock = threading.Lock()
+        if new:
+            self.import_json(directory)
+
+    def import_json(self, directory):
+        '''
+        Copies the scores, freeze list and history of a JournalStore.
+        '''
+        journal = JournalStore(directory)
+        with self._lock, self._db:
+            self._db.executemany(
+                'INSERT OR REPLACE INTO scores (nick, score) VALUES (?, ?)',
+                journal.load().items(),
+            )
+            self._db.executemany(
+                'INSERT OR IGNORE INTO frozen (nick) VALUES (?)',
+                ((nick,) for nick in journal.load_freezelist()),
+            )
+            self._db.executemany(
+                'INSERT INTO history (time, nick, question, answer, clue, seconds, points)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (tuple(entry[k] for k in self.HISTORY_COLUMNS) for entry in journal.history()),
+            )
+
+    def load(self):
+        with self._lock:
+            return dict(self._db.execute('SELECT nick, score FROM scores'))
+
+    def record(self, user, score, delta=None):
+        self._pending_scores[user] = score
+
+    def record_answer(self, user, question, answer, clue, seconds, points):
+        self._pending_history.append((time.time(), user, question, answer, clue, seconds, points))
+
+    def history(self):
+        '''
+        Iterates over the recorded answers as dicts, oldest first, reading
+        HISTORY_CHUNK rows at a time.
+        '''
+        last = 0
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    'SELECT id, time, nick, question, answer, clue, seconds, points FROM history'
+                    ' WHERE id > ? ORDER BY id LIMIT ?',
+                    (last, self.HISTORY_CHUNK),
+                ).fetchall()
+            for row in rows:
+                yield dict(zip(self.HISTORY_COLUMNS, row[1:]))
+            if len(rows) < self.HISTORY_CHUNK:
+                return
+            last = rows[-1][0]
+
+    def load_freezelist(self):
+        with self._lock:
+            return set(nick for nick, in self._db.execute('SELECT nick FROM frozen'))
+
+    def save_freezelist(self, nicks):
+        with self._lock, self._db:
+            self._db.execute('DELETE FROM frozen')
+            self._db.executemany('INSERT INTO frozen (nick) VALUES (?)', ((nick,) for nick in nicks))
+
+    def should_save(self):
+        return len(self._pending_scores) + len(self._pending_history) >= self._batch_size
+
+    def begin_save(self):
+        '''
+        Takes the queued writes, plus any batch a failed save() left
+        behind, for the next save(). Returns False if there is nothing to
+        write or a save is already running.
+        '''
+        if self.saving:
+            return False
+        if self._batch is None:
+            self._batch = ({}, [])
+        scores, history = self._batch
+        scores.update(self._pending_scores)
+        history.extend(self._pending_history)
+        self._pending_scores = {}
+        self._pending_history = []
+        if not scores and not history:
+            self._batch = None
+            return False
+        self.saving = True
+        self._claimed = False
+        self._idle.clear()
+        return True
+
+    def _claim(self):
+        with self._claim_lock:
+            claimed, self._claimed = self._claimed, True
+        return not claimed
+
+    def save(self, scores=None):
+        '''
+        Commits the batch taken by begin_save() in one transaction, unless
+        close() already did.
+        '''
+        if not self._claim():
+            return
+        pending_scores, pending_history = self._batch
+        try:
+            with self._lock, self._db:
+                self._db.executemany(
+                    'INSERT OR REPLACE INTO scores (nick, score) VALUES (?, ?)',
+                    pending_scores.items(),
+                )
+                self._db.executemany(
+                    'INSERT INTO history (time, nick, question, answer, clue, seconds, points)'
+                    ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    pending_history,
+                )
+            self._batch = None
+        finally:
+            self.saving = False
+            self._idle.set()
+
+    def close(self, timeout=CLOSE_TIMEOUT):
+        '''
+        Commits whatever is still queued and closes the database, once the
+        save running in a worker thread, if any, is over. A batch whose save
+        didn't start, as when the reactor stopped first, is committed here.
+        '''
+        if self.saving:
+            if self._claim():
+                # begin_save() below takes the batch back with the rest.
+                self.saving = False
+                self._idle.set()
+            elif not self._idle.wait(timeout):
+                logger.error('Still saving after %d seconds, closing without the last changes.', timeout)
+                return
+        if self.begin_save():
+            self.save()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,62 @@
+import re
+
+COLOR = '\x03'
+# Colors with their optional foreground and background numbers, then bold,
+# reset, reverse, italic and underline codes.
+FORMATTING = re.compile('\x03(?:[0-9]{1,2}(?:,[0-9]{1,2})?)?|[\x02\x0f\x16\x1d\x1f]')
+
+
+def strip_formatting(text):
+    '''
+    Removes the colors and other formatting codes from a line.
+    '''
+    if text.isprintable():
+        return text
+    return FORMATTING.sub('', text)
+
+
+class Catalog:
+    '''
+    Every message of a table compiled for one language.
+
+    messages maps message names to their variants, a dict of language to
+    template with an optional color under color_key. Each message becomes
+    an attribute holding its template in lang, or in fallback when it has
+    no translation, already prefixed with its color (default_color when it
+    has none), or without any color when colors is false.
+    '''
+
+    def __init__(self, messages, lang, fallback='en', color_key='color', default_color=None, colors=True):
+        self.lang = lang
+        self.colors = colors
+        for name, variants in messages.items():
+            template = variants[lang] if lang in variants else variants[fallback]
+            color = variants.get(color_key, default_color)
+            if colors and color:
+                template = COLOR + color + template
+            setattr(self, name, template)
+
+
+class RenderCache:
+    '''
+    Lines rendered from the templates of a Catalog, kept until clear() so
+    a line sent several times with the same arguments, like the question
+    at every clue, is formatted once.
+    '''
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self._lines = {}
+
+    def render(self, name, *args):
+        key = (name,) + args
+        line = self._lines.get(key)
+        if line is None:
+            line = self._lines[key] = getattr(self.catalog, name).format(*args)
+        return line
+
+    def clear(self):
+        self._lines.clear()
+
+    def __len__(self):
+        return len(self._lines)
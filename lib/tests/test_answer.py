@@ -12,3 +12,69 @@ class TestAnswer(TestCase):
     def test_masking_spaces(self):
         answer = Answer("test spaces")
         self.assertEqual(answer.current_clue(), "**** ******")
+
+    def test_clues(self):
+        answer = Answer("ab cdefg")
+        first = answer.give_clue()
+        self.assertEqual(first.count("*"), 6)
+        for _ in range(10):
+            clue = answer.give_clue()
+        self.assertEqual(clue, "ab cdefg")
+        self.assertEqual(answer.current_clue(), clue)
+
+    def test_clue_limits(self):
+        answer = Answer("abcd")
+        self.assertEqual(answer.give_clue().count("*"), 3)
+        self.assertEqual(answer.give_clue().count("*"), 3)
+        self.assertEqual(Answer("ab").give_clue(), "**")
+
+    def test_matches_normalized(self):
+        answer = Answer("The Beatles")
+        self.assertTrue(answer.matches("beatles"))
+        self.assertTrue(answer.matches("  the  BEATLES! "))
+        self.assertFalse(answer.matches("beetles"))
+        self.assertTrue(Answer("Café").matches("cafe"))
+
+    def test_matches_alternatives(self):
+        answer = Answer("United States|USA|U.S.")
+        self.assertEqual(answer.answer, "United States")
+        self.assertEqual(answer.current_clue(), "****** ******")
+        self.assertTrue(answer.matches("usa"))
+        self.assertTrue(answer.matches("us"))
+        self.assertTrue(answer.matches("U.S."))
+
+    def test_matches_punctuation(self):
+        self.assertTrue(Answer("U.S.").matches("US"))
+        self.assertTrue(Answer("O'Brien").matches("obrien"))
+        self.assertTrue(Answer("AC/DC").matches("acdc"))
+        self.assertTrue(Answer("Spider-Man").matches("spider man"))
+        self.assertFalse(Answer("AC/DC").matches("ac"))
+
+    def test_matches_symbols(self):
+        self.assertTrue(Answer("-5").matches("-5"))
+        self.assertFalse(Answer("-5").matches("5"))
+        self.assertFalse(Answer("1.5").matches("15"))
+        self.assertFalse(Answer("1/2").matches("12"))
+        self.assertFalse(Answer("1.2").matches("12"))
+        self.assertTrue(Answer("C++").matches("c++"))
+        self.assertFalse(Answer("C++").matches("C"))
+        self.assertFalse(Answer("C#").matches("C"))
+        self.assertTrue(Answer("Apollo 11").matches("apollo-11"))
+
+    def test_matches_fuzzy(self):
+        answer = Answer("Mississippi", max_distance=2)
+        self.assertTrue(answer.matches("misisippi"))
+        self.assertFalse(answer.matches("missouri"))
+        answer.set_answer("cat")
+        self.assertFalse(answer.matches("car"))
+
+    def test_snapshot(self):
+        answer = Answer("Paris | paree", max_distance=1)
+        answer.give_clue()
+        state = answer.snapshot()
+        restored = Answer(max_distance=1)
+        restored.restore(state)
+        self.assertEqual(restored.current_clue(), answer.current_clue())
+        self.assertEqual(restored.give_clue(), answer.give_clue())
+        self.assertTrue(restored.matches("paree"))
+        self.assertTrue(restored.matches("pariz"))
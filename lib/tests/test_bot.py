@@ -0,0 +1,369 @@
+import os
+import socket
+import sys
+import types
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
+
+from twisted.internet import defer, protocol, reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.error import ConnectionDone
+from twisted.internet.task import Clock, deferLater
+from twisted.internet.testing import StringTransport
+from twisted.protocols.basic import LineReceiver
+from twisted.python.failure import Failure
+from twisted.trial import unittest as trial
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_trivia():
+    '''
+    Imports trivia.py with a config built from example_config.py, as it
+    reads its config at import time.
+    '''
+    if 'config' not in sys.modules:
+        config = types.ModuleType('config')
+        config.__file__ = os.path.join(ROOT, 'example_config.py')
+        with open(config.__file__) as fd:
+            exec(fd.read(), config.__dict__)
+        config.OWNER = 'owner'
+        config.ADMINS = ['admin']
+        sys.modules['config'] = config
+    with mock.patch.object(sys, 'argv', sys.argv[:1]):
+        import trivia
+    return trivia
+
+
+def patch_config(test, directory, **values):
+    '''
+    Points the config of trivia.py to directory for the duration of test,
+    along with the other values given.
+    '''
+    config = load_trivia().config
+    values.setdefault('SAVE_DIR', os.path.join(directory, 'savedata'))
+    values.setdefault('Q_DIR', os.path.join(directory, 'questions'))
+    values.setdefault('ANNOUNCEMENTS_TXT', os.path.join(directory, 'messages.txt'))
+    for name, value in values.items():
+        patcher = mock.patch.object(config, name, value, create=True)
+        patcher.start()
+        test.addCleanup(patcher.stop)
+
+
+class BotTestCase(TestCase):
+    '''
+    A bot connected to a fake transport, with its outbox on a fake clock.
+    '''
+
+    channels = {'#trivia': {}, '#other': {}}
+
+    def setUp(self):
+        self.trivia = load_trivia()
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        patch_config(self, self._dir.name, GAME_CHANNELS=self.channels)
+        self.factory = self.trivia.ircbotFactory()
+        self.clock = Clock()
+        self.transport = StringTransport()
+        self.bot = self.connect(self.transport)
+        self.transport.clear()
+
+    def connect(self, transport):
+        bot = self.factory.buildProtocol(None)
+        bot._outbox._reactor = self.clock
+        for loop in [bot._rescan, bot._autosave] + [game._lc for game in bot._games.values()]:
+            loop.clock = self.clock
+        bot.makeConnection(transport)
+        # Games started by a test schedule announcements on the reactor.
+        self.addCleanup(bot._shutdown)
+        return bot
+
+    def say(self, user, channel, text):
+        self.bot.privmsg('{0}!{0}@host'.format(user), channel, text)
+
+    def lines(self):
+        '''
+        Returns the lines written since the last call.
+        '''
+        lines = self.transport.value().decode('utf8').splitlines()
+        self.transport.clear()
+        return lines
+
+    def sent(self):
+        '''
+        Returns the lines written since the last call, with everything
+        queued in the outbox.
+        '''
+        self.bot._outbox.flush()
+        return self.lines()
+
+
+class TestCommands(BotTestCase):
+
+    def test_admin_command_refused(self):
+        self.say('alice', '#trivia', '!freeze bob')
+        line, = self.sent()
+        self.assertTrue(line.startswith('PRIVMSG #trivia :'))
+        self.assertIn("alice: You don't tell me what to do.", line)
+        self.assertNotIn('bob', self.bot._frost_nicks)
+        self.say('admin', '#trivia', '!freeze bob')
+        self.assertIn('bob', self.bot._frost_nicks)
+
+    def test_addressed_command(self):
+        self.say('admin', '#trivia', 'trivia: freeze bob')
+        self.assertIn('bob', self.bot._frost_nicks)
+        self.say('admin', '#trivia', 'trivia unfreeze bob')
+        self.assertNotIn('bob', self.bot._frost_nicks)
+
+    def test_game_command_channel(self):
+        self.say('admin', '#other', '!rankoff')
+        self.assertTrue(self.bot._games['#other']._block_rank)
+        self.assertFalse(self.bot._games['#trivia']._block_rank)
+
+    def test_unknown_command(self):
+        self.say('alice', '#trivia', '!bogus')
+        line, = self.sent()
+        self.assertTrue(line.startswith('PRIVMSG #trivia :\x01ACTION '))
+        self.assertIn('looks at alice oddly', line)
+
+
+class TestFlood(BotTestCase):
+
+    def test_unknown_commands(self):
+        for _ in range(30):
+            self.say('alice', '#trivia', '!bogus')
+        self.clock.advance(0)
+        lines = self.lines()
+        self.assertEqual(len(lines), 1)
+        self.assertTrue(lines[0].startswith('PRIVMSG #trivia :\x01ACTION '))
+        self.clock.advance(self.factory.lineRate)
+        self.assertEqual(len(self.lines()), 1)
+
+    def test_join_storm(self):
+        for _ in range(30):
+            self.bot.userJoined('admin', '#trivia')
+        self.clock.advance(0)
+        self.assertEqual(self.lines(), ['MODE #trivia +o admin'])
+        self.clock.advance(self.factory.lineRate)
+        self.assertEqual(len(self.lines()), 1)
+
+    def test_quit(self):
+        for i in range(3):
+            self.bot._outbox.put_line('NOTICE alice :{}'.format(i))
+        self.bot.quit('bye')
+        self.clock.advance(0)
+        self.assertEqual(self.lines(), ['NOTICE alice :0'])
+        self.clock.advance(self.factory.lineRate)
+        self.assertEqual(self.lines(), ['NOTICE alice :1'])
+        self.clock.advance(self.factory.lineRate)
+        self.assertEqual(self.lines(), ['NOTICE alice :2', 'QUIT :bye'])
+
+    def test_quit_drain_capped(self):
+        for i in range(1000):
+            self.bot._outbox.put_line('NOTICE alice :{}'.format(i))
+        self.bot.quit('bye')
+        self.clock.advance(0)
+        self.clock.advance(self.trivia.QUIT_DRAIN)
+        lines = self.lines()
+        self.assertEqual(lines[-1], 'QUIT :bye')
+        self.assertEqual(len(lines), 3)
+
+
+class TestLoading(BotTestCase):
+
+    def test_connection_lost_while_loading(self):
+        os.makedirs(self.trivia.config.Q_DIR)
+        with open(os.path.join(self.trivia.config.Q_DIR, 'general'), 'w') as fd:
+            fd.write('What is 2+2?`4\n')
+        loading = Deferred()
+        loads = []
+
+        def defer(f, *args):
+            if f.__name__ != '_load_questions':
+                return Deferred()
+            loads.append(f)
+            return loading
+
+        with mock.patch.object(self.trivia.threads, 'deferToThread', defer):
+            self.bot._resume()
+            self.bot.connectionLost(Failure(ConnectionDone()))
+            bot = self.connect(StringTransport())
+            self.addCleanup(bot.connectionLost, Failure(ConnectionDone()))
+            bot._resume()
+        self.assertEqual(len(loads), 1)
+        loading.callback(self.bot._load_questions())
+        self.assertFalse(self.bot.ready)
+        self.assertFalse(self.bot._rescan.running)
+        self.assertFalse(any(game._lc.running for game in self.bot._games.values()))
+        self.assertTrue(bot.ready)
+        self.assertTrue(bot._rescan.running)
+        self.assertIsNotNone(self.factory.questions)
+        self.assertIsNone(self.factory.loading)
+
+    def test_audio_before_loading(self):
+        self.assertFalse(self.bot.ready)
+        self.say('admin', '#trivia', '!audio')
+        line, = self.sent()
+        self.assertTrue(line.startswith('PRIVMSG admin :'))
+        self.assertIn('not loaded yet', line)
+        self.assertFalse(self.bot._games['#trivia']._locutor_mode)
+
+
+class TestRescan(BotTestCase):
+
+    def load(self, **patches):
+        for name, value in patches.items():
+            patcher = mock.patch.object(self.trivia.config, name, value, create=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.bot._questions_loaded(self.bot._load_questions())
+        return self.bot._questions, self.bot._scheduler
+
+    def test_broken_pack(self):
+        from lib.questions import write_pack
+
+        path = os.path.join(self._dir.name, 'questions.pack')
+        write_pack(path, [('What is 2+2?', '4', 'math')])
+        questions, scheduler = self.load(Q_PACK=path)
+        # Replaced by a file that isn't a pack, then removed.
+        with open(path + '.new', 'wb') as fd:
+            fd.write(b'not a pack' * 10)
+        os.replace(path + '.new', path)
+        self.bot._rescan_questions()
+        os.remove(path)
+        self.bot._rescan_questions()
+        self.assertIs(self.bot._questions, questions)
+        self.assertIs(self.bot._scheduler, scheduler)
+        self.assertEqual(self.bot._get_new_question(), ('What is 2+2?', '4'))
+
+    def test_empty_directory(self):
+        directory = os.path.join(self._dir.name, 'questions')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'math'), 'w') as fd:
+            fd.write('What is 2+2?`4\n')
+        questions, _ = self.load(Q_PACK=None)
+        os.remove(os.path.join(directory, 'math'))
+        self.bot._rescan_questions()
+        self.assertIs(self.bot._questions, questions)
+        with open(os.path.join(directory, 'math'), 'w') as fd:
+            fd.write('What is 3+3?`6\n')
+        self.bot._rescan_questions()
+        self.assertIsNot(self.bot._questions, questions)
+        self.assertIs(self.factory.questions[0], self.bot._questions)
+        self.assertEqual(self.bot._get_new_question(), ('What is 3+3?', '6'))
+
+
+class TestDifficulty(BotTestCase):
+
+    def test_skip_not_recorded(self):
+        directory = os.path.join(self._dir.name, 'questions')
+        os.makedirs(directory)
+        with open(os.path.join(directory, 'math'), 'w') as fd:
+            fd.write('What is 2+2?`4\n')
+        with mock.patch.object(self.trivia.config, 'Q_PACK', None, create=True):
+            self.bot._questions_loaded(self.bot._load_questions())
+        self.say('admin', '#trivia', '!skip')
+        self.assertEqual(self.bot._difficulty.stats('What is 2+2?'), (0, 0))
+        self.clock.advance(self.trivia.config.WAIT_INTERVAL)
+        self.say('alice', '#trivia', '4')
+        self.assertEqual(self.bot._difficulty.stats('What is 2+2?'), (1, 1))
+        self.assertIsNotNone(self.bot._difficulty.clue('What is 2+2?'))
+
+
+class TestHandover(TestCase):
+
+    def setUp(self):
+        self.trivia = load_trivia()
+        self.sockets = socket.socketpair()
+        for sock in self.sockets:
+            self.addCleanup(sock.close)
+
+    def handed_over(self, fd, environ):
+        with mock.patch.dict(os.environ, environ):
+            result = self.trivia.handed_over({'fd': fd})
+            self.assertNotIn(self.trivia.HANDOFF_FD, os.environ)
+        return result
+
+    def test_socket(self):
+        fd = self.sockets[0].fileno()
+        self.assertTrue(self.handed_over(fd, {self.trivia.HANDOFF_FD: str(fd)}))
+
+    def test_not_handed_over(self):
+        fd = self.sockets[0].fileno()
+        self.assertFalse(self.handed_over(fd, {}))
+        self.assertFalse(self.handed_over(fd, {self.trivia.HANDOFF_FD: str(self.sockets[1].fileno())}))
+
+    def test_not_a_socket(self):
+        with TemporaryDirectory() as directory, open(os.path.join(directory, 'file'), 'w') as fd:
+            self.assertFalse(self.handed_over(fd.fileno(), {self.trivia.HANDOFF_FD: str(fd.fileno())}))
+        self.assertFalse(self.handed_over(9999, {self.trivia.HANDOFF_FD: '9999'}))
+
+
+class _FakeServer(LineReceiver):
+    """Drops the first connections given to its factory, then welcomes the
+    client once it registered."""
+
+    def connectionMade(self):
+        self.factory.connections += 1
+        if self.factory.connections <= self.factory.drop:
+            self.transport.loseConnection()
+        else:
+            self.factory.clients.append(self)
+
+    def lineReceived(self, line):
+        if line.startswith(b'USER'):
+            self.sendLine(b':srv 001 trivia :welcome')
+
+
+class TestFailover(trial.TestCase):
+
+    def listen(self, drop):
+        factory = protocol.Factory.forProtocol(_FakeServer)
+        factory.connections = 0
+        factory.drop = drop
+        factory.clients = []
+        port = reactor.listenTCP(0, factory, interface='127.0.0.1')
+        self.addCleanup(port.stopListening)
+        return factory, port.getHost().port
+
+    def refused_port(self):
+        port = reactor.listenTCP(0, protocol.Factory(), interface='127.0.0.1')
+        number = port.getHost().port
+        port.stopListening()
+        return number
+
+    @defer.inlineCallbacks
+    def test_failover(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        dropping, dropping_port = self.listen(drop=10 ** 6)
+        live, live_port = self.listen(drop=1)
+        servers = [('127.0.0.1', self.refused_port()), ('127.0.0.1', dropping_port), ('127.0.0.1', live_port)]
+        patch_config(self, directory.name, SERVERS=servers, USE_SSL='no', GAME_CHANNELS={'#trivia': {}},
+                     RECONNECT_INITIAL_DELAY=0.05, RECONNECT_MAX_DELAY=0.1)
+        factory = load_trivia().ircbotFactory()
+        # The questions never load, no game starts.
+        factory.loading = Deferred()
+        self.addCleanup(factory.reconnector.stop)
+        factory.reconnector.start()
+
+        refused, dropped, welcoming = factory.pool.servers
+        for _ in range(500):
+            if welcoming.connects:
+                break
+            yield deferLater(reactor, 0.01, lambda: None)
+        self.assertEqual(welcoming.connects, 1)
+        self.assertEqual(factory.reconnector.current, welcoming)
+        self.assertGreaterEqual(refused.failures, 1)
+        self.assertGreaterEqual(dropped.failures, 1)
+        # The first connection to it was dropped, the sign on reset that.
+        self.assertEqual(live.connections, 2)
+        self.assertEqual((welcoming.failures, welcoming.retry_at), (0, 0.0))
+
+        factory.reconnector.stop()
+        lost = Deferred()
+        client, = live.clients
+        client.connectionLost = lambda reason: lost.callback(None)
+        client.transport.loseConnection()
+        yield lost
+        yield deferLater(reactor, 0, lambda: None)
@@ -0,0 +1,34 @@
+import json
+import os
+import time
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib import checkpoint
+
+
+class TestCheckpoint(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, 'checkpoint.json')
+
+    def test_read_once(self):
+        state = {'games': {'#trivia': {'clue_number': 2, 'streak': {'nick': 3}}}}
+        checkpoint.write(self._path, state)
+        self.assertEqual(checkpoint.read(self._path, max_age=60), state)
+        self.assertFalse(os.path.exists(self._path))
+        self.assertIsNone(checkpoint.read(self._path))
+
+    def test_max_age(self):
+        with open(self._path, 'w') as fd:
+            json.dump({'version': checkpoint.VERSION, 'time': time.time() - 120, 'state': {}}, fd)
+        self.assertIsNone(checkpoint.read(self._path, max_age=60))
+        self.assertFalse(os.path.exists(self._path))
+
+    def test_unreadable(self):
+        with open(self._path, 'w') as fd:
+            fd.write('{"version": 1, "ti')
+        self.assertIsNone(checkpoint.read(self._path))
+        self.assertFalse(os.path.exists(self._path))
@@ -0,0 +1,53 @@
+import importlib.util
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# utils/ is a directory of scripts, not a package.
+_spec = importlib.util.spec_from_file_location('dedup', os.path.join(ROOT, 'utils', 'dedup.py'))
+dedup = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(dedup)
+
+
+class TestDedup(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def run_dedup(self, *files):
+        '''
+        Writes files, a list of bytes, and deduplicates them in order.
+        Returns their contents afterwards.
+        '''
+        paths, seen = [], {}
+        for i, content in enumerate(files):
+            path = os.path.join(self._dir.name, 'questions_{}'.format(i))
+            with open(path, 'wb') as fd:
+                fd.write(content)
+            paths.append(path)
+            dedup.dedup_file(paths, seen, None, True)
+        contents = []
+        for path in paths:
+            with open(path, 'rb') as fd:
+                contents.append(fd.read())
+        return contents
+
+    def test_line_key(self):
+        self.assertEqual(dedup.line_key(b'What is  2+2? ` 4\n'), dedup.line_key(b'WHAT IS 2+2?`4\r\n'))
+        self.assertNotEqual(dedup.line_key(b'What is 2+2?`4\n'), dedup.line_key(b'What is 2*2?`4\n'))
+        self.assertNotEqual(dedup.line_key(b'Caf\xe9?`x\n'), dedup.line_key(b'Caf?`x\n'))
+
+    def test_delete(self):
+        first, second = self.run_dedup(
+            b'What is 2+2?`4\nWhat is 2*2?`4\n',
+            b'what is 2+2? `4\r\nCapital of Peru?`Lima\r\n',
+        )
+        self.assertEqual(first, b'What is 2+2?`4\nWhat is 2*2?`4\n')
+        self.assertEqual(second, b'Capital of Peru?`Lima\r\n')
+
+    def test_bytes_kept(self):
+        content, = self.run_dedup(b'Caf\xe9 au lait?`yes\n\nCaf\xe9 au lait?`yes\nNa\xc3\xafve?`no\n')
+        self.assertEqual(content, b'Caf\xe9 au lait?`yes\n\nNa\xc3\xafve?`no\n')
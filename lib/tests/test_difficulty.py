@@ -0,0 +1,75 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib.difficulty import MAGIC_V1, PRIOR, RECORD_V1, DifficultyTable, outcome, question_key
+from lib.questions import QuestionIndex
+from lib.scheduler import QuestionScheduler
+
+
+class TestDifficulty(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, 'difficulty.bin')
+
+    def test_outcome(self):
+        self.assertEqual(outcome(False, 5, 60), 1.0)
+        self.assertEqual(outcome(True, 0, 60), 0.0)
+        self.assertAlmostEqual(outcome(True, 30, 60), 0.45)
+        self.assertEqual(outcome(True, 120, 60), 0.9)
+        self.assertEqual(question_key('The Capital?'), question_key('the capital'))
+
+    def test_record_and_reload(self):
+        table = DifficultyTable(self._path)
+        self.assertIsNone(table.get('Q?'))
+        table.record('Q?', False, 0, 60)
+        table.record('Q?', False, 0, 60)
+        self.assertAlmostEqual(table.get('Q?'), (PRIOR * 2 + 2) / 4)
+        table.record('Easy?', True, 0, 60)
+        self.assertTrue(table.dirty)
+        table.save(table.snapshot())
+        self.assertFalse(table.dirty)
+
+        table = DifficultyTable(self._path)
+        self.assertEqual(len(table), 2)
+        self.assertEqual(table.stats('Q?'), (2, 0))
+        self.assertLess(table.get('Easy?'), PRIOR)
+
+    def test_clue(self):
+        table = DifficultyTable(self._path)
+        table.record('Q?', True, 10, 60, clue=1)
+        table.record('Q?', True, 30, 60, clue=3)
+        table.record('Q?', False, 0, 60)
+        self.assertIsNone(table.clue('Easy?'))
+        table.save(table.snapshot())
+        table = DifficultyTable(self._path)
+        self.assertEqual(table.stats('Q?'), (3, 2))
+        self.assertEqual(table.clue('Q?'), 2)
+
+    def test_read_v1(self):
+        with open(self._path, 'wb') as fd:
+            fd.write(MAGIC_V1 + RECORD_V1.pack(question_key('Q?'), 2, 1, 1.0))
+        table = DifficultyTable(self._path)
+        self.assertEqual(table.stats('Q?'), (2, 1))
+        self.assertIsNone(table.clue('Q?'))
+
+    def test_late_save(self):
+        table = DifficultyTable(self._path)
+        table.record('Q?', False, 0, 60)
+        older = table.snapshot()
+        table.record('Easy?', True, 0, 60)
+        table.save(table.snapshot())
+        table.save(older)
+        self.assertEqual(len(DifficultyTable(self._path)), 2)
+
+    def test_band(self):
+        with open(os.path.join(self._dir.name, 'q'), 'w') as f:
+            f.write('Hard?`a\nEasy?`b\nNew?`c\n')
+        table = DifficultyTable(self._path)
+        for _ in range(20):
+            table.record('Hard?', False, 0, 60)
+            table.record('Easy?', True, 1, 60)
+        scheduler = QuestionScheduler(QuestionIndex(self._dir.name), difficulty=table, band=(0.2, 0.8))
+        self.assertEqual(set(scheduler.next() for _ in range(20)), {('New?', 'c')})
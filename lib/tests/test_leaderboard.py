@@ -0,0 +1,39 @@
+from random import Random
+from unittest import TestCase
+
+from lib.leaderboard import Leaderboard
+
+
+class TestLeaderboard(TestCase):
+
+    def setUp(self):
+        self.board = Leaderboard({'alice': 30, 'bob': 10, 'carol': 20})
+
+    def test_rank(self):
+        self.assertEqual(self.board.rank('alice'), (1, 30, None))
+        self.assertEqual(self.board.rank('bob'), (3, 10, 'carol'))
+        self.assertIsNone(self.board.rank('dave'))
+
+    def test_updates(self):
+        self.assertEqual(self.board.add('bob', 25), 35)
+        self.assertEqual(self.board.rank('bob'), (1, 35, None))
+        self.board['alice'] = 5
+        self.assertEqual(self.board.top(2), [('bob', 35), ('carol', 20)])
+        del self.board['carol']
+        self.assertEqual(len(self.board), 2)
+        self.assertEqual(self.board.total, 40)
+        self.assertEqual(self.board.rank('alice'), (2, 5, 'bob'))
+
+    def test_top_sum(self):
+        rng = Random(3)
+        board = Leaderboard(top_k=3)
+        for _ in range(500):
+            user = 'p{}'.format(rng.randrange(8))
+            if user in board and rng.random() < 0.2:
+                del board[user]
+            else:
+                board.add(user, rng.randrange(-5, 20))
+            self.assertEqual(board.top_sum, sum(score for _, score in board.top(3)))
+        self.assertEqual(board.top_average(2), sum(score for _, score in board.top(2)) / 2)
+        board['p0'] = 1000
+        self.assertEqual(board.top_sum, sum(score for _, score in board.top(2)))
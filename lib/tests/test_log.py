@@ -0,0 +1,45 @@
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib import log
+
+
+class TestLog(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        root = logging.getLogger()
+        self._handlers, self._level = list(root.handlers), root.level
+        self.addCleanup(self._restore)
+
+    def _restore(self):
+        log.stop()
+        root = logging.getLogger()
+        root.handlers = self._handlers
+        root.setLevel(self._level)
+
+    def test_json_file(self):
+        path = os.path.join(self._dir.name, 'trivia.log')
+        log.setup(path=path, level='info', format='json', chat_sample=0.25, chat_logger='test.chat')
+        logging.getLogger('test').debug('hidden')
+        logging.getLogger('test').info('hello %s', 'there', extra={'user': 'alice'})
+        for i in range(8):
+            logging.getLogger('test.chat').info('line %d', i)
+        log.stop()
+
+        with open(path) as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual(entries[0]['message'], 'hello there')
+        self.assertEqual(entries[0]['user'], 'alice')
+        self.assertEqual(entries[0]['logger'], 'test')
+        self.assertEqual([e['message'] for e in entries[1:]], ['line 3', 'line 7'])
+
+    def test_sampler(self):
+        sampler = log.Sampler(0)
+        self.assertFalse(any(sampler.filter(None) for _ in range(10)))
+        sampler = log.Sampler(1)
+        self.assertTrue(all(sampler.filter(None) for _ in range(10)))
@@ -0,0 +1,59 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.metrics import Counter, Gauge, Histogram, LagMonitor, Registry
+
+
+class TestMetrics(TestCase):
+
+    def test_render(self):
+        registry = Registry()
+        answers = registry.register(Counter('answers_total', 'Answers'))
+        queue = registry.register(Gauge('queue', 'Queue depth'))
+        latency = registry.register(Histogram('latency_seconds', 'Latency', buckets=(0.1, 1)))
+        self.assertIs(registry.register(Counter('answers_total', 'Answers')), answers)
+        answers.inc()
+        answers.inc(2)
+        queue.set_function(lambda: 7)
+        for value in (0.05, 0.5, 0.5, 3):
+            latency.observe(value)
+        self.assertEqual(registry.render().splitlines(), [
+            '# HELP answers_total Answers',
+            '# TYPE answers_total counter',
+            'answers_total 3',
+            '# HELP queue Queue depth',
+            '# TYPE queue gauge',
+            'queue 7',
+            '# HELP latency_seconds Latency',
+            '# TYPE latency_seconds histogram',
+            'latency_seconds_bucket{le="0.1"} 1',
+            'latency_seconds_bucket{le="1.0"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            'latency_seconds_sum 4.05',
+            'latency_seconds_count 4',
+        ])
+
+    def test_timer(self):
+        latency = Histogram('latency_seconds', 'Latency')
+
+        @latency.time()
+        def work(n):
+            return n * 2
+
+        self.assertEqual(work(2), 4)
+        with latency.time():
+            pass
+        self.assertEqual(latency.count, 2)
+
+    def test_lag(self):
+        clock = Clock()
+        lag = Histogram('lag_seconds', 'Lag', buckets=(0.1, 1))
+        monitor = LagMonitor(interval=1, histogram=lag, reactor=clock)
+        monitor.start()
+        clock.advance(1)
+        clock.advance(1.5)
+        monitor.stop()
+        self.assertEqual(lag.count, 2)
+        self.assertAlmostEqual(lag.sum, 0.5)
+        self.assertEqual(clock.getDelayedCalls(), [])
@@ -0,0 +1,81 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.outbox import GAME, INFO, PRIVATE, Outbox
+
+
+class TestOutbox(TestCase):
+
+    def setUp(self):
+        self.sent = []
+        self.clock = Clock()
+        self.outbox = Outbox(lambda target, text: self.sent.append((target, text)),
+                             rate=1, max_length=20, reactor=self.clock)
+
+    def test_priority(self):
+        self.outbox.coalesce = False
+        self.outbox.put('alice', 'rank 1', PRIVATE)
+        self.outbox.put('alice', 'rank 2', PRIVATE)
+        self.outbox.put('#chan', 'clue', GAME)
+        self.outbox.put('#chan', 'news', INFO)
+        self.clock.advance(0)
+        self.assertEqual(self.sent, [('#chan', 'clue')])
+        self.clock.pump([1, 1, 1])
+        self.assertEqual([text for _, text in self.sent], ['clue', 'news', 'rank 1', 'rank 2'])
+        self.assertEqual(len(self.outbox), 0)
+
+    def test_fairness(self):
+        self.outbox.coalesce = False
+        for text in ('a1', 'a2', 'a3'):
+            self.outbox.put('alice', text)
+        self.outbox.put('bob', 'b1')
+        self.clock.pump([0, 1, 1, 1])
+        self.assertEqual([text for _, text in self.sent], ['a1', 'b1', 'a2', 'a3'])
+
+    def test_coalesce(self):
+        for text in ('one', 'two', 'a longer line'):
+            self.outbox.put('#chan', text, GAME)
+        self.clock.pump([0, 1])
+        self.assertEqual(self.sent, [('#chan', 'one | two'), ('#chan', 'a longer line')])
+        self.outbox.put('#chan', '\x0304red', GAME)
+        self.outbox.put('#chan', 'plain', GAME)
+        self.clock.advance(1)
+        self.assertEqual(self.sent[-1], ('#chan', '\x0304red\x0f | plain'))
+
+    def test_no_rate(self):
+        self.outbox.rate = None
+        self.outbox.put('#chan', 'now')
+        self.assertEqual(self.sent, [('#chan', 'now')])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_raw_lines(self):
+        self.outbox.put_line('MODE #chan +o alice', INFO)
+        self.outbox.put_line('MODE #chan +o bob', INFO)
+        self.clock.pump([0, 1])
+        self.assertEqual(self.sent, [(None, 'MODE #chan +o alice'), (None, 'MODE #chan +o bob')])
+
+    def test_drain(self):
+        self.outbox.coalesce = False
+        for text in ('a', 'b', 'c'):
+            self.outbox.put('#chan', text)
+        drained = []
+        self.outbox.drain(10).addCallback(drained.append)
+        self.clock.pump([0, 1])
+        self.assertEqual(len(self.sent), 2)
+        self.assertEqual(drained, [])
+        self.clock.advance(1)
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(drained, [None])
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+
+    def test_drain_timeout(self):
+        self.outbox.coalesce = False
+        for i in range(30):
+            self.outbox.put('#chan', str(i))
+        drained = []
+        self.outbox.drain(5).addCallback(drained.append)
+        self.clock.pump([0] + [1] * 5)
+        self.assertEqual(drained, [None])
+        self.assertEqual(len(self.sent), 5)
+        self.assertEqual(len(self.outbox), 0)
@@ -0,0 +1,63 @@
+from unittest import TestCase
+
+from lib.periods import DAY, DECAYED, DecayedScores, Periods, WindowedScores
+
+
+class TestPeriods(TestCase):
+
+    def test_window(self):
+        window = WindowedScores(DAY, 24)
+        window.add('alice', 10, 0)
+        window.add('bob', 5, 3600)
+        window.add('alice', 1, 3600)
+        self.assertEqual(window.top(5, 3600), [('alice', 11), ('bob', 5)])
+        # alice's first bucket leaves the window a day after it started.
+        self.assertEqual(window.top(5, DAY), [('bob', 5), ('alice', 1)])
+        self.assertEqual(window.rank('bob', DAY), (1, 5, None))
+        self.assertEqual(window.top(5, DAY + 3600), [])
+        self.assertIsNone(window.rank('alice', DAY + 3600))
+
+    def test_window_ignores_expired_wins(self):
+        window = WindowedScores(DAY, 24)
+        window.add('alice', 10, 2 * DAY)
+        window.add('bob', 10, 0)
+        self.assertEqual(window.top(5, 2 * DAY), [('alice', 10)])
+
+    def test_window_zero_points(self):
+        window = WindowedScores(DAY, 24)
+        window.add('alice', 10, 0)
+        window.add('alice', 0, 3600)
+        self.assertEqual(window.top(5, DAY), [])
+        self.assertEqual(window.top(5, DAY + 3600), [])
+        periods = Periods(half_life=None)
+        periods.add('bob', 0, 0)
+        self.assertEqual(periods['day'].top(5, 0), [])
+
+    def test_decay(self):
+        decayed = DecayedScores(half_life=DAY)
+        decayed.add('alice', 100, 0)
+        decayed.add('bob', 60, DAY)
+        self.assertEqual(decayed.top(5, DAY), [('bob', 60), ('alice', 50)])
+        self.assertEqual(decayed.top(5, 2 * DAY), [('bob', 30), ('alice', 25)])
+        self.assertEqual(decayed.rank('alice', 2 * DAY), (2, 25, 'bob'))
+
+    def test_decay_rebase(self):
+        decayed = DecayedScores(half_life=1)
+        decayed.add('alice', 2 ** 20, 0)
+        decayed.add('bob', 1, 40)
+        decayed.add('carol', 3, 40)
+        self.assertEqual(decayed.top(5, 40), [('carol', 3), ('bob', 1)])
+
+    def test_replay(self):
+        history = [
+            {'time': 0, 'user': 'alice', 'points': 10},
+            {'time': 10 * DAY, 'user': 'bob', 'points': 0},
+            {'time': 29 * DAY, 'user': 'bob', 'points': 7},
+            {'time': 31 * DAY, 'user': 'carol', 'points': 5},
+        ]
+        periods = Periods(half_life=DAY)
+        self.assertEqual(periods.replay(history, until=30 * DAY), 2)
+        self.assertEqual(set(periods), {'day', 'week', 'month', DECAYED})
+        self.assertEqual(periods['month'].top(5, 30 * DAY), [('bob', 7)])
+        self.assertEqual(periods['day'].top(5, 30 * DAY), [])
+        self.assertEqual(periods[DECAYED].top(5, 29 * DAY), [('bob', 7)])
@@ -0,0 +1,106 @@
+import os
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib.questions import QuestionIndex, QuestionPack, parse_question, write_pack
+from lib.scheduler import QuestionScheduler
+
+
+class TestQuestionIndex(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def _write(self, name, text):
+        with open(os.path.join(self._dir.name, name), 'w') as f:
+            f.write(text)
+
+    def test_parse_question(self):
+        self.assertEqual(parse_question('Q?`A\n'), ('Q?', 'A'))
+        self.assertIsNone(parse_question('no separator'))
+        self.assertIsNone(parse_question('a`b`c'))
+
+    def test_skips_broken_lines(self):
+        self._write('a', 'Q1?`one\nbroken\n\nQ2?`two')
+        index = QuestionIndex(self._dir.name)
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index.broken, 1)
+        self.assertEqual(index.get(1), ('Q2?', 'two'))
+
+    def test_refresh(self):
+        self._write('a', 'Q1?`one\n')
+        index = QuestionIndex(self._dir.name)
+        self.assertFalse(index.refresh())
+        self._write('b', 'Q2?`two\nQ3?`three\n')
+        self.assertTrue(index.refresh())
+        self.assertEqual(len(index), 3)
+        self.assertIn(index.random(), [('Q1?', 'one'), ('Q2?', 'two'), ('Q3?', 'three')])
+        os.remove(os.path.join(self._dir.name, 'a'))
+        self.assertTrue(index.refresh())
+        self.assertEqual(len(index), 2)
+
+
+class TestQuestionPack(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, 'questions.pack')
+
+    def test_round_trip(self):
+        questions = [('Q1?', 'one', 'a'), ('Qué?', 'ñandú', 'b'), ('Q3?', 'three', 'a')]
+        write_pack(self._path, questions)
+        pack = QuestionPack(self._path)
+        self.assertEqual(len(pack), 3)
+        self.assertEqual(pack.get(1), ('Qué?', 'ñandú'))
+        self.assertEqual(pack.category(2), 'a')
+        self.assertEqual(pack.categories, ['a', 'b'])
+        self.assertIn(pack.random(), [(q, a) for q, a, _ in questions])
+        with self.assertRaises(IndexError):
+            pack.get(3)
+
+    def test_refresh(self):
+        write_pack(self._path, [('Q1?', 'one', 'a')])
+        pack = QuestionPack(self._path)
+        self.assertFalse(pack.refresh())
+        write_pack(self._path, [('Q1?', 'one', 'a'), ('Q2?', 'two', 'a')])
+        os.utime(self._path, ns=(0, 0))
+        self.assertTrue(pack.refresh())
+        self.assertEqual(pack.get(1), ('Q2?', 'two'))
+
+
+class TestQuestionScheduler(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        os.makedirs(os.path.join(self._dir.name, 'science'))
+        self._write('science/physics', ''.join('P{}?`p\n'.format(i) for i in range(10)))
+        self._write('sports', ''.join('S{}?`s\n'.format(i) for i in range(10)))
+        self.index = QuestionIndex(self._dir.name)
+
+    def _write(self, name, text):
+        with open(os.path.join(self._dir.name, name), 'w') as f:
+            f.write(text)
+
+    def test_spans(self):
+        self.assertEqual(list(self.index.spans()), [('sports', 0, 10), ('science/physics', 10, 20)])
+        path = os.path.join(self._dir.name, 'questions.pack')
+        write_pack(path, [('Q?', 'a', 'x'), ('Q?', 'a', 'x'), ('Q?', 'a', 'y'), ('Q?', 'a', 'x')])
+        self.assertEqual(list(QuestionPack(path).spans()), [('x', 0, 2), ('y', 2, 3), ('x', 3, 4)])
+
+    def test_no_repeats(self):
+        scheduler = QuestionScheduler(self.index, window=15)
+        picks = [scheduler.pick() for _ in range(100)]
+        for n in range(len(picks) - 15):
+            self.assertEqual(len(set(picks[n:n + 16])), 16)
+
+    def test_weights(self):
+        scheduler = QuestionScheduler(self.index, weights={'science': 0})
+        self.assertEqual(scheduler.weight('science/physics'), 0)
+        self.assertTrue(all(scheduler.pick() < 10 for _ in range(50)))
+        scheduler.weights = {'sports': 0, 'science/physics': 0}
+        scheduler.rebuild()
+        with self.assertRaises(IndexError):
+            scheduler.pick()
@@ -0,0 +1,88 @@
+from twisted.internet import defer, reactor
+from twisted.internet.task import deferLater
+from twisted.trial.unittest import TestCase
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+
+from lib.remote import RemoteQuestionSource, logger
+
+
+class _Questions(Resource):
+    isLeaf = True
+
+    def __init__(self, body, code=200):
+        super().__init__()
+        self.body = body
+        self.code = code
+        self.requests = 0
+
+    def render_GET(self, request):
+        self.requests += 1
+        request.setResponseCode(self.code)
+        return self.body
+
+
+class _Hanging(Resource):
+    isLeaf = True
+
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+
+    def render_GET(self, request):
+        self.requests.append(request)
+        return NOT_DONE_YET
+
+
+class TestRemoteQuestionSource(TestCase):
+
+    def _serve(self, resource):
+        port = reactor.listenTCP(0, Site(resource), interface='127.0.0.1')
+        self.addCleanup(port.stopListening)
+        return 'http://127.0.0.1:{}/'.format(port.getHost().port)
+
+    def _source(self, url, **kwargs):
+        source = RemoteQuestionSource(url, **kwargs)
+        self.addCleanup(source.stop)
+        return source
+
+    @defer.inlineCallbacks
+    def _wait_for(self, predicate):
+        for _ in range(200):
+            if predicate():
+                return
+            yield deferLater(reactor, 0.01, lambda: None)
+        self.fail('condition not reached')
+
+    @defer.inlineCallbacks
+    def test_prefetch(self):
+        resource = _Questions(b'Q1?`one\nbroken\nQ2?`two\nQ3?`three\n')
+        source = self._source(self._serve(resource), size=3)
+        self.assertIsNone(source.pop())
+        source.start()
+        yield self._wait_for(lambda: len(source) == 3)
+        self.assertEqual(resource.requests, 1)
+        self.assertIn(source.pop(), [('Q1?', 'one'), ('Q2?', 'two'), ('Q3?', 'three')])
+
+    @defer.inlineCallbacks
+    def test_backoff_on_error(self):
+        resource = _Questions(b'', code=500)
+        source = self._source(self._serve(resource), size=3, min_backoff=10)
+        source.start()
+        yield self._wait_for(lambda: source.failures == 1)
+        self.assertEqual(resource.requests, 1)
+        self.assertIsNone(source.pop())
+        self.assertEqual(len(source), 0)
+
+    @defer.inlineCallbacks
+    def test_stop_while_fetching(self):
+        resource = _Hanging()
+        source = self._source(self._serve(resource))
+        source.start()
+        yield self._wait_for(lambda: resource.requests)
+        with self.assertLogs('lib.remote', 'DEBUG') as logs:
+            logger.debug('stopping')
+            source.stop()
+            yield deferLater(reactor, 0.05, lambda: None)
+        self.assertEqual(source.failures, 0)
+        self.assertEqual(logs.output, ['DEBUG:lib.remote:stopping'])
@@ -0,0 +1,35 @@
+from unittest import TestCase
+
+from lib.leaderboard import Leaderboard
+from lib.scoring import ScoringRules, award, score_win, winner_rank
+
+
+class TestScoring(TestCase):
+
+    def setUp(self):
+        self.rules = ScoringRules(base_points=10, min_users=3, max_points=40, unpriviledged_group=2)
+
+    def test_flat(self):
+        self.assertEqual(award(self.rules, 1, 3, 1), (10, None))
+        self.assertEqual(award(self.rules, 1, 3, 2), (6, None))
+        self.assertEqual(award(self.rules, 1, 3, 9), (2, None))
+
+    def test_progressive(self):
+        # Interpolated from 10 points at rank 2 to 40 at the last rank.
+        self.assertEqual(award(self.rules, 5, 5, 1), (40, 40))
+        self.assertEqual(award(self.rules, 4, 5, 1), (30, 40))
+        self.assertEqual(award(self.rules, 1, 5, 1), (10, 40))
+
+    def test_increasing(self):
+        rules = self.rules._replace(max_points='increasing')
+        self.assertTrue(rules.needs_average(5))
+        self.assertFalse(rules.needs_average(3))
+        # max(6000 / 60, 15) = 100 for the last player.
+        self.assertEqual(award(rules, 5, 5, 1, top_average=6000), (100, 100))
+
+    def test_score_win(self):
+        scores = Leaderboard({'a': 100, 'b': 50, 'c': 20, 'd': 10})
+        self.assertEqual(winner_rank(scores, 'c'), (3, 4))
+        self.assertEqual(winner_rank(scores, 'new'), (5, 5))
+        self.assertEqual(score_win(self.rules, scores, 'new', 1), (40, 40))
+        self.assertEqual(len(scores), 4)
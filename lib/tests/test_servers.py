@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from twisted.internet.task import Clock
+
+from lib.servers import PingTracker, Reconnector, ServerPool
+
+
+class TestServers(TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def _pool(self, servers=(('a', 6667), ('b', 6667)), jitter=0.0):
+        return ServerPool(list(servers), initial_delay=1, max_delay=8, jitter=jitter,
+                          clock=self.clock.seconds, rng=lambda: 1.0)
+
+    def test_backoff(self):
+        pool = self._pool()
+        self.assertEqual([pool.backoff(n) for n in range(6)], [0, 1, 2, 4, 8, 8])
+        self.assertEqual(self._pool(jitter=0.5).backoff(3), 2)
+
+    def test_failover(self):
+        pool = self._pool()
+        a, b = pool.servers
+        self.assertEqual(pool.next(), (a, 0))
+        pool.failed(a, 'refused')
+        self.assertEqual(pool.next(), (b, 0))
+        pool.failed(b, 'refused')
+        self.assertEqual(pool.next(), (a, 1))
+        self.clock.advance(1)
+        pool.failed(a, 'refused')
+        self.assertEqual(pool.next(), (b, 0))
+        pool.succeeded(b)
+        self.assertEqual((b.failures, b.connects), (0, 1))
+        # Back to the first server once it can be tried again.
+        pool.failed(b, 'lost')
+        self.clock.advance(10)
+        self.assertEqual(pool.next(), (a, 0))
+
+    def test_reconnector(self):
+        attempts = []
+        pool = self._pool()
+        reconnector = Reconnector(pool, attempts.append, reactor=self.clock)
+        reconnector.start()
+        self.clock.advance(0)
+        self.assertEqual(attempts, pool.servers[:1])
+        reconnector.failed('refused')
+        reconnector.start()
+        self.clock.advance(0)
+        self.assertEqual(attempts, pool.servers)
+        reconnector.failed('refused')
+        self.clock.advance(0.5)
+        self.assertEqual(len(attempts), 2)
+        self.clock.advance(0.5)
+        self.assertEqual(attempts[-1], pool.servers[0])
+        reconnector.connected()
+        self.assertEqual(pool.servers[0].failures, 0)
+        reconnector.stop()
+        reconnector.failed('lost')
+        self.clock.advance(10)
+        self.assertEqual(len(attempts), 3)
+
+    def test_ping_tracker(self):
+        pings = PingTracker(timeout=30, clock=self.clock.seconds)
+        token = pings.ping()
+        self.clock.advance(2)
+        self.assertIsNone(pings.pong('other'))
+        self.assertEqual(pings.pong(token), 2)
+        self.assertFalse(pings.stale())
+        pings.ping()
+        self.clock.advance(20)
+        pings.ping()
+        self.clock.advance(20)
+        self.assertTrue(pings.stale())
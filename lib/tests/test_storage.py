@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib.storage import JournalStore, SqliteStore
+
+
+class TestJournalStore(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self.store = JournalStore(self._dir.name)
+        self.addCleanup(self.store.close)
+
+    def test_replay(self):
+        self.store.record('alice', 10, 10)
+        self.store.record('bob', 5, 5)
+        self.store.record('alice', 15, 5)
+        self.assertEqual(JournalStore(self._dir.name).load(), {'alice': 15, 'bob': 5})
+
+    def test_compact(self):
+        self.store.record('alice', 10, 10)
+        self.assertTrue(self.store.begin_save())
+        self.assertFalse(self.store.begin_save())
+        self.store.record('bob', 5, 5)
+        self.store.save({'alice': 10})
+        with open(os.path.join(self._dir.name, 'scores.json')) as fd:
+            self.assertEqual(json.load(fd), {'alice': 10})
+        self.assertEqual(self.store.load(), {'alice': 10, 'bob': 5})
+
+    def test_truncated_line(self):
+        self.store.record('alice', 10, 10)
+        self.store.close()
+        with open(os.path.join(self._dir.name, 'scores.journal'), 'a') as fd:
+            fd.write('{"u": "bo')
+        self.store.record('carol', 3, 3)
+        self.assertEqual(self.store.load(), {'alice': 10, 'carol': 3})
+
+
+class TestSqliteStore(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+
+    def test_migrates_json(self):
+        journal = JournalStore(self._dir.name)
+        journal.record('alice', 10, 10)
+        journal.record_answer('alice', 'Q?', 'A', 1, 2.5, 10)
+        journal.save_freezelist({'mallory'})
+        journal.close()
+
+        store = SqliteStore(self._dir.name)
+        self.addCleanup(store.close)
+        self.assertEqual(store.load(), {'alice': 10})
+        self.assertEqual(store.load_freezelist(), {'mallory'})
+        self.assertEqual([h['question'] for h in store.history()], ['Q?'])
+
+    def test_batched_writes(self):
+        store = SqliteStore(self._dir.name, batch_size=2)
+        store.record('alice', 10, 10)
+        self.assertFalse(store.should_save())
+        store.record('bob', 20, 20)
+        self.assertTrue(store.should_save())
+        self.assertEqual(store.load(), {})
+        self.assertTrue(store.begin_save())
+        store.save()
+        self.assertFalse(store.begin_save())
+        self.assertEqual(store.load(), {'alice': 10, 'bob': 20})
+        store.record('carol', 5, 5)
+        store.close()
+        self.assertEqual(SqliteStore(self._dir.name).load(), {'alice': 10, 'bob': 20, 'carol': 5})
+
+    def test_close_during_save(self):
+        store = SqliteStore(self._dir.name)
+        store.record('alice', 10, 10)
+        self.assertTrue(store.begin_save())
+        store.record('bob', 20, 20)
+        worker = threading.Timer(0.05, store.save)
+        worker.start()
+        store.close()
+        worker.join()
+        self.assertEqual(SqliteStore(self._dir.name).load(), {'alice': 10, 'bob': 20})
+
+    def test_close_without_worker(self):
+        store = SqliteStore(self._dir.name)
+        store.record('alice', 10, 10)
+        self.assertTrue(store.begin_save())
+        store.record('bob', 20, 20)
+        # The worker thread never runs, or runs too late.
+        store.close()
+        store.save()
+        self.assertEqual(SqliteStore(self._dir.name).load(), {'alice': 10, 'bob': 20})
+
+    def test_history_chunks(self):
+        store = SqliteStore(self._dir.name)
+        self.addCleanup(store.close)
+        store.HISTORY_CHUNK = 2
+        for i in range(5):
+            store.record_answer('alice', 'Q{}?'.format(i), 'A', 1, 2.5, 10)
+        self.assertTrue(store.begin_save())
+        store.save()
+        self.assertEqual([h['question'] for h in store.history()], ['Q{}?'.format(i) for i in range(5)])
@@ -0,0 +1,41 @@
+from unittest import TestCase
+
+from lib.templates import Catalog, RenderCache, strip_formatting
+
+MESSAGES = {
+    'CLUE': {'en': 'Clue: {}', 'ro': 'Indiciu: {}', 'color': '02,00'},
+    'NEXT': {'en': 'Next question:'},
+}
+
+
+class TestTemplates(TestCase):
+
+    def test_catalog(self):
+        catalog = Catalog(MESSAGES, 'ro', default_color='13,06')
+        self.assertEqual(catalog.CLUE, '\x0302,00Indiciu: {}')
+        # Falls back to English and the default color.
+        self.assertEqual(catalog.NEXT, '\x0313,06Next question:')
+        self.assertTrue(catalog.colors)
+
+    def test_catalog_without_colors(self):
+        catalog = Catalog(MESSAGES, 'en', default_color='13,06', colors=False)
+        self.assertEqual(catalog.CLUE, 'Clue: {}')
+        self.assertEqual(catalog.NEXT, 'Next question:')
+
+    def test_render_cache(self):
+        catalog = Catalog(MESSAGES, 'en')
+        lines = RenderCache(catalog)
+        line = lines.render('CLUE', 'a__')
+        self.assertEqual(line, '\x0302,00Clue: a__')
+        self.assertIs(lines.render('CLUE', 'a__'), line)
+        lines.render('CLUE', 'ab_')
+        self.assertEqual(len(lines), 2)
+        lines.clear()
+        self.assertEqual(len(lines), 0)
+
+    def test_strip_formatting(self):
+        self.assertEqual(strip_formatting('\x0308,01Question:'), 'Question:')
+        self.assertEqual(strip_formatting('\x034red\x03 and \x02bold\x0f 12,3'), 'red and bold 12,3')
+        self.assertEqual(strip_formatting('\x03,5'), ',5')
+        text = 'nothing to strip'
+        self.assertIs(strip_formatting(text), text)
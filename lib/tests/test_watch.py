@@ -0,0 +1,46 @@
+import os
+import types
+from tempfile import TemporaryDirectory
+from unittest import TestCase
+
+from lib.watch import FileWatcher, reload_config
+
+
+class TestWatch(TestCase):
+
+    def setUp(self):
+        self._dir = TemporaryDirectory()
+        self.addCleanup(self._dir.cleanup)
+        self._path = os.path.join(self._dir.name, 'conf.py')
+
+    def _write(self, text, mtime):
+        with open(self._path, 'w') as f:
+            f.write(text)
+        os.utime(self._path, ns=(mtime, mtime))
+
+    def test_changed(self):
+        watcher = FileWatcher()
+        self.assertTrue(watcher.changed(self._path))
+        self.assertFalse(watcher.changed(self._path))
+        self._write('A = 1\n', 1)
+        self.assertTrue(watcher.changed(self._path))
+        self.assertFalse(watcher.changed(self._path))
+        self._write('A = 2\n', 2)
+        self.assertTrue(watcher.changed(self._path))
+        watcher.forget(self._path)
+        self.assertTrue(watcher.changed(self._path))
+
+    def test_reload_config(self):
+        self._write('A = 1\nB = 2\nC = 3\n', 1)
+        module = types.ModuleType('conf')
+        module.__file__ = self._path
+        module.A, module.B, module.C = 1, 2, 3
+        self._write('A = 10\nB = 2\n', 2)
+        self.assertEqual(reload_config(module, ('A', 'B', 'C')), ['A', 'C'])
+        self.assertEqual(module.A, 10)
+        self.assertFalse(hasattr(module, 'C'))
+
+        self._write('A = (\n', 3)
+        with self.assertRaises(SyntaxError):
+            reload_config(module, ('A',))
+        self.assertEqual(module.A, 10)
@@ -0,0 +1,61 @@
+import os
+import runpy
+
+_MISSING = object()
+
+
+class FileWatcher:
+    '''
+    Tells whether files changed since they were last looked at, going by
+    their modification time and size. A file seen for the first time
+    counts as changed, and so does one that appears or disappears.
+    '''
+
+    def __init__(self):
+        self._stats = {}
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def changed(self, path):
+        '''
+        Returns True if path changed since the previous call for it.
+        '''
+        stat = self._stat(path)
+        if path in self._stats and self._stats[path] == stat:
+            return False
+        self._stats[path] = stat
+        return True
+
+    def forget(self, path):
+        '''
+        Makes the next changed() call for path return True.
+        '''
+        self._stats.pop(path, None)
+
+
+def reload_config(module, keys):
+    '''
+    Runs the file module was loaded from again and copies the given keys
+    to it. Keys removed from the file are removed from the module too.
+    Returns the names of the keys whose value changed.
+
+    The file is run in a fresh namespace, so a broken file raises before
+    anything is touched.
+    '''
+    values = runpy.run_path(module.__file__)
+    changed = []
+    for key in keys:
+        if key in values:
+            if getattr(module, key, _MISSING) != values[key]:
+                setattr(module, key, values[key])
+                changed.append(key)
+        elif hasattr(module, key):
+            delattr(module, key)
+            changed.append(key)
+    return changed
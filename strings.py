@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
-import config
+from functools import lru_cache
+
+from lib.templates import Catalog
 
 EN = "en"
 RO = "ro"
@@ -80,13 +82,13 @@ class Text:
         COLOR: "08,01",
     }
     COMMANDS = {
-        EN: "Commands: score, standings, repeat, help, next, source",
-        RO: "Comenzi pentru jucători: score, standings, repeat, help, next, source",
+        EN: "Commands: score, rank [day|week|month|recent] [n], repeat, help, next, source",
+        RO: "Comenzi pentru jucători: score, rank [day|week|month|recent] [n], repeat, help, next, source",
         COLOR: "08,01",
     }
     ADMIN_CMDS = {
-        EN: "Admin commands: die, set <user> <score>, start, stop, save, skip, freeze, unfreeze",
-        RO: "Comenzi pentru admini: die, set <user> <score>, start, stop, save, skip, audio, text, freeze, unfreeze",
+        EN: "Admin commands: die, set <user> <score>, start, stop, save, skip, freeze, unfreeze, reload",
+        RO: "Comenzi pentru admini: die, set <user> <score>, start, stop, save, skip, audio, text, freeze, unfreeze, reload",
         COLOR: "08,01",
     }
     NOT_ALLOWED = {
@@ -121,8 +123,8 @@ class Text:
     }
     RANKINGS = {EN: "Current rankings were:", RO: "Clasamentul actual:", COLOR: "09,01"}
     AUDIO_ON = {
-        EN: f"Channel is on Audio mode. Listen to the stream at: {config.AUDIO_URL}",
-        RO: f"Canalul este pe modul Audio. Ascultați fluxul de la: {config.AUDIO_URL}",
+        EN: "Channel is on Audio mode. Listen to the stream at: {}",
+        RO: "Canalul este pe modul Audio. Ascultați fluxul de la: {}",
         COLOR: "08,01",
     }
     AUDIO_OFF = {
@@ -155,6 +157,26 @@ class Text:
         RO: "Acesta este clasamentul curent:",
         COLOR: "08,01",
     }
+    PERIOD_STANDINGS = {
+        EN: "The trivia standings ({}) are: ",
+        RO: "Acesta este clasamentul ({}):",
+        COLOR: "08,01",
+    }
+    NO_PERIOD = {
+        EN: "There is no {} ranking. Try: {}",
+        RO: "Nu există clasamentul {}. Încearcă: {}",
+        COLOR: "08,01",
+    }
+    PERIOD_NOT_READY = {
+        EN: "The {} ranking is not ready yet, try again in a moment.",
+        RO: "Clasamentul {} nu este gata încă, încearcă din nou imediat.",
+        COLOR: "08,01",
+    }
+    QUESTIONS_NOT_READY = {
+        EN: "The questions are not loaded yet, try again in a moment.",
+        RO: "Întrebările nu sunt încărcate încă, încearcă din nou imediat.",
+        COLOR: "08,01",
+    }
     TIMMING = {
         EN: "{} has given the answer in {}.{} seconds.",
         RO: "{} a dat răspunsul corect în {}.{} secunde.",
@@ -217,15 +239,9 @@ class Text:
     }
 
 
-def genTrans(lang):
-    t = Text()
-    for k in dir(t):
-        if not k.startswith("_"):
-            o = getattr(Text, k)
-            cc = "{}{}".format("\003", o[COLOR] if COLOR in o else DEFAULT_COLOR)
-            if lang in o:
-                setattr(t, k, "{}{}".format(cc, o[lang]))
-            else:
-                setattr(t, k, "{}{}".format(cc, o[EN]))
-
-    return t
+@lru_cache(maxsize=None)
+def genTrans(lang, colors=True):
+    """Returns the messages compiled for lang, with their colors unless
+    colors is false. Each language is compiled once."""
+    messages = {name: variants for name, variants in vars(Text).items() if not name.startswith("_")}
+    return Catalog(messages, lang, fallback=EN, color_key=COLOR, default_color=DEFAULT_COLOR, colors=colors)
@@ -21,22 +21,22 @@
 # players, wait some, then continue.
 #
 
-import json
+import copy
+import logging
 import os
-import string
+import stat
 import subprocess
 import sys
-from typing import Optional
-import urllib
-from datetime import datetime
-from os import execl, listdir, path
+import time
+from typing import Callable, NamedTuple, Optional
+from datetime import datetime, timedelta
+from os import execl
 from random import choice
-from sys import stdout
 
-from twisted.internet import reactor
+from twisted.internet import reactor, threads
 from twisted.internet.protocol import ClientFactory
 from twisted.internet.task import LoopingCall
-from twisted.python.log import startLogging
+from twisted.python.log import PythonLoggingObserver
 from twisted.words.protocols import irc
 
 if len(sys.argv) > 1:
@@ -54,18 +54,24 @@ if len(sys.argv) > 1:
 else:
     import config
 
+from lib import checkpoint
+from lib import log
+from lib import metrics
 from lib.answer import Answer
+from lib.difficulty import DifficultyTable
+from lib.outbox import GAME, INFO, PRIVATE, Outbox
+from lib.questions import QuestionIndex, QuestionPack
+from lib.scheduler import QuestionScheduler
+from lib.scoring import ScoringRules, award, winner_rank
+from lib.periods import HALF_LIFE, Periods
+from lib.scoreboard import Scoreboard
+from lib.servers import PingTracker, Reconnector, ServerPool
+from lib.storage import JournalStore, SqliteStore
+from lib.templates import RenderCache, strip_formatting
+from lib.watch import FileWatcher, reload_config
 from strings import genTrans
-from utils import interp
 
-text = genTrans(config.LANG)
-
-if not os.path.exists(config.SAVE_DIR):
-    os.makedirs(config.SAVE_DIR)
-
-if config.USE_SSL.lower() == "yes":
-    from twisted.internet import ssl
-elif config.USE_SSL.lower() != "no":
+if config.USE_SSL.lower() not in ("yes", "no"):
     # USE_SSL wasn't yes and it's not no, so raise an error.
     raise ValueError("USE_SSL must either be 'yes' or 'no'.")
 
@@ -75,12 +81,107 @@ try:
 except AttributeError:
     config.COLOR_CODE = ""
 
-points = {
-    0: 1,
-    1: 3 / 5,
-    2: 2 / 5,
-    3: 1 / 5,
-}
+DEFAULT_SCOREBOARD = "default"
+# Games saved by !restart and !update for the next process, in SAVE_DIR.
+CHECKPOINT = "checkpoint.json"
+# Seconds given to the reactor to write the last messages before handing
+# the connection over to a new process.
+HANDOFF_DELAY = 1
+# Longest wait, in seconds, for the outbox to be sent before leaving.
+QUIT_DRAIN = 10
+# Environment variable giving the exec'd process the descriptor of the
+# socket handed over to it.
+HANDOFF_FD = "TRIVIA_HANDOFF_FD"
+
+# Config keys applied by !reload and when the config file changes. The
+# others (server, nick, channels, storage, ...) need a restart.
+RELOADABLE = (
+    "ADMINS",
+    "ANNOUNCEMENTS_DELAY",
+    "ANNOUNCEMENTS_TXT",
+    "AUDIO_DELAY",
+    "AUDIO_URL",
+    "AUDIO_WAIT_INTERVAL",
+    "AUTO_OP_ADMINS",
+    "BASE_POINTS",
+    "ENABLE_REWARDS",
+    "FUZZY_MAX_DISTANCE",
+    "MAX_POINTS",
+    "MESSAGE_RANKING",
+    "MIN_USERS_FOR_PRIVILEDGE",
+    "Q_CATEGORY_WEIGHTS",
+    "Q_DIFFICULTY_BAND",
+    "Q_REPEAT_WINDOW",
+    "Q_RESCAN_INTERVAL",
+    "RANK_REWARDS_MAP",
+    "SAVE_INTERVAL",
+    "STREAK_REWARDS_MAP",
+    "UNPRIVILEDGED_GROUP",
+    "UPDATE_SCRIPT",
+    "WAIT_INTERVAL",
+)
+
+logger = logging.getLogger("trivia")
+# Every line said in the channels, sampled by config.LOG_CHAT_SAMPLE.
+chat_log = logging.getLogger("trivia.chat")
+
+PRIVMSG_SECONDS = metrics.histogram("trivia_privmsg_seconds", "Time spent handling a message")
+QUESTION_SECONDS = metrics.histogram("trivia_question_seconds", "Time spent selecting a question")
+QUESTION_LOAD_SECONDS = metrics.histogram(
+    "trivia_question_load_seconds", "Time spent loading or rescanning the questions"
+)
+QUESTIONS = metrics.gauge("trivia_questions", "Questions available")
+OUTBOX_DEPTH = metrics.gauge("trivia_outbox_depth", "Messages waiting to be sent")
+IRC_LAG = metrics.gauge("trivia_irc_lag_seconds", "Round trip of the last PING to the server")
+CONNECTION_FAILURES = metrics.counter(
+    "trivia_irc_connection_failures_total", "Failed attempts to connect and connections lost"
+)
+ANSWERS = metrics.counter("trivia_answers_total", "Questions answered")
+SOLVE_SECONDS = metrics.histogram(
+    "trivia_solve_seconds", "Time players took to answer", buckets=(1, 2, 5, 10, 15, 20, 30, 45, 60, 90, 120)
+)
+
+# Control characters (colors, bold, ...) removed from incoming messages.
+SANITIZE = dict.fromkeys(list(range(32)) + [127])
+
+
+def command(name: str, admin: bool = False):
+    """Registers a triviabot method as the handler of a command."""
+
+    def register(method):
+        method.commands = getattr(method, "commands", ()) + ((name, admin),)
+        return method
+
+    return register
+
+
+def game_channels() -> dict:
+    """Channels to play in with their options, from config.GAME_CHANNELS or
+    config.GAME_CHANNEL."""
+    channels = getattr(config, "GAME_CHANNELS", None) or [config.GAME_CHANNEL]
+    if isinstance(channels, dict):
+        return channels
+    return {channel: {} for channel in channels}
+
+
+def servers() -> list:
+    """(host, port) of the servers to connect to, from config.SERVERS or
+    config.SERVER and config.SERVER_PORT."""
+    return getattr(config, "SERVERS", None) or [(config.SERVER, config.SERVER_PORT)]
+
+
+def handed_over(connection: dict) -> bool:
+    """Tells if the socket of a checkpoint was handed over to this process:
+    the previous one named its descriptor in the environment right before
+    exec'ing it, and it is still a socket. A checkpoint left by a crash or
+    a failed exec is never trusted with a descriptor."""
+    fd = os.environ.pop(HANDOFF_FD, None)
+    if fd != str(connection["fd"]):
+        return False
+    try:
+        return stat.S_ISSOCK(os.fstat(connection["fd"]).st_mode)
+    except OSError:
+        return False
 
 
 def is_higher_mode(mode1: str, mode2: Optional[str]) -> bool:
@@ -89,85 +190,69 @@ def is_higher_mode(mode1: str, mode2: Optional[str]) -> bool:
     return mode2 is None or modes.index(mode1) > modes.index(mode2)
 
 
-class triviabot(irc.IRCClient):
-    """This is the irc bot portion of the trivia bot.
+class TriviaGame:
+    """A trivia game running in one channel.
 
-    It implements the whole program so is kinda big. The algorithm is
-    implemented by a series of callbacks, initiated by an admin on the
-    server.
+    Holds everything about the round being played (question, clues,
+    votes, streaks, timer). Questions, the freeze list and the connection
+    belong to the bot and are shared by all its games; the scoreboard can
+    be shared with other games.
     """
 
-    def __init__(self):
-        self._answer = Answer()
+    def __init__(self, bot, channel, scoreboard, text):
+        self.bot = bot
+        self.channel = channel
+        self.scoreboard = scoreboard
+        # The messages in the language of the channel, and the lines of the
+        # current round rendered from them.
+        self.text = text
+        self._lines = RenderCache(text)
+        self._answer = Answer(max_distance=getattr(config, "FUZZY_MAX_DISTANCE", 0))
         self._question = ""
-        self._scores = {}
         self._streak = {}
         self._rewarded_modes = {}
         self._clue_number = 0
         self._block_rank = False
-        self._admins = list(config.ADMINS)
-        self._admins.append(config.OWNER)
-        self._game_channel = config.GAME_CHANNEL
-        self._questions_dir = config.Q_DIR
         self._locutor_mode = False
         self._locutor_nick = ""
         self._lc = LoopingCall(self._play_game)
-        self._quit = False
-        self._restarting = False
-        self._load_game()
+        self._announcements = None
         self._votes = 0
         self._voters = []
-        self.nickname = config.DEFAULT_NICK
-        self._load_freezelist()
-        self.load_announcements()
+        # Whether the game starts once the questions are loaded.
+        self.autostart = True
 
-    def load_announcements(self):
-        """Load messages."""
-        self._messages = []
-        if config.MESSAGE_RANKING:
-            self._messages.append(None)
-        try:
-            with open(config.ANNOUNCEMENTS_TXT, "r") as f:
-                for message in f.readlines():
-                    self._messages.append(message.strip())
-        except FileNotFoundError:
-            print(f"No messages file found at {config.ANNOUNCEMENTS_TXT}")
+    @property
+    def _scores(self):
+        return self.scoreboard.scores
 
-    def _get_nickname(self):
-        return self.factory.nickname
-
-    def _get_lineRate(self):
-        return self.factory.lineRate
+    def _cmsg(self, dest, msg, lane=PRIVATE):
+        if not self.text.colors:
+            msg = strip_formatting(msg)
+        self.bot._cmsg(dest, msg, lane)
 
-    lineRate = property(_get_lineRate)
-
-    def _cmsg(self, dest, msg):
-        """Write a colorized message."""
-        # self.msg(dest, "{}{}".format(config.COLOR_CODE, msg))
-        self.msg(dest, msg)
-
-    def _gmsg(self, msg):
+    def _gmsg(self, msg, lane=GAME):
         """Write a message to the channel playing the trivia game."""
-        self._cmsg(self._game_channel, msg)
+        self._cmsg(self.channel, msg, lane)
 
     def _delayed_start(self):
         """Start for audio mode."""
         self._clue_number = 1
         self._start_time = datetime.now()
-        self._gmsg(text.CLUE.format(self._answer.current_clue()))
+        self._gmsg(self._lines.render("CLUE", self._answer.current_clue()))
         self._lc.start(config.WAIT_INTERVAL if not self._locutor_mode else config.AUDIO_WAIT_INTERVAL, now=False)
 
     def _display_announcements(self):
         """Display announcements to the channel."""
-        if self._messages:
-            m = choice(self._messages)
+        messages = self.bot.load_announcements()
+        if messages:
+            m = choice(messages)
             if m is None:  # we display ranking
-                self._standings(None, self._game_channel, None)
+                self._standings(None, None, self.channel)
             else:
-                self._gmsg(m)
+                self._gmsg(m, INFO)
 
-        self.load_announcements()
-        reactor.callLater(config.ANNOUNCEMENTS_DELAY, self._display_announcements)
+        self._announcements = reactor.callLater(config.ANNOUNCEMENTS_DELAY, self._display_announcements)
 
     def _new_question(self):
         self._clue_number = 0
@@ -175,17 +260,17 @@ class triviabot(irc.IRCClient):
         self._voters = []
         self._get_new_question()
         if self._locutor_mode:
-            self._cmsg(self._locutor_nick, text.QUESTION)
-            self._cmsg(self._locutor_nick, text.QUESTION_COLOR.format(self._question))
-            self._cmsg(self._locutor_nick, f"{len(self._answer)} characters")
-            self._gmsg(text.BLUE_COLOR.format(f"--> {config.AUDIO_URL}"))
+            self._cmsg(self._locutor_nick, self.text.QUESTION, GAME)
+            self._cmsg(self._locutor_nick, self._lines.render("QUESTION_COLOR", self._question), GAME)
+            self._cmsg(self._locutor_nick, f"{len(self._answer)} characters", GAME)
+            self._gmsg(self.text.BLUE_COLOR.format(f"--> {config.AUDIO_URL}"))
             if self._lc.running:
                 self._lc.stop()
             reactor.callLater(config.AUDIO_DELAY, self._delayed_start)
         else:
-            self._gmsg(text.NEXT)
-            self._gmsg(text.QUESTION_COLOR.format(self._question))
-            self._gmsg(text.CLUE.format(self._answer.current_clue()))
+            self._gmsg(self.text.NEXT)
+            self._gmsg(self._lines.render("QUESTION_COLOR", self._question))
+            self._gmsg(self._lines.render("CLUE", self._answer.current_clue()))
             self._clue_number += 1
             self._start_time = datetime.now()
 
@@ -196,74 +281,36 @@ class triviabot(irc.IRCClient):
         # we must be somewhere in between
         elif self._clue_number < 4:
             if not self._locutor_mode:
-                self._gmsg(text.QUESTION)
-                self._gmsg(text.QUESTION_COLOR.format(self._question))
-            self._gmsg(text.GIVE_CLUE.format(self._answer.give_clue()))
+                self._gmsg(self.text.QUESTION)
+                self._gmsg(self._lines.render("QUESTION_COLOR", self._question))
+            self._gmsg(self.text.GIVE_CLUE.format(self._answer.give_clue()))
             self._clue_number += 1
         # no one must have gotten it.
         else:
-            self._gmsg(text.NO_ONE_GOT.format(self._answer.answer))
+            self._gmsg(self._lines.render("NO_ONE_GOT", self._answer.answer))
+            self._record_outcome(False)
             self.reest_streak()
             self._new_question()
 
-    def signedOn(self):
-        """Actions to perform on signon to the server."""
-        self.join(self._game_channel)
-        self.msg("NickServ", "identify {}".format(config.IDENT_STRING))
-        print("Signed on as {}.".format(self.nickname))
-        #        if self.factory.running:
-        #            self._start(None, None, None)
-        #        else:
-        self._gmsg(text.WELCOME.format(self._game_channel))
-        self._gmsg(text.HAVE_AN_ADMIN)
-        self._gmsg(text.HAVE_HELP)
-        self._gmsg(text.HELP.format(self.nickname))
-        self._start(None, None, None)
-
-    def joined(self, channel):
-        """Callback runs when the bot joins a channel."""
-        print("Joined {}.".format((channel)))
-
-    def privmsg(self, user, channel, msg):
-        """Parses out each message and initiates doing the right thing with
-        it."""
-        user, temp = user.split("!")
-        print(user + " : " + channel + " : " + msg)
-        # need to strip out non-printable characters if present.
-        printable = string.printable
-        msg = "".join(filter(lambda x: x in printable, msg))
+    def welcome(self):
+        """Greets the channel."""
+        self._gmsg(self.text.WELCOME.format(self.channel), INFO)
+        self._gmsg(self.text.HAVE_AN_ADMIN, INFO)
+        self._gmsg(self.text.HAVE_HELP, INFO)
+        self._gmsg(self.text.HELP.format(self.bot.nickname), INFO)
 
-        # parses each incoming line, and sees if it's a command for the bot.
-        try:
-            if msg[0] == "!":
-                command = msg.replace("!", "").split()[0]
-                args = msg.replace("!", "").split()[1:]
-                self.select_command(command, args, user, channel)
-                return
-            elif msg.split()[0].find(self.nickname) == 0:
-                command = msg.split()[1]
-                args = msg.replace(self.nickname, "").split()[2:]
-                self.select_command(command, args, user, channel)
-                return
-            # if not, try to match the message to the answer.
-            else:
-                if msg.casefold().strip() == self._answer.answer.casefold().strip():
-                    self._winner(user, channel)
-                    self._save_game()
-        except Exception as e:
-            print(e)
-            return
+    def check_answer(self, user, msg):
+        """Checks a line said in the channel against the answer."""
+        if self._lc.running and self._answer.matches(msg):
+            self._winner(user)
 
-    def userJoined(self, user, channel):
-        """Called when I see another user joining a channel."""
+    def userJoined(self, user):
+        """Called when a user joins the channel."""
         if user in self._rewarded_modes:
             del self._rewarded_modes[user]
 
-        if channel != self._game_channel:
-            return
-
         if config.AUTO_OP_ADMINS and user in config.ADMINS:
-            self.mode(self._game_channel, True, "o", user=user)
+            self.bot.mode(self.channel, True, "o", user=user)
             self._rewarded_modes[user] = "o"
             return
 
@@ -273,31 +320,6 @@ class triviabot(irc.IRCClient):
                 rank, _, _ = r
                 self._check_rank_rewards(user, rank)
 
-    def _freeze(self, args, user, channel):
-        """Freezes a nick from increasing its score."""
-        nick = args[0].strip()
-        if nick not in self._scores:
-            self._cmsg(user, f"WARNING: {nick} doesn't have any score. He will be blacklisted anyway.")
-        if nick in self._frost_nicks:
-            self._cmsg(user, f"WARNING: {nick} is already frozen.")
-        self._frost_nicks.add(nick)
-        self._gmsg(text.FREEZE.format(nick))
-        self._save_freezelist()
-
-    def _unfreeze(self, args, user, channel):
-        """Unfreezes a nick from increasing its score."""
-        nick = args[0].strip()
-        if nick not in self._frost_nicks:
-            self._cmsg(user, f"WARNING: {nick} is not frozen.")
-            return
-        self._frost_nicks.remove(nick)
-        self._gmsg(text.UNFREEZE.format(nick))
-        self._save_freezelist()
-
-    def _frostlist(self, args, user, channel):
-        """Lists all frozen nicks."""
-        self._cmsg(user, "The following users have frozen scores: " + ", ".join(self._frost_nicks))
-
     def _check_rank_rewards(self, user, rank) -> bool:
         """Check for rank rewarding."""
         if not config.ENABLE_REWARDS:
@@ -314,8 +336,8 @@ class triviabot(irc.IRCClient):
             if not is_higher_mode(aquired_mode, self._rewarded_modes.get(user)):
                 return False
 
-            self._gmsg(text.ON_RANK_MODE_REWARD.format(user, aquired_mode))
-            self.mode(self._game_channel, True, aquired_mode, user=user)
+            self._gmsg(self.text.ON_RANK_MODE_REWARD.format(user, aquired_mode))
+            self.bot.mode(self.channel, True, aquired_mode, user=user)
             self._rewarded_modes[user] = aquired_mode
             return True
 
@@ -324,68 +346,34 @@ class triviabot(irc.IRCClient):
     def _average_score(self, top_users=None):
         """Computes and outputs the average score users."""
         if top_users is None:
-            s = sum(self._scores.values())
-            n = len(self._scores)
-        else:
-            from future.utils import iteritems
-
-            sorted_scores = sorted(iteritems(self._scores), key=lambda d: d[1], reverse=True)
-            # Only the first top_users are considered.
-            group = sorted_scores[:top_users]
-            n = len(group)
-            s = sum([score for _, score in group])
-
-        return s / n
+            return self._scores.total / len(self._scores)
+        # Only the first top_users are considered.
+        return self._scores.top_average(top_users)
 
     def _add_points_to_user(self, user):
-        n_players = len(self._scores)
-        if user not in self._scores:
-            rank = n_players + 1
-            n_players += 1
-        else:
-            rank_info = self._get_rank(user)
-            if rank_info is None:
-                rank = len(self._scores) + 1
-            else:
-                rank, _, _ = rank_info
-
-        base_points = config.BASE_POINTS
-        if config.MIN_USERS_FOR_PRIVILEDGE is not None and n_players > config.MIN_USERS_FOR_PRIVILEDGE:
-            if config.MAX_POINTS == "increasing":
-                max_points = int(
-                    max(
-                        self._average_score(top_users=config.UNPRIVILEDGED_GROUP) / (config.BASE_POINTS * 6),
-                        config.BASE_POINTS * 1.5,
-                    )
-                )
-            else:
-                max_points = config.MAX_POINTS
-
-            base_points = max(
-                float(interp(rank, config.UNPRIVILEDGED_GROUP, n_players, config.BASE_POINTS, max_points)),
-                config.BASE_POINTS,
-            )
-            self._gmsg(text.MAX_POINT_ANNOUNCE.format(max_points))
-
-        winner_points = int(max(base_points, config.BASE_POINTS) * points[min(self._clue_number - 1, len(points) - 1)])
+        rules = ScoringRules.from_config(config)
+        rank, n_players = winner_rank(self._scores, user)
+        top_average = None
+        if rules.needs_average(n_players):
+            top_average = self._average_score(top_users=config.UNPRIVILEDGED_GROUP)
+        winner_points, max_points = award(rules, rank, n_players, self._clue_number, top_average)
+        if max_points is not None:
+            self._gmsg(self.text.MAX_POINT_ANNOUNCE.format(max_points))
 
-        if user in self._scores:
-            self._scores[user] += winner_points
-        else:
-            self._scores[user] = winner_points
+        self.scoreboard.add(user, winner_points)
 
         if winner_points == 1:
-            self._gmsg(text.POINT_ADDED.format(str(winner_points)))
+            self._gmsg(self.text.POINT_ADDED.format(str(winner_points)))
         else:
-            self._gmsg(text.POINTS_ADDED.format(str(winner_points)))
+            self._gmsg(self.text.POINTS_ADDED.format(str(winner_points)))
 
         had_rank_reward = False
         rank, score, after = self._get_rank(user)
         if rank:
             if not after and rank == 1:
-                self._gmsg(text.NUMBER_ONE.format(user, score))
+                self._gmsg(self.text.NUMBER_ONE.format(user, score))
             else:
-                self._gmsg(text.RANKING.format(user, score, rank, after))
+                self._gmsg(self.text.RANKING.format(user, score, rank, after))
             had_rank_reward = self._check_rank_rewards(user, rank)
 
         self.reest_streak(user)
@@ -400,10 +388,12 @@ class triviabot(irc.IRCClient):
                 mode = config.STREAK_REWARDS_MAP[streak]
 
                 if is_higher_mode(mode, self._rewarded_modes.get(user)):
-                    self._gmsg(text.ON_STREAK_MODE_REWARD.format(user, mode))
-                    self.mode(self._game_channel, True, mode, user=user)
+                    self._gmsg(self.text.ON_STREAK_MODE_REWARD.format(user, mode))
+                    self.bot.mode(self.channel, True, mode, user=user)
                     self._rewarded_modes[user] = mode
 
+        return winner_points
+
     def reest_streak(self, keep_user: Optional[str] = None):
         """Resets streak of all users, if keep_user is not None, it will keep the streak of that user."""
         for user in list(self._streak.keys()):
@@ -411,153 +401,91 @@ class triviabot(irc.IRCClient):
                 continue
             del self._streak[user]
 
-    def _winner(self, user, channel):
+    def _winner(self, user):
         """Congratulates the winner for guessing correctly and assigns points
         appropriately, then signals that it was guessed."""
-        if channel != self._game_channel:
-            self.msg(channel, text.RESPOND_ON_CHANNEL)
-            return
-
-        self._gmsg(text.USER_GOT_IT.format(user.upper()))
-        self._gmsg(text.THE_ANSWER_WAS.format(self._answer.answer))
+        self._gmsg(self.text.USER_GOT_IT.format(user.upper()))
+        self._gmsg(self._lines.render("THE_ANSWER_WAS", self._answer.answer))
 
-        if user in self._frost_nicks:
-            self._gmsg(text.ON_FROST_WIN.format(user))
+        if user in self.bot._frost_nicks:
+            self._gmsg(self.text.ON_FROST_WIN.format(user))
+            winner_points = 0
         else:
-            self._add_points_to_user(user)
+            winner_points = self._add_points_to_user(user)
 
-        self._clue_number = 0
         time_ran = datetime.now() - self._start_time
-        self._gmsg(text.TIMMING.format(user, time_ran.seconds, round(time_ran.microseconds / 10000)))
+        ANSWERS.inc()
+        SOLVE_SECONDS.observe(time_ran.total_seconds())
+        self._record_outcome(True, time_ran.total_seconds(), self._clue_number)
+        self.scoreboard.store.record_answer(
+            user, self._question, self._answer.answer, self._clue_number, time_ran.total_seconds(), winner_points
+        )
+        self._clue_number = 0
+        self._gmsg(self.text.TIMMING.format(user, time_ran.seconds, round(time_ran.microseconds / 10000)))
 
         # Restart loop
         self._lc.stop()
         self._lc.start(config.WAIT_INTERVAL if not self._locutor_mode else config.AUDIO_WAIT_INTERVAL, now=True)
 
-    def ctcpQuery(self, user, channel, msg):
-        """Responds to ctcp requests.
-
-        Currently just reports them.
-        """
-        print("CTCP recieved: " + user + ":" + channel + ": " + msg[0][0] + " " + msg[0][1])
-
-    def _help(self, args, user, channel):
-        """Tells people how to use the bot.
-
-        Replies differently if you are an admin or a regular user. Only
-        responds to the user since there could be a game in progress.
-        """
-        try:
-            self._admins.index(user)
-        except ValueError:
-            self._cmsg(user, text.BELONG.format(config.OWNER))
-            self._cmsg(user, text.COMMANDS)
-            return
-        self._cmsg(user, text.BELONG.format(config.OWNER))
-        self._cmsg(user, text.COMMANDS)
-        self._cmsg(user, text.ADMIN_CMDS)
-
-    def _show_source(self, args, user, channel):
-        """Tells people how to use the bot.
-
-        Only responds to the user since there could be a game in
-        progress.
-        """
-        self._cmsg(user, "My source can be found at: " "https://github.com/matheusfillipe/triviabot")
+    def _record_outcome(self, solved, seconds=0, clue=None):
+        """Feeds how the round went to the difficulty table. Skipped rounds
+        aren't fed, nobody may have tried them."""
+        interval = config.WAIT_INTERVAL if not self._locutor_mode else config.AUDIO_WAIT_INTERVAL
+        # The answer is given away after the third clue.
+        self.bot._difficulty.record(self._question, solved, seconds, 4 * interval, clue)
 
     def set_rank_block(self, b, args, user, channel):
         self._block_rank = b
         if b:
-            self._cmsg(user, text.RANK_OFF)
+            self._cmsg(user, self.text.RANK_OFF)
         else:
-            self._cmsg(user, text.RANK_ON)
+            self._cmsg(user, self.text.RANK_ON)
 
-    def select_command(self, command, args, user, channel):
-        """Callback that responds to commands given to the bot.
+    @command("rankon", admin=True)
+    def _rank_on(self, args, user, channel):
+        self.set_rank_block(False, args, user, channel)
 
-        Need to differentiate between priviledged users and regular
-        users.
-        """
-        # set up command dicts.
-        unpriviledged_commands = {
-            "score": self._score,
-            "help": self._help,
-            "source": self._show_source,
-            "rank": self._standings,
-            "repeat": self._give_clue,
-            "next": self._next_vote,
-        }
-        priviledged_commands = {
-            "die": self._die,
-            "restart": self._restart,
-            "update": self._update,
-            "set": self._set_user_score,
-            "start": self._start,
-            "stop": self._stop,
-            "save": self._save_game,
-            "rankon": lambda a, u, c: self.set_rank_block(False, a, u, c),
-            "rankoff": lambda a, u, c: self.set_rank_block(True, a, u, c),
-            "skip": self._next_question,
-            "audio": self._audio,
-            "text": self._text,
-            "freeze": self._freeze,
-            "unfreeze": self._unfreeze,
-            "frostlist": self._frostlist,
-        }
-        print(command, args, user, channel)
-        try:
-            self._admins.index(user)
-            is_admin = True
-        except ValueError:
-            is_admin = False
-
-        # the following takes care of sorting out functions and
-        # priviledges.
-        if not is_admin and command in priviledged_commands:
-            self.msg(channel, text.NOT_ALLOWED.format(user))
-            return
-        elif is_admin and command in priviledged_commands:
-            priviledged_commands[command](args, user, channel)
-        elif command in unpriviledged_commands:
-            unpriviledged_commands[command](args, user, channel)
-        else:
-            self.describe(channel, text.LOOKS_ODLY.format(config.COLOR_CODE, user))
+    @command("rankoff", admin=True)
+    def _rank_off(self, args, user, channel):
+        self.set_rank_block(True, args, user, channel)
 
+    @command("next")
     def _next_vote(self, args, user, channel):
         """Implements user voting for the next question.
 
         Need to keep track of who voted, and how many votes.
         """
         if not self._lc.running:
-            self._gmsg(text.NOT_PLAYING)
+            self._gmsg(self.text.NOT_PLAYING)
             return
         try:
             self._voters.index(user)
-            self._gmsg(text.ALREADY_VOTED.format(user))
+            self._gmsg(self.text.ALREADY_VOTED.format(user))
             return
         except:
             if self._votes < 2:
                 self._votes += 1
                 self._voters.append(user)
-                print(self._voters)
-                self._gmsg(text.YOU_VOTED.format(user, str(3 - self._votes)))
+                logger.debug("Voters: %s", self._voters)
+                self._gmsg(self.text.YOU_VOTED.format(user, str(3 - self._votes)))
             else:
                 self._votes = 0
                 self._voters = []
                 self._next_question(None, None, None)
 
+    @command("start", admin=True)
     def _start(self, args, user, channel):
-        """Starts the trivia game.
-
-        TODO: Load scores from last game, if any.
-        """
-        if self._lc.running:
+        """Starts the trivia game."""
+        if self._lc.running or not self.bot.ready:
             return
         else:
-            reactor.callLater(config.ANNOUNCEMENTS_DELAY, self._display_announcements)
-            self._lc.start(config.WAIT_INTERVAL)
-            self.factory.running = True
+            if self._announcements is None or not self._announcements.active():
+                self._announcements = reactor.callLater(config.ANNOUNCEMENTS_DELAY, self._display_announcements)
+            # A round resumed from a checkpoint goes on with its next clue.
+            self._lc.start(config.WAIT_INTERVAL, now=not self._clue_number)
+            self.bot.factory.running = True
 
+    @command("stop", admin=True)
     def _stop(self, *args):
         """Stops the game and thanks people for playing, then saves the
         scores."""
@@ -565,211 +493,787 @@ class triviabot(irc.IRCClient):
             return
         else:
             self._lc.stop()
-            self._gmsg(text.THANKS)
-            self._gmsg(text.RANKINGS)
-            self._standings(None, self._game_channel, None)
-            self._gmsg(text.SEE_YOU)
+            self._gmsg(self.text.THANKS, INFO)
+            self._gmsg(self.text.RANKINGS, INFO)
+            self._standings(None, None, self.channel)
+            self._gmsg(self.text.SEE_YOU, INFO)
             self._save_game()
-            self.factory.running = False
+            self.bot.factory.running = any(game._lc.running for game in self.bot._games.values())
 
+    def halt(self):
+        """Stops every timer of the game without saying anything."""
+        if self._lc.running:
+            self._lc.stop()
+        if self._announcements is not None and self._announcements.active():
+            self._announcements.cancel()
+
+    def snapshot(self):
+        """Returns the state of the game and of the round being played, as a
+        JSON serializable dict for restore()."""
+        return {
+            "running": self._lc.running,
+            "question": self._question,
+            "answer": self._answer.snapshot(),
+            "clue_number": self._clue_number,
+            "elapsed": (datetime.now() - self._start_time).total_seconds() if self._clue_number else 0,
+            "streak": self._streak,
+            "rewarded_modes": self._rewarded_modes,
+            "votes": self._votes,
+            "voters": self._voters,
+            "block_rank": self._block_rank,
+            "locutor_mode": self._locutor_mode,
+            "locutor_nick": self._locutor_nick,
+        }
+
+    def restore(self, state):
+        """Puts back the state saved by snapshot(). The round goes on where
+        it was when the game starts."""
+        self._question = state["question"]
+        self._answer.restore(state["answer"])
+        self._lines.clear()
+        self._clue_number = state["clue_number"]
+        self._start_time = datetime.now() - timedelta(seconds=state["elapsed"])
+        self._streak = dict(state["streak"])
+        self._rewarded_modes = dict(state["rewarded_modes"])
+        self._votes = state["votes"]
+        self._voters = list(state["voters"])
+        self._block_rank = state["block_rank"]
+        self._locutor_mode = state["locutor_mode"]
+        self._locutor_nick = state["locutor_nick"]
+        self.autostart = state["running"]
+
+    @command("audio", admin=True)
     def _audio(self, args, user, channel):
         """Turns audio mode on."""
+        if not self.bot.ready:
+            self._cmsg(user or self.channel, self.text.QUESTIONS_NOT_READY)
+            return
         self._locutor_mode = True
         self._locutor_nick = user
-        self._gmsg(text.AUDIO_ON)
+        self._gmsg(self.text.AUDIO_ON.format(config.AUDIO_URL))
         self._cmsg(user, "------------------------------------------------")
         self._new_question()
 
-    def _text(self, *args):
+    @command("text", admin=True)
+    def _text(self, args, user, channel):
         """Turns audio mode off."""
+        if not self.bot.ready:
+            self._cmsg(user or self.channel, self.text.QUESTIONS_NOT_READY)
+            return
         self._locutor_mode = False
-        self._gmsg(text.AUDIO_OFF)
+        self._gmsg(self.text.AUDIO_OFF)
         self._new_question()
 
-    def _save_freezelist(self, *args):
-        """Saves the freeze list to the data directory."""
-        with open(os.path.join(config.SAVE_DIR, "freeze.json"), "w") as savefile:
-            json.dump(list(self._frost_nicks), savefile)
-            print("Freeze list has been saved.")
-
-    def _load_freezelist(self):
-        """Loads the freeze list from previous games."""
-        # ensure initialization
-        self._frost_nicks = set()
-        if not path.exists(config.SAVE_DIR):
-            print("Save directory doesn't exist.")
-            return
-        try:
-            with open(os.path.join(config.SAVE_DIR, "freeze.json"), "r") as savefile:
-                temp_list = json.load(savefile)
-        except:
-            print("Save file doesn't exist.")
-            return
-        self._frost_nicks = set(temp_list)
-        print("Freeze list has been loaded.")
-
+    @command("save", admin=True)
     def _save_game(self, *args):
-        """Saves the game to the data directory."""
-        with open(os.path.join(config.SAVE_DIR, "scores.json"), "w") as savefile:
-            json.dump(self._scores, savefile)
-            print("Scores have been saved.")
-
-    def _load_game(self):
-        """Loads the running data from previous games."""
-        # ensure initialization
-        self._scores = {}
-        if not path.exists(config.SAVE_DIR):
-            print("Save directory doesn't exist.")
-            return
-        try:
-            with open(os.path.join(config.SAVE_DIR, "scores.json"), "r") as savefile:
-                temp_dict = json.load(savefile)
-        except:
-            print("Save file doesn't exist.")
-            return
-        for name in temp_dict.keys():
-            self._scores[str(name)] = int(temp_dict[name])
-        print(self._scores)
-        print("Scores loaded.")
+        """Writes pending score changes to the data directory in a worker thread."""
+        return self.scoreboard.save()
 
+    @command("set", admin=True)
     def _set_user_score(self, args, user, channel):
         """Administrative action taken to adjust scores, if needed."""
         try:
-            self._scores[args[0]] = int(args[1])
+            self.scoreboard.set(args[0], int(args[1]))
         except:
             self._cmsg(user, args[0] + " not in scores database.")
             return
         self._cmsg(user, args[0] + " score set to " + args[1])
 
-    def _die(self, *args):
-        """Terminates execution of the bot."""
-        self._quit = True
-        self.quit(message="This is triviabot, signing off.")
-
-    def _restart(self, *args):
-        """Restarts the bot."""
-        self._restarting = True
-        print("Restarting")
-        self.quit(message="Triviabot restarting.")
-
-    def _update(self, *args):
-        self.quit(message="I will update now! Wait a few minutes")
-        subprocess.Popen(config.UPDATE_SCRIPT + " &", shell=True)
-
-    def connectionLost(self, reason):
-        """Called when connection is lost."""
-        global reactor
-        if self._restarting:
-            try:
-                execl(sys.executable, *([sys.executable] + sys.argv))
-            except Exception as e:
-                print("Failed to restart: {}".format(e))
-        if self._quit:
-            reactor.stop()
-
+    @command("score")
     def _score(self, args, user, channel):
         """Tells the user their score."""
         try:
-            self._cmsg(user, text.SCORE.format(str(self._scores[user])))
+            self._cmsg(user, self.text.SCORE.format(str(self._scores[user])))
         except:
-            self._cmsg(user, text.IDKU)
+            self._cmsg(user, self.text.IDKU)
 
+    @command("skip", admin=True)
     def _next_question(self, args, user, channel):
         """Administratively skips the current question."""
         if not self._lc.running:
-            self._gmsg(text.NOT_PLAYING)
+            self._gmsg(self.text.NOT_PLAYING)
             return
-        self._gmsg(text.SKIPPED_THE_ANSWER_WAS.format(self._answer.answer))
+        self._gmsg(self._lines.render("SKIPPED_THE_ANSWER_WAS", self._answer.answer))
         self._clue_number = 0
         self.reest_streak()
         self._lc.stop()
         self._lc.start(config.WAIT_INTERVAL if not self._locutor_mode else config.AUDIO_WAIT_INTERVAL)
 
     def _get_rank(self, user):
-        from future.utils import iteritems
-
-        sorted_scores = sorted(iteritems(self._scores), key=lambda d: d[1], reverse=True)
-        i = 0
-        after = None
-        for rank, (player, score) in enumerate(sorted_scores, start=1):
-            if player == user:
-                return rank, score, after
-            after = player
-            i += 1
+        return self._scores.rank(user)
 
+    @command("rank")
     def _standings(self, args, user, channel):
-        """Tells the user the complete standings in the game."""
+        """Tells the user the standings in the game, of all time or, when
+        the name of a period comes first, of the points won recently:
+        !rank week 20."""
         if self._block_rank:
             return
 
-        from future.utils import iteritems
+        period = None
+        if args and not args[0].isdigit():
+            period, args = args[0].lower(), args[1:]
+            periods = self.scoreboard.periods
+            if periods is None:
+                self._cmsg(user or self.channel, self.text.PERIOD_NOT_READY.format(period))
+                return
+            if period not in periods:
+                self._cmsg(user or self.channel, self.text.NO_PERIOD.format(period, ", ".join(periods)))
+                return
 
+        header = self.text.STANDINGS if period is None else self.text.PERIOD_STANDINGS.format(period)
         if user:
-            self._cmsg(user, text.STANDINGS)
+            self._cmsg(user, header)
         else:
-            self._gmsg(text.STANDINGS)
-        sorted_scores = sorted(iteritems(self._scores), key=lambda d: d[1], reverse=True)
+            self._gmsg(header, INFO)
 
         i = 0
         end = max(0, int(args[0]) - 1 if args and len(args) and args[0].isdigit() else 9)
+        if period is None:
+            top = self._scores.top(max(end, 1))
+        else:
+            top = self.scoreboard.periods[period].top(max(end, 1), time.time())
         formatted_score = ""
-        for rank, (player, score) in enumerate(sorted_scores, start=1):
+        for rank, (player, score) in enumerate(top, start=1):
             formatted_score += "{}: {}: {}".format(rank, player, score)
             if i % 5 == 0:
                 if user:
                     self._cmsg(user, formatted_score)
                 else:
-                    self._gmsg(formatted_score)
+                    self._gmsg(formatted_score, INFO)
                 formatted_score = ""
             else:
                 formatted_score += " | "
             i += 1
             if i >= end:
                 break
+        if formatted_score:
+            formatted_score = formatted_score[:-len(" | ")]
+            if user:
+                self._cmsg(user, formatted_score)
+            else:
+                self._gmsg(formatted_score, INFO)
 
+    @command("repeat")
     def _give_clue(self, args, user, channel):
         if not self._lc.running:
-            self._gmsg(text.NOT_PLAYING)
+            self._gmsg(self.text.NOT_PLAYING)
             return
-        self._cmsg(channel, text.QUESTION)
-        self._cmsg(channel, text.QUESTION_COLOR.format(self._question))
-        self._cmsg(channel, text.CLUE.format(self._answer.current_clue()))
-
-    def load_file(self):
-        filename = choice(listdir(self._questions_dir))
-        fd = open(os.path.join(config.Q_DIR, filename), encoding="utf8", errors="ignore")
-        lines = fd.read().splitlines()
-        fd.close()
-        return lines
+        self._cmsg(channel, self.text.QUESTION, GAME)
+        self._cmsg(channel, self._lines.render("QUESTION_COLOR", self._question), GAME)
+        self._cmsg(channel, self._lines.render("CLUE", self._answer.current_clue()), GAME)
 
     def _get_new_question(self):
-        """Selects a new question from the questions directory and sets it."""
-        damaged_question = True
-        while damaged_question:
-            # randomly select file
-            if hasattr(config, "URL"):
-                url = config.URL
-                try:
-                    res = urllib.request.urlopen(url)
-                    if res.getcode() == 200:
-                        print("Loading from ", url)
-                        lines = res.readlines()
-                    else:
-                        lines = self.load_file()
-                except:
-                    lines = self.load_file()
+        """Selects a new question and sets it."""
+        self._question, temp_answer = self.bot._get_new_question()
+        self._lines.clear()
+        self._answer.set_answer(temp_answer, getattr(config, "FUZZY_MAX_DISTANCE", 0))
+
+
+def open_store(directory):
+    """Opens the storage backend selected by config.STORAGE."""
+    storage = getattr(config, "STORAGE", "json").lower()
+    if storage == "sqlite":
+        return SqliteStore(directory, batch_size=getattr(config, "SQLITE_BATCH_SIZE", 100))
+    elif storage == "json":
+        return JournalStore(directory, max_journal_size=getattr(config, "JOURNAL_MAX_SIZE", 1024 * 1024))
+    raise ValueError("STORAGE must either be 'json' or 'sqlite'.")
+
+
+class triviabot(irc.IRCClient):
+    """This is the irc bot portion of the trivia bot.
+
+    It implements the whole program so is kinda big. The algorithm is
+    implemented by a series of callbacks, initiated by an admin on the
+    server.
+
+    One connection serves a TriviaGame for each channel in
+    config.GAME_CHANNELS. The question index and the scoreboards are
+    shared between them.
+    """
+
+    def __init__(self):
+        self._admins = set(config.ADMINS)
+        self._admins.add(config.OWNER)
+        self._watcher = FileWatcher()
+        self._outbox = Outbox(self._send, coalesce=getattr(config, "COALESCE_LINES", True))
+        OUTBOX_DEPTH.set_function(self._outbox.__len__)
+        self._watcher.changed(config.__file__)
+        self._announcement_lines = []
+        # Loaded in a worker thread after signing on, see _load_questions().
+        self._questions = None
+        self._difficulty = None
+        self._scheduler = None
+        # Set once the connection is lost, so a load finishing later doesn't
+        # start the games of this instance.
+        self._stopped = False
+        self._rescan = LoopingCall(self._check_reload)
+        self._remote = None
+        if hasattr(config, "URL"):
+            # twisted.web.client brings in the whole TLS stack, only pay for
+            # it when questions are fetched.
+            from lib.remote import RemoteQuestionSource
+
+            self._remote = RemoteQuestionSource(
+                config.URL,
+                size=getattr(config, "URL_PREFETCH", 20),
+                timeout=getattr(config, "URL_TIMEOUT", 10),
+            )
+        self._quit = False
+        self._restarting = False
+        self._scoreboards = {}
+        self._autosave = LoopingCall(self._save_game)
+        self.nickname = config.DEFAULT_NICK
+        self._games = {}
+        for channel, options in game_channels().items():
+            name = options.get("scoreboard", DEFAULT_SCOREBOARD)
+            if name not in self._scoreboards:
+                self._scoreboards[name] = self._load_game(name)
+            text = genTrans(options.get("lang", config.LANG), options.get("colors", True))
+            self._games[channel] = TriviaGame(self, channel, self._scoreboards[name], text)
+        self._default_game = next(iter(self._games.values()))
+        self._load_freezelist()
+
+    def load_announcements(self):
+        """Load messages.
+
+        The file is only read again when it changed.
+        """
+        if self._watcher.changed(config.ANNOUNCEMENTS_TXT):
+            try:
+                with open(config.ANNOUNCEMENTS_TXT, "r") as f:
+                    self._announcement_lines = [message.strip() for message in f.readlines()]
+            except FileNotFoundError:
+                logger.warning("No messages file found at %s", config.ANNOUNCEMENTS_TXT)
+                self._announcement_lines = []
+        messages = list(self._announcement_lines)
+        if config.MESSAGE_RANKING:
+            messages.insert(0, None)
+        return messages
+
+    def _get_nickname(self):
+        return self.factory.nickname
+
+    # Messages, actions and modes are paced by the outbox, other commands
+    # (PONG, JOIN, ...) go out right away.
+    lineRate = None
+
+    def connectionMade(self):
+        self._outbox.rate = self.factory.lineRate
+        self.heartbeatInterval = getattr(config, "PING_INTERVAL", 60)
+        self._pings = PingTracker(getattr(config, "PING_TIMEOUT", 180))
+        state = self.factory.checkpoint
+        self.factory.checkpoint = None
+        connection = state and state.get("connection")
+        if connection:
+            # The socket was handed over by the previous process, which had
+            # already registered and joined the channels.
+            self.performLogin = 0
+            self.nickname = connection["nickname"]
+        super().connectionMade()
+        if state:
+            for channel, game_state in state["games"].items():
+                if channel in self._games:
+                    self._games[channel].restore(game_state)
+            logger.info("Resumed %d games from the checkpoint.", len(state["games"]))
+        if connection:
+            self._registered = True
+            self.startHeartbeat()
+            self._resume()
+
+    def _sendHeartbeat(self):
+        """Pings the server, or drops the connection when the server didn't
+        answer a PING for config.PING_TIMEOUT seconds."""
+        if self._pings.stale():
+            logger.warning("No answer to PING for %d seconds, dropping the connection.", self._pings.timeout)
+            self.transport.abortConnection()
+            return
+        self.sendLine("PING :{}".format(self._pings.ping()))
+
+    def irc_PONG(self, prefix, params):
+        lag = self._pings.pong(params[-1])
+        if lag is None:
+            return
+        IRC_LAG.set(lag)
+        if self.factory.reconnector.current is not None:
+            self.factory.reconnector.current.lag = lag
+
+    def _cmsg(self, dest, msg, lane=PRIVATE):
+        """Write a colorized message.
+
+        Messages are queued in the outbox, in the lane given by their
+        urgency: GAME for the round being played, INFO for announcements
+        and rankings, PRIVATE for replies to users.
+        """
+        # self.msg(dest, "{}{}".format(config.COLOR_CODE, msg))
+        self._outbox.put(dest, msg, lane)
+
+    def _send(self, target, text):
+        """Sends a line taken from the outbox, a raw line when it has no
+        target."""
+        if target is None:
+            self.sendLine(text)
+        else:
+            self.msg(target, text)
+
+    def describe(self, channel, action):
+        """Queues an action in the outbox."""
+        self._outbox.put_line("PRIVMSG {} :\x01ACTION {}\x01".format(channel, action))
+
+    def mode(self, chan, set, modes, limit=None, user=None, mask=None):
+        """Queues a mode change in the outbox, so a wave of joins after a
+        netsplit can't flood the server."""
+        line = "MODE {} {}{}".format(chan, "+" if set else "-", modes)
+        if limit is not None:
+            line = "{} {}".format(line, limit)
+        elif user is not None:
+            line = "{} {}".format(line, user)
+        elif mask is not None:
+            line = "{} {}".format(line, mask)
+        self._outbox.put_line(line, INFO)
+
+    def _game_for(self, channel):
+        """Returns the game played in channel, or the first game for private
+        messages and other channels."""
+        return self._games.get(channel, self._default_game)
+
+    def signedOn(self):
+        """Actions to perform on signon to the server."""
+        for channel in self._games:
+            self.join(channel)
+        self._cmsg("NickServ", "identify {}".format(config.IDENT_STRING))
+        logger.info("Signed on as %s.", self.nickname)
+        self.factory.reconnector.connected()
+        for game in self._games.values():
+            game.welcome()
+        self._resume()
+
+    def _resume(self):
+        """Starts the timers and the games of a registered connection."""
+        if self._remote is not None:
+            self._remote.start()
+        if not self._autosave.running:
+            self._autosave.start(getattr(config, "SAVE_INTERVAL", 300), now=False)
+        if self.factory.questions is not None:
+            self._questions_loaded(self.factory.questions)
+            return
+        if self.factory.loading is None:
+            # A connection made while the questions are loading waits for
+            # the same load.
+            self.factory.loading = threads.deferToThread(self._load_questions)
+            self.factory.loading.addCallbacks(self.factory.questions_loaded, self.factory.questions_failed)
+        self.factory.loading.addCallback(self._questions_loaded)
+
+    @property
+    def ready(self):
+        """Whether the questions are loaded and games can start."""
+        return self._scheduler is not None
+
+    def _load_questions(self):
+        """Loads the questions, their difficulties and the scheduler picking
+        them. Runs in a worker thread, so the bot joins its channels without
+        waiting for a large corpus to be indexed."""
+        with QUESTION_LOAD_SECONDS.time():
+            if getattr(config, "Q_PACK", None):
+                questions = QuestionPack(config.Q_PACK)
             else:
-                lines = self.load_file()
-            myline = choice(lines)
-            myline = myline.decode() if type(myline) == bytes else myline
+                questions = QuestionIndex(config.Q_DIR)
+        difficulty = DifficultyTable(os.path.join(config.SAVE_DIR, "difficulty.bin"))
+        scheduler = QuestionScheduler(
+            questions,
+            weights=getattr(config, "Q_CATEGORY_WEIGHTS", None),
+            window=getattr(config, "Q_REPEAT_WINDOW", 1000),
+            difficulty=difficulty,
+            band=getattr(config, "Q_DIFFICULTY_BAND", None),
+        )
+        return questions, difficulty, scheduler
+
+    def _questions_loaded(self, loaded):
+        """Starts the games once the questions are loaded, unless the load
+        failed or the connection was lost in the meantime."""
+        if loaded is None or self._stopped:
+            return loaded
+        self._questions, self._difficulty, self._scheduler = loaded
+        QUESTIONS.set_function(lambda: len(self._questions))
+        logger.info("Loaded %d questions.", len(self._questions))
+        if not self._rescan.running:
+            self._rescan.start(getattr(config, "Q_RESCAN_INTERVAL", 60), now=False)
+        for game in self._games.values():
+            if game.autostart:
+                game._start(None, None, None)
+        return loaded
+
+    def joined(self, channel):
+        """Callback runs when the bot joins a channel."""
+        logger.info("Joined %s.", channel)
+
+    @PRIVMSG_SECONDS.time()
+    def privmsg(self, user, channel, msg):
+        """Parses out each message and initiates doing the right thing with
+        it."""
+        user, temp = user.split("!")
+        chat_log.info("%s : %s : %s", user, channel, msg, extra={"user": user, "channel": channel})
+        # need to strip out non-printable characters if present.
+        msg = msg.translate(SANITIZE)
+        words = msg.split()
+        if not words:
+            return
+
+        # parses each incoming line, and sees if it's a command for the bot.
+        try:
+            if msg[0] == "!":
+                self.select_command(words[0].lstrip("!"), words[1:], user, channel)
+            elif words[0].startswith(self.nickname) and len(words) > 1:
+                self.select_command(words[1], words[2:], user, channel)
+            # if not, try to match the message to the answer.
+            elif channel in self._games:
+                self._games[channel].check_answer(user, msg)
+            elif any(game._answer.matches(msg) for game in self._games.values()):
+                target = user if channel == self.nickname else channel
+                self._cmsg(target, self._game_for(channel).text.RESPOND_ON_CHANNEL, INFO)
+        except Exception:
+            logger.exception("Failed to handle %r from %s", msg, user)
+            return
+
+    def userJoined(self, user, channel):
+        """Called when I see another user joining a channel."""
+        if channel in self._games:
+            self._games[channel].userJoined(user)
+
+    @command("freeze", admin=True)
+    def _freeze(self, args, user, channel):
+        """Freezes a nick from increasing its score."""
+        nick = args[0].strip()
+        if not any(nick in scoreboard.scores for scoreboard in self._scoreboards.values()):
+            self._cmsg(user, f"WARNING: {nick} doesn't have any score. He will be blacklisted anyway.")
+        if nick in self._frost_nicks:
+            self._cmsg(user, f"WARNING: {nick} is already frozen.")
+        self._frost_nicks.add(nick)
+        game = self._game_for(channel)
+        game._gmsg(game.text.FREEZE.format(nick), INFO)
+        self._save_freezelist()
+
+    @command("unfreeze", admin=True)
+    def _unfreeze(self, args, user, channel):
+        """Unfreezes a nick from increasing its score."""
+        nick = args[0].strip()
+        if nick not in self._frost_nicks:
+            self._cmsg(user, f"WARNING: {nick} is not frozen.")
+            return
+        self._frost_nicks.remove(nick)
+        game = self._game_for(channel)
+        game._gmsg(game.text.UNFREEZE.format(nick), INFO)
+        self._save_freezelist()
+
+    @command("frostlist", admin=True)
+    def _frostlist(self, args, user, channel):
+        """Lists all frozen nicks."""
+        self._cmsg(user, "The following users have frozen scores: " + ", ".join(self._frost_nicks))
+
+    def ctcpQuery(self, user, channel, msg):
+        """Responds to ctcp requests.
+
+        Currently just reports them.
+        """
+        logger.info("CTCP received: %s:%s: %s %s", user, channel, msg[0][0], msg[0][1])
+
+    @command("help")
+    def _help(self, args, user, channel):
+        """Tells people how to use the bot.
+
+        Replies differently if you are an admin or a regular user. Only
+        responds to the user since there could be a game in progress.
+        """
+        text = self._game_for(channel).text
+        if user not in self._admins:
+            self._cmsg(user, text.BELONG.format(config.OWNER))
+            self._cmsg(user, text.COMMANDS)
+            return
+        self._cmsg(user, text.BELONG.format(config.OWNER))
+        self._cmsg(user, text.COMMANDS)
+        self._cmsg(user, text.ADMIN_CMDS)
+
+    @command("source")
+    def _show_source(self, args, user, channel):
+        """Tells people how to use the bot.
+
+        Only responds to the user since there could be a game in
+        progress.
+        """
+        self._cmsg(user, "My source can be found at: " "https://github.com/matheusfillipe/triviabot")
+
+    def select_command(self, command, args, user, channel):
+        """Callback that responds to commands given to the bot.
+
+        Commands are looked up in the registry built from the @command
+        decorators, admin-only ones are refused to regular users. Game
+        commands go to the game of the channel they were given in.
+        """
+        logger.info("Command %s %s from %s in %s", command, args, user, channel,
+                    extra={"command": command, "user": user, "channel": channel})
+        handler = self.commands.get(command)
+        if handler is None:
+            game = self._game_for(channel)
+            line = game.text.LOOKS_ODLY.format(config.COLOR_CODE, user)
+            self.describe(channel, line if game.text.colors else strip_formatting(line))
+        elif handler.admin and user not in self._admins:
+            self._cmsg(channel, self._game_for(channel).text.NOT_ALLOWED.format(user), INFO)
+        elif handler.game:
+            handler.method(self._game_for(channel), args, user, channel)
+        else:
+            handler.method(self, args, user, channel)
+
+    def _save_freezelist(self, *args):
+        """Saves the freeze list to the data directory."""
+        self._scoreboards[DEFAULT_SCOREBOARD].store.save_freezelist(self._frost_nicks)
+        logger.info("Freeze list has been saved.")
+
+    def _load_freezelist(self):
+        """Loads the freeze list from previous games."""
+        self._frost_nicks = self._scoreboards[DEFAULT_SCOREBOARD].store.load_freezelist()
+        logger.info("Freeze list has been loaded.")
+
+    def _save_game(self, *args):
+        """Writes pending score changes of every scoreboard, and the
+        difficulty table, in worker threads."""
+        for scoreboard in self._scoreboards.values():
+            scoreboard.save()
+        if self._difficulty is not None and self._difficulty.dirty:
+            d = threads.deferToThread(self._difficulty.save, self._difficulty.snapshot())
+            d.addErrback(lambda failure: logger.error("Failed to save difficulties: %s", failure.getErrorMessage()))
+
+    def _load_game(self, name):
+        """Loads the scoreboard called name from previous games.
+
+        The default scoreboard lives in config.SAVE_DIR, the others in a
+        directory of the same name inside it.
+        """
+        directory = config.SAVE_DIR
+        if name != DEFAULT_SCOREBOARD:
+            directory = os.path.join(config.SAVE_DIR, name)
+        os.makedirs(directory, exist_ok=True)
+        periods = Periods(getattr(config, "RANK_WINDOWS", None), getattr(config, "RANK_HALF_LIFE", HALF_LIFE))
+        scoreboard = Scoreboard(open_store(directory), periods)
+        logger.info("Scores loaded for %s.", name)
+        return scoreboard
+
+    def quit(self, message=""):
+        """Sends what is still queued, at the usual pace, before leaving.
+
+        Whatever is left after QUIT_DRAIN seconds is dropped.
+        """
+        self._outbox.drain(QUIT_DRAIN).addCallback(lambda _: super(triviabot, self).quit(message))
+
+    @command("die", admin=True)
+    def _die(self, *args):
+        """Terminates execution of the bot."""
+        self._quit = True
+        self.factory.reconnector.stop()
+        self.quit(message="This is triviabot, signing off.")
+
+    @command("restart", admin=True)
+    def _restart(self, *args):
+        """Restarts the bot.
+
+        The games are saved to a checkpoint and resumed by the new process.
+        Over plain TCP and with config.RESTART_HANDOFF, the connection is
+        passed on as well, so players don't see the bot leave.
+        """
+        self._restarting = True
+        logger.info("Restarting")
+        if getattr(config, "RESTART_HANDOFF", True) and config.USE_SSL.lower() == "no":
+            games = self._snapshot()
+            for game in self._games.values():
+                game.halt()
+            # Give the reactor time to write the last line sent.
+            self._outbox.drain(QUIT_DRAIN).addCallback(
+                lambda _: reactor.callLater(HANDOFF_DELAY, self._handoff, games)
+            )
+            return
+        self.quit(message="Triviabot restarting.")
+
+    def _handoff(self, games):
+        """Restarts the bot keeping the connection open."""
+        sock = self.transport.getHandle()
+        fd = os.dup(sock.fileno())
+        os.set_inheritable(fd, True)
+        self._checkpoint(games, {"fd": fd, "family": int(sock.family), "nickname": self.nickname})
+        self._shutdown()
+        os.environ[HANDOFF_FD] = str(fd)
+        self._exec()
+
+    @command("update", admin=True)
+    def _update(self, *args):
+        self._checkpoint(self._snapshot())
+        self.quit(message="I will update now! Wait a few minutes")
+        subprocess.Popen(config.UPDATE_SCRIPT + " &", shell=True)
+
+    def _snapshot(self):
+        return {channel: game.snapshot() for channel, game in self._games.items()}
+
+    def _checkpoint(self, games, connection=None):
+        """Saves the games to be resumed by the next process, along with the
+        connection it should take over, if any."""
+        state = {"games": games}
+        if connection is not None:
+            state["connection"] = connection
+        checkpoint.write(os.path.join(config.SAVE_DIR, CHECKPOINT), state)
+        logger.info("Saved %d games to the checkpoint.", len(state["games"]))
+
+    def _exec(self):
+        """Replaces the process with a new bot."""
+        log.stop()
+        try:
+            execl(sys.executable, *([sys.executable] + sys.argv))
+        except Exception as e:
+            os.environ.pop(HANDOFF_FD, None)
+            logger.error("Failed to restart: %s", e)
+
+    @command("reload", admin=True)
+    def _reload(self, args, user, channel):
+        """Reloads the questions, announcements and config without
+        reconnecting."""
+        self._watcher.forget(config.ANNOUNCEMENTS_TXT)
+        self._rescan_questions()
+        try:
+            changed = self._reload_config(force=True)
+        except Exception as e:
+            self._cmsg(user, f"Failed to reload the config: {e}")
+            return
+        self._cmsg(user, "Reloaded {} questions. Config changes: {}.".format(
+            len(self._questions or ()), ", ".join(changed) or "none"))
+
+    def connectionLost(self, reason):
+        """Called when connection is lost."""
+        global reactor
+        self.stopHeartbeat()
+        if self._restarting:
+            self._checkpoint(self._snapshot())
+        self._shutdown()
+        if self._restarting:
+            self._exec()
+        if self._quit:
+            reactor.stop()
+        elif self.factory.adopted:
+            # Taken over from a previous process, there is no connector to
+            # report this to the factory.
+            self.factory.adopted = False
+            self.factory.reconnector.failed(reason.getErrorMessage())
+
+    def _shutdown(self):
+        """Stops the timers and saves everything."""
+        self._stopped = True
+        for game in self._games.values():
+            game.halt()
+        self._outbox.clear()
+        if self._rescan.running:
+            self._rescan.stop()
+        if self._autosave.running:
+            self._autosave.stop()
+        for scoreboard in self._scoreboards.values():
+            scoreboard.close()
+        if self._difficulty is not None and self._difficulty.dirty:
             try:
-                self._question, temp_answer = myline.split("`")
-            except ValueError:
-                print("Broken question:")
-                print(myline)
-                continue
-            self._answer.set_answer(temp_answer.strip())
-            damaged_question = False
+                self._difficulty.save(self._difficulty.snapshot())
+            except Exception as e:
+                logger.error("Failed to save difficulties: %s", e)
+        if self._remote is not None:
+            self._remote.stop()
+
+    def _check_reload(self):
+        """Applies changes to the question files and the config file."""
+        self._rescan_questions()
+        try:
+            self._reload_config()
+        except Exception as e:
+            logger.error("Failed to reload the config: %s", e)
+
+    def _reload_config(self, force=False):
+        """Applies the RELOADABLE keys of the config file if it changed.
+
+        Returns the names of the keys that changed.
+        """
+        if not self._watcher.changed(config.__file__) and not force:
+            return []
+        changed = reload_config(config, RELOADABLE)
+        if "ADMINS" in changed:
+            self._admins = set(config.ADMINS)
+            self._admins.add(config.OWNER)
+        if "Q_RESCAN_INTERVAL" in changed:
+            self._rescan.interval = getattr(config, "Q_RESCAN_INTERVAL", 60)
+        if "SAVE_INTERVAL" in changed:
+            self._autosave.interval = getattr(config, "SAVE_INTERVAL", 300)
+        # Until the questions are loaded, _load_questions() reads the new values.
+        if self._scheduler is not None:
+            if "Q_DIFFICULTY_BAND" in changed:
+                self._scheduler.band = getattr(config, "Q_DIFFICULTY_BAND", None)
+            if "Q_CATEGORY_WEIGHTS" in changed or "Q_REPEAT_WINDOW" in changed:
+                self._scheduler.weights = getattr(config, "Q_CATEGORY_WEIGHTS", None) or {}
+                self._scheduler.window = getattr(config, "Q_REPEAT_WINDOW", 1000)
+                self._scheduler.rebuild()
+        if changed:
+            logger.info("Config reloaded: %s.", ", ".join(changed))
+        return changed
+
+    @QUESTION_LOAD_SECONDS.time()
+    def _rescan_questions(self):
+        """Picks up added, removed or modified question files, or a
+        recompiled question pack.
+
+        The rescan works on a copy, so the questions in use are kept when
+        it fails or finds none, as while the files are being replaced.
+        """
+        if self._questions is None:
+            return
+        questions = copy.copy(self._questions)
+        try:
+            if not questions.refresh():
+                return
+        except Exception as e:
+            logger.error("Failed to rescan the questions, keeping the %d loaded: %s", len(self._questions), e)
+            return
+        if not len(questions):
+            logger.warning("The rescan found no questions, keeping the %d loaded.", len(self._questions))
+            return
+        self._scheduler = QuestionScheduler(
+            questions,
+            weights=self._scheduler.weights,
+            window=self._scheduler.window,
+            difficulty=self._difficulty,
+            band=self._scheduler.band,
+        )
+        self._questions = questions
+        self.factory.questions = (questions, self._difficulty, self._scheduler)
+        logger.info("Question index rebuilt: %d questions.", len(self._questions))
+
+    @QUESTION_SECONDS.time()
+    def _get_new_question(self):
+        """Selects a new (question, answer) pair.
+
+        Questions prefetched from config.URL are preferred, the local
+        questions are used when that buffer is empty, picked by the
+        scheduler.
+        """
+        parsed = None
+        if self._remote is not None:
+            parsed = self._remote.pop()
+        if parsed is None:
+            parsed = self._scheduler.next()
+        return parsed
+
+
+class Command(NamedTuple):
+    method: Callable
+    admin: bool
+    game: bool
+
+
+triviabot.commands = {
+    name: Command(method, admin, cls is TriviaGame)
+    for cls in (TriviaGame, triviabot)
+    for method in vars(cls).values()
+    for name, admin in getattr(method, "commands", ())
+}
 
 
 class ircbotFactory(ClientFactory):
@@ -779,24 +1283,81 @@ class ircbotFactory(ClientFactory):
         self.nickname = nickname
         self.running = False
         self.lineRate = config.LINE_RATE
+        # (questions, difficulty, scheduler), loaded by the first connection
+        # and reused after a reconnection.
+        self.questions = None
+        # The Deferred of the load in progress.
+        self.loading = None
+        # State saved by the previous process, resumed by the first
+        # connection.
+        self.checkpoint = None
+        # Whether the connection was handed over by the previous process.
+        self.adopted = False
+
+        self.pool = ServerPool(
+            servers(),
+            initial_delay=getattr(config, "RECONNECT_INITIAL_DELAY", 1),
+            max_delay=getattr(config, "RECONNECT_MAX_DELAY", 300),
+        )
+        self.reconnector = Reconnector(self.pool, self._connect)
+
+    def questions_loaded(self, loaded):
+        self.loading = None
+        self.questions = loaded
+        return loaded
+
+    def questions_failed(self, failure):
+        self.loading = None
+        logger.error("Failed to load questions: %s", failure.getErrorMessage())
+
+    def _connect(self, server):
+        if config.USE_SSL.lower() == "no":
+            reactor.connectTCP(server.host, server.port, self)
+        else:
+            from twisted.internet import ssl
+
+            reactor.connectSSL(server.host, server.port, self, ssl.ClientContextFactory())
 
     def clientConnectionLost(self, connector, reason):
-        print("Lost connection ({})".format(reason))
-        connector.connect()
+        CONNECTION_FAILURES.inc()
+        self.reconnector.failed("lost connection: {}".format(reason.getErrorMessage()))
 
     def clientConnectionFailed(self, connector, reason):
-        print("Could not connect: {}".format(reason))
-        connector.connect()
+        CONNECTION_FAILURES.inc()
+        self.reconnector.failed("could not connect: {}".format(reason.getErrorMessage()))
 
 
 if __name__ == "__main__":
     # SSL will be attempted in all cases unless "NO" is explicity specified
     # in the config
-    startLogging(stdout)
-
-    if config.USE_SSL.lower() == "no":
-        reactor.connectTCP(config.SERVER, config.SERVER_PORT, ircbotFactory())
+    log.setup(
+        path=getattr(config, "LOG_FILE", None),
+        level=getattr(config, "LOG_LEVEL", "INFO"),
+        format=getattr(config, "LOG_FORMAT", "text"),
+        max_bytes=getattr(config, "LOG_MAX_BYTES", 10 * 1024 * 1024),
+        backups=getattr(config, "LOG_BACKUPS", 5),
+        chat_sample=getattr(config, "LOG_CHAT_SAMPLE", 1.0),
+    )
+    PythonLoggingObserver().start()
+
+    factory = ircbotFactory()
+    factory.checkpoint = checkpoint.read(
+        os.path.join(config.SAVE_DIR, CHECKPOINT), getattr(config, "CHECKPOINT_MAX_AGE", 300)
+    )
+    connection = factory.checkpoint and factory.checkpoint.get("connection")
+    if connection and not handed_over(connection):
+        logger.warning("Not taking over descriptor %s from the checkpoint, it wasn't handed over.", connection["fd"])
+        del factory.checkpoint["connection"]
+        connection = None
+    if connection:
+        factory.adopted = True
+        reactor.adoptStreamConnection(connection["fd"], connection["family"], factory)
+        os.close(connection["fd"])
     else:
-        reactor.connectSSL(config.SERVER, config.SERVER_PORT, ircbotFactory(), ssl.ClientContextFactory())
+        factory.reconnector.start()
+
+    if getattr(config, "METRICS_PORT", None):
+        metrics.listen(config.METRICS_PORT, getattr(config, "METRICS_HOST", "127.0.0.1"))
+        metrics.LagMonitor().start()
 
     reactor.run()
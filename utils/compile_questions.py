@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+
+# Compiles a question directory into a single question pack.
+#
+# Every line of every file is validated first: lines that are not valid UTF-8
+# or don't have exactly one non-empty question and answer separated by a
+# backtick are reported with their location and left out. The valid
+# questions are written to a pack, which the bot maps into memory at start
+# when Q_PACK is set in the config, instead of reading and indexing Q_DIR.
+#
+# The category of a question is the path of its file relative to the
+# directory.
+
+import logging
+import optparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.questions import parse_question, write_pack  # noqa: E402
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('compile_questions')
+logger.setLevel(logging.WARNING)
+
+
+def walk(directory):
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def read_questions(directory, errors):
+    '''
+    Yields (question, answer, category) for every valid line under
+    directory. Malformed lines are appended to errors as (path, lineno,
+    reason).
+    '''
+    for path in walk(directory):
+        category = os.path.relpath(path, directory).replace(os.sep, '/')
+        with open(path, 'rb') as fd:
+            for lineno, raw in enumerate(fd, 1):
+                if not raw.strip():
+                    continue
+                try:
+                    line = raw.decode('utf8')
+                except UnicodeDecodeError as e:
+                    errors.append((path, lineno, 'invalid UTF-8 at byte {}'.format(e.start)))
+                    continue
+                parsed = parse_question(line)
+                if parsed is None:
+                    errors.append((path, lineno, 'expected one question`answer pair'))
+                    continue
+                yield parsed[0], parsed[1], category
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-p', '--path', dest='path', type=str,
+                  default='questions', help='Directory with question files')
+    op.add_option('-o', '--output', dest='output', type=str,
+                  default='questions.pack', help='Pack file to write')
+    op.add_option('-s', '--strict', dest='strict', action='store_true',
+                  default=False, help='Do not write the pack if any line is malformed')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='warning', help='Logging output level')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    if not os.path.isdir(options.path):
+        op.error('{} is not a directory'.format(options.path))
+
+    errors = []
+    questions = list(read_questions(options.path, errors))
+    for path, lineno, reason in errors:
+        logger.warning('{}:{}: {}'.format(path, lineno, reason))
+
+    if errors and options.strict:
+        logger.error('{} malformed lines, no pack written.'.format(len(errors)))
+        return 1
+    if not questions:
+        logger.error('No valid questions in {}.'.format(options.path))
+        return 1
+
+    write_pack(options.output, questions)
+    logger.warning('Wrote {} questions to {} ({} malformed lines skipped).'.format(
+        len(questions), options.output, len(errors)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
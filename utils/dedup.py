@@ -2,67 +2,194 @@
 
 # Short deduplication script. Runs over every file in the target directory and
 # spits out duplicate lines and files which contained them.
+#
+# Lines are compared by a 64 bit hash of their question and answer, ignoring
+# only case and whitespace, so memory grows with the number of distinct
+# questions, not with the size of the corpus. The first copy of a question (in
+# sorted path order) is kept and with --destructive every file holding later
+# copies is rewritten once, atomically. Lines are copied through as bytes, so
+# the kept ones are left untouched whatever their encoding.
+#
+# With --near, questions that are only similar (same question with different
+# wording, typos, ...) are reported too. They are found with MinHash over
+# character shingles and locality sensitive hashing, and never deleted.
 
-from collections import defaultdict
+import hashlib
 import logging
-import os
 import optparse
-import subprocess
+import os
+import stat
 import sys
+import tempfile
+import zlib
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.answer import normalize  # noqa: E402
+from lib.questions import parse_question  # noqa: E402
 
 
 logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
 logger = logging.getLogger('dedup')
 logger.setLevel(logging.INFO)
 
+SHINGLE = 5
+PERMUTATIONS = 32
+PRIME = (1 << 61) - 1
+MASK = (1 << 32) - 1
+
+
+def line_key(line):
+    '''
+    Returns the 64 bit hash identifying a question line, given as bytes.
+    Lines that differ in more than case and whitespace get different keys,
+    as they are deleted when the keys match.
+    '''
+    text = ' '.join(line.decode('utf8', 'surrogateescape').casefold().split())
+    parsed = parse_question(text)
+    if parsed is not None:
+        text = parsed[0] + '`' + parsed[1]
+    digest = hashlib.blake2b(text.encode('utf8', 'surrogateescape'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
 
-def collate(d, path):
-    with open(path, "rU") as handle:
-        for line in handle:
-            d[line].append(path)
 
+class NearDuplicates:
+    '''
+    Finds questions similar to one already seen using MinHash signatures
+    split in bands: two questions sharing any band are reported. Only the
+    band hashes are kept in memory.
+    '''
 
-def readdir(directory):
-    d = defaultdict(list)
+    def __init__(self, threshold, seed=1):
+        # Choose the band layout whose similarity threshold, which is about
+        # (1 / bands) ** (1 / rows), is the closest to the requested one.
+        layouts = [(b, PERMUTATIONS // b) for b in (2, 4, 8, 16)]
+        self._bands, self._rows = min(layouts, key=lambda l: abs((1 / l[0]) ** (1 / l[1]) - threshold))
+        state = seed
+        self._coefficients = []
+        for _ in range(PERMUTATIONS):
+            state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+            a = (state >> 11) % PRIME or 1
+            state = (state * 6364136223846793005 + 1442695040888963407) & ((1 << 64) - 1)
+            self._coefficients.append((a, (state >> 11) % PRIME))
+        self._tables = [{} for _ in range(self._bands)]
+
+    def signature(self, text):
+        shingles = set(zlib.crc32(text[i:i + SHINGLE].encode('utf8'))
+                       for i in range(max(1, len(text) - SHINGLE + 1)))
+        return array('L', (min(((a * s + b) % PRIME) & MASK for s in shingles)
+                           for a, b in self._coefficients))
+
+    def check(self, line, location):
+        '''
+        Returns the location of a similar question seen before, or None.
+        The line, given as bytes, is remembered either way.
+        '''
+        parsed = parse_question(line.decode('utf8', 'replace'))
+        if parsed is None:
+            return None
+        signature = self.signature(normalize(parsed[0]))
+        match = None
+        for band, table in enumerate(self._tables):
+            key = hash(tuple(signature[band * self._rows:(band + 1) * self._rows]))
+            if match is None:
+                match = table.get(key)
+            table.setdefault(key, location)
+        return match
+
+
+def walk(directory):
     for root, dirs, files in os.walk(directory):
-        for name in files:
-            path = os.path.join(root, name)
-            collate(d, path)
-    return d
-
-
-op = optparse.OptionParser()
-op.add_option('-p', '--path', dest='path', type=str,
-              default='questions', help='Directory with files to scan')
-op.add_option('-l', '--log-level', dest='log_level', type=str,
-              default='warning', help='Logging output level')
-op.add_option('-d', '--destructive', dest='delete', action="store_true",
-              default=False, help='Setting this will delete all but one copy')
-options, args = op.parse_args()
-
-if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
-                                 'CRITICAL']:
-    logger.setLevel(getattr(logging, options.log_level.upper()))
-
-
-logger.info('Reading {0} ...'.format(options.path))
-d = readdir(options.path)
-
-logger.info("Done. Duplicates:")
-
-for line, paths in d.iteritems():
-    if len(paths) > 1:
-        logger.info(line)
-        logger.info(", ".join(paths))
-        purge = paths[:-1]  # keep the copy in the last file
-        cmd = [ 'sed', '-i', "{/" + line.strip() + "/d}", ] + purge
-        logger.warning(' '.join(cmd)) 
-        if options.delete:
-            proc = subprocess.Popen(cmd,
-                                    stdout=subprocess.PIPE,
-                                    stderr=subprocess.PIPE,)
-            (out, err) = proc.communicate()
-            if out:
-                logger.info(out)
-            if err:
-                logger.error(err)
+        dirs.sort()
+        for name in sorted(files):
+            yield os.path.join(root, name)
+
+
+def location(paths, packed):
+    return '{}:{}'.format(paths[packed >> 32], packed & MASK)
+
+
+def dedup_file(paths, seen, near, delete):
+    '''
+    Streams the last file of paths, reporting duplicated lines. With
+    delete, the file is rewritten without them through a temporary file
+    that replaces it only if something was removed. Returns the number of
+    duplicates found.
+
+    seen maps line hashes to where their first copy is, packed as the
+    index of the file in paths and the line number.
+    '''
+    path = paths[-1]
+    file_id = len(paths) - 1
+    duplicates = 0
+    out = None
+    if delete:
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.dedup-')
+        out = os.fdopen(fd, 'wb')
+    try:
+        with open(path, 'rb') as handle:
+            for lineno, line in enumerate(handle, 1):
+                if not line.strip():
+                    if out is not None:
+                        out.write(line)
+                    continue
+                key = line_key(line)
+                first = seen.get(key)
+                if first is not None:
+                    duplicates += 1
+                    logger.info('{}:{} duplicates {}'.format(path, lineno, location(paths, first)))
+                    logger.debug(line.decode('utf8', 'replace').rstrip())
+                    continue
+                seen[key] = file_id << 32 | lineno
+                if near is not None:
+                    similar = near.check(line, seen[key])
+                    if similar is not None:
+                        logger.warning('{}:{} looks like {}'.format(path, lineno, location(paths, similar)))
+                if out is not None:
+                    out.write(line)
+        if out is not None:
+            out.close()
+            if duplicates:
+                os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+                os.replace(tmp, path)
+                logger.warning('Removed {} duplicates from {}'.format(duplicates, path))
+    finally:
+        if out is not None:
+            out.close()
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return duplicates
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-p', '--path', dest='path', type=str,
+                  default='questions', help='Directory with files to scan')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='warning', help='Logging output level')
+    op.add_option('-d', '--destructive', dest='delete', action="store_true",
+                  default=False, help='Setting this will delete all but one copy')
+    op.add_option('-n', '--near', dest='near', type=float, default=None,
+                  help='Also report questions at least this similar (0-1)')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    logger.info('Reading {0} ...'.format(options.path))
+    # Hash of every distinct line -> where its first copy is.
+    seen = {}
+    paths = []
+    near = NearDuplicates(options.near) if options.near is not None else None
+    total = 0
+    for path in walk(options.path):
+        paths.append(path)
+        total += dedup_file(paths, seen, near, options.delete)
+
+    logger.warning('{} distinct questions, {} duplicates.'.format(len(seen), total))
+
+
+if __name__ == '__main__':
+    main()
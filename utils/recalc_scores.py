@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+# Recomputes every score from the answer history.
+#
+# Each recorded win is scored again, in order, with the same rules the bot
+# uses (lib/scoring.py) and the values of a config file, optionally
+# overridden with --set, e.g. to see what a season would have looked like
+# with other BASE_POINTS:
+#
+#     python utils/recalc_scores.py -c config.py --set BASE_POINTS=20
+#
+# The resulting scores are written as a snapshot in the format of
+# scores.json, and a report lists how every player's score and rank would
+# change. Nothing in the save directory is modified.
+#
+# Wins recorded with 0 points were made while the player was frozen and stay
+# at 0. Score changes made with !set are not part of the history.
+
+import ast
+import json
+import logging
+import optparse
+import os
+import runpy
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.leaderboard import Leaderboard  # noqa: E402
+from lib.scoring import ScoringRules, score_win  # noqa: E402
+from lib.storage import JournalStore, SqliteStore  # noqa: E402
+
+
+logging.basicConfig(format='%(asctime)s\t%(name)s\t%(levelname)s\t%(message)s')
+logger = logging.getLogger('recalc_scores')
+logger.setLevel(logging.INFO)
+
+
+def load_config(path, overrides):
+    values = runpy.run_path(path)
+    for override in overrides:
+        key, _, value = override.partition('=')
+        try:
+            values[key.strip()] = ast.literal_eval(value.strip())
+        except (ValueError, SyntaxError):
+            values[key.strip()] = value.strip()
+    return types.SimpleNamespace(**values)
+
+
+def open_store(directory, storage):
+    if storage == 'sqlite':
+        return SqliteStore(directory)
+    return JournalStore(directory)
+
+
+def replay(history, rules):
+    '''
+    Scores every win of history again. Returns the Leaderboard at the end
+    and the number of wins replayed.
+    '''
+    scores = Leaderboard()
+    wins = 0
+    for entry in history:
+        user = entry['user']
+        if not entry['points']:
+            continue
+        points, _ = score_win(rules, scores, user, entry['clue'] or 1)
+        scores.add(user, points)
+        wins += 1
+    return scores, wins
+
+
+def diff(old, new):
+    '''
+    Returns (player, old score, new score, old rank, new rank) for every
+    player whose score or rank changed, biggest changes first.
+    '''
+    rows = []
+    for player in set(old) | set(new):
+        old_rank = old.rank(player)[0] if player in old else None
+        new_rank = new.rank(player)[0] if player in new else None
+        old_score, new_score = old.get(player, 0), new.get(player, 0)
+        if old_score != new_score or old_rank != new_rank:
+            rows.append((player, old_score, new_score, old_rank, new_rank))
+    rows.sort(key=lambda row: (-abs(row[2] - row[1]), row[0]))
+    return rows
+
+
+def write_snapshot(path, scores):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fd:
+        json.dump(dict(scores), fd)
+    os.replace(tmp, path)
+
+
+def write_report(fd, rows, old, new):
+    fd.write('player\told\tnew\tdelta\told rank\tnew rank\n')
+    for player, old_score, new_score, old_rank, new_rank in rows:
+        fd.write('{}\t{}\t{}\t{:+d}\t{}\t{}\n'.format(
+            player, old_score, new_score, new_score - old_score,
+            '-' if old_rank is None else old_rank, '-' if new_rank is None else new_rank))
+    fd.write('# {} players, {} points before; {} players, {} points after; {} changed\n'.format(
+        len(old), old.total, len(new), new.total, len(rows)))
+
+
+def main():
+    op = optparse.OptionParser()
+    op.add_option('-c', '--config', dest='config', type=str,
+                  default='config.py', help='Config file with the scoring rules')
+    op.add_option('-d', '--save-dir', dest='save_dir', type=str,
+                  default=None, help='Directory with the scores (SAVE_DIR by default)')
+    op.add_option('-s', '--storage', dest='storage', type=str,
+                  default=None, help='json or sqlite (STORAGE by default)')
+    op.add_option('--set', dest='overrides', action='append', default=[],
+                  help='Override a config value, as KEY=VALUE')
+    op.add_option('-o', '--output', dest='output', type=str,
+                  default='recalculated_scores.json', help='Snapshot to write')
+    op.add_option('-r', '--report', dest='report', type=str,
+                  default=None, help='Report to write, stdout by default')
+    op.add_option('-l', '--log-level', dest='log_level', type=str,
+                  default='info', help='Logging output level')
+    options, args = op.parse_args()
+
+    if options.log_level.upper() in ['DEBUG', 'INFO', 'WARNING', 'ERROR',
+                                     'CRITICAL']:
+        logger.setLevel(getattr(logging, options.log_level.upper()))
+
+    config = load_config(options.config, options.overrides)
+    rules = ScoringRules.from_config(config)
+    directory = options.save_dir or config.SAVE_DIR
+    storage = (options.storage or getattr(config, 'STORAGE', 'json')).lower()
+
+    store = open_store(directory, storage)
+    try:
+        old = Leaderboard(store.load())
+        new, wins = replay(store.history(), rules)
+    finally:
+        store.close()
+    logger.info('Replayed {} wins with {}.'.format(wins, rules))
+
+    write_snapshot(options.output, new)
+    rows = diff(old, new)
+    if options.report:
+        with open(options.report, 'w') as fd:
+            write_report(fd, rows, old, new)
+    else:
+        write_report(sys.stdout, rows, old, new)
+
+
+if __name__ == '__main__':
+    main()